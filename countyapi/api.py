@@ -1,19 +1,27 @@
 from copy import copy
 import csv
+import json
+import logging
 import os
 
+from django.conf.urls import url
 from django.http import HttpResponse
 from django.core.exceptions import ObjectDoesNotExist
 from django.conf import settings
 from tastypie.exceptions import ApiFieldError, Unauthorized
 from tastypie.bundle import Bundle
 from tastypie.fields import ToManyField, ToOneField
+from tastypie.http import HttpBadRequest
 from tastypie.resources import ModelResource, ALL, ALL_WITH_RELATIONS
 from tastypie.serializers import Serializer
 from tastypie.authorization import Authorization
+from tastypie.utils import trailing_slash
 
 from countyapi.models import CountyInmate, CourtLocation, CourtDate, HousingLocation, HousingHistory, \
-    DailyPopulationCounts, DailyBookingsCounts, ChargesHistory
+    DailyPopulationCounts, DailyBookingsCounts, ChargesHistory, CurrentInmate, InmateDocument, InmateChange
+from bulk_inmates import BulkInmates, MAX_RECORDS, records_from_csv, records_from_ndjson
+from middleware import DEHYDRATE, META as PROFILE_META, SERIALIZE, timed
+from scraper.monitor import Monitor
 from utils import convert_to_int
 
 
@@ -59,12 +67,19 @@ STD_HTTP_COMMANDS = [GET, POST, PUT, DELETE]
 
 RELATED = 'related'
 
+SINCE = 'since'
+
 INMATE = 'inmate'
 
 NEGATIVE_VALUES = {'0', 'false'}
 
 API_PATH_FORMAT = '/api/1.0/%s/'
 
+# Bump whenever the CountyInmate detail output changes, so stale precomputed documents are ignored
+INMATE_DOCUMENT_VERSION = 1
+
+APPLICATION_JSON = 'application/json'
+
 
 def use_caching():
     """
@@ -284,16 +299,26 @@ class JailResource(ModelResource):
         """
         Add message to data.
         """
-        data.data[ABOUT_THIS_DATA] = DISCLAIMER
+        with timed(request, PROFILE_META):
+            data.data[ABOUT_THIS_DATA] = DISCLAIMER
         return data
 
     def alter_list_data_to_serialize(self, request, data):
         """
         Add message to meta.
         """
-        data[META][ABOUT_THIS_DATA] = DISCLAIMER
+        with timed(request, PROFILE_META):
+            data[META][ABOUT_THIS_DATA] = DISCLAIMER
         return data
 
+    def full_dehydrate(self, bundle, for_list=False):
+        with timed(bundle.request, DEHYDRATE):
+            return super(JailResource, self).full_dehydrate(bundle, for_list=for_list)
+
+    def serialize(self, request, data, format, options=None):
+        with timed(request, SERIALIZE):
+            return super(JailResource, self).serialize(request, data, format, options=options)
+
 
 class CourtLocationResource(JailResource):
     """
@@ -587,6 +612,69 @@ class CountyInmateResource(JailResource):
 
         return bundle
 
+    def dispatch_bulk(self, request, **kwargs):
+        """
+        Loads many inmates, with their histories, in one request. The body is either newline
+        delimited JSON, one inmate per line shaped like this resource's detail output, or CSV when
+        sent as text/csv. Nothing is stored unless every record is valid.
+        """
+        self.method_check(request, allowed=[POST, PUT])
+        self.is_authenticated(request)
+        self.authorized_create_list([], self.build_bundle(request=request))
+        if request.META.get('CONTENT_TYPE', '').startswith(TEXT_CSV):
+            records, errors = records_from_csv(request.body)
+        else:
+            records, errors = records_from_ndjson(request.body)
+        if len(records) > MAX_RECORDS:
+            errors.append('too many inmates, at most %d can be loaded per request' % MAX_RECORDS)
+        if errors:
+            return self.create_response(request, {'errors': errors}, response_class=HttpBadRequest)
+        created, updated = BulkInmates(bulk_monitor()).save(records)
+        return self.create_response(request, {'created': created, 'updated': updated})
+
+    def get_detail(self, request, **kwargs):
+        """
+        Serves the inmate's precomputed document when there is one, see inmate_documents.py,
+        otherwise builds the response the usual way.
+        """
+        try:
+            inmate_document = InmateDocument.objects.get(jail_id=kwargs.get('pk'), version=INMATE_DOCUMENT_VERSION)
+        except ObjectDoesNotExist:
+            return super(CountyInmateResource, self).get_detail(request, **kwargs)
+        document = inmate_document.related_document if request.REQUEST.get(RELATED) == '1' \
+            else inmate_document.document
+        if self.determine_format(request) == APPLICATION_JSON:
+            return HttpResponse(document, content_type=APPLICATION_JSON)
+        return self.create_response(request, json.loads(document))
+
+    def obj_delete(self, bundle, **kwargs):
+        # deleting clears the inmate's jail_id
+        super(CountyInmateResource, self).obj_delete(bundle, **kwargs)
+        _discard_deleted_inmates_documents()
+
+    def obj_delete_list(self, bundle, **kwargs):
+        super(CountyInmateResource, self).obj_delete_list(bundle, **kwargs)
+        _discard_deleted_inmates_documents()
+
+    def obj_delete_list_for_update(self, bundle, **kwargs):
+        super(CountyInmateResource, self).obj_delete_list_for_update(bundle, **kwargs)
+        _discard_deleted_inmates_documents()
+
+    def prepend_urls(self):
+        return [
+            url(r"^(?P<resource_name>%s)/bulk%s$" % (self._meta.resource_name, trailing_slash()),
+                self.wrap_view('dispatch_bulk'), name='api_county_inmate_bulk'),
+        ]
+
+    def save(self, bundle, skip_errors=False):
+        """
+        Inmates written through the API, along with their histories, are served the usual way until
+        their documents are built again.
+        """
+        bundle = super(CountyInmateResource, self).save(bundle, skip_errors=skip_errors)
+        InmateDocument.objects.filter(jail_id=bundle.obj.jail_id).delete()
+        return bundle
+
 
 class DailyPopulationCountsResource(JailResource):
     """
@@ -622,9 +710,85 @@ class DailyBookingsCountsResource(JailResource):
         ordering = filtering.keys()
 
 
+class CurrentPopulationResource(JailResource):
+    """
+    API endpoint for CurrentInmate, the inmates currently in the jail system along with their
+    latest housing location, charges and next court date. Read only, rebuilt after each scrape.
+    """
+
+    class Meta:
+        queryset = CurrentInmate.objects.all()
+        resource_name = 'currentpopulation'
+        allowed_methods = [GET]
+        limit = 100
+        max_limit = 0
+        if use_caching():
+            cache = SimpleCache(timeout=cache_ttl())
+        serializer = JailSerializer()
+        filtering = {
+            'jail_id': ALL,
+            BOOKING_DATE: ALL,
+            'gender': ALL,
+            'race': ALL,
+            'age_at_booking': ALL,
+            'bail_amount': ALL,
+            'bail_status': ALL,
+            'in_jail': ALL,
+            HOUSING_LOCATION: ALL,
+            'division': ALL,
+            'in_program': ALL,
+            'charges_citation': ALL,
+            'next_court_date': ALL,
+            'person_id': ALL,
+        }
+        ordering = filtering.keys()
+
+
+class InmateChangeResource(JailResource):
+    """
+    API endpoint for InmateChange, the log of changes made to inmate records. Clients keep the
+    highest id they have seen and ask for the changes since it, as in ?since=1234.
+    """
+
+    class Meta:
+        queryset = InmateChange.objects.all()
+        resource_name = 'changes'
+        allowed_methods = [GET]
+        limit = 1000
+        max_limit = 10000
+        serializer = JailSerializer()
+        filtering = {
+            'id': ALL,
+            'jail_id': ALL,
+            'change': ALL,
+            'changed': ALL,
+        }
+        ordering = filtering.keys()
+
+    def build_filters(self, filters=None):
+        orm_filters = super(InmateChangeResource, self).build_filters(filters)
+        if filters is not None and SINCE in filters:
+            orm_filters['id__gt'] = convert_to_int(filters[SINCE], 0)
+        return orm_filters
+
+
+_bulk_monitor = None
+
+
+def bulk_monitor():
+    global _bulk_monitor
+    if _bulk_monitor is None:
+        _bulk_monitor = Monitor(logging.getLogger('main'))
+    return _bulk_monitor
+
+
 def has_related_request(bundle):
     return bundle.request.REQUEST.get(RELATED) == '1'
 
 
 def request_path_starts_with(bundle, url):
     return bundle.request.path.startswith(url)
+
+
+def _discard_deleted_inmates_documents():
+    InmateDocument.objects.exclude(jail_id__in=CountyInmate.objects.values('jail_id')).delete()
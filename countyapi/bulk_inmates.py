@@ -0,0 +1,458 @@
+import csv
+from datetime import datetime
+import json
+from StringIO import StringIO
+
+from django.db import transaction
+
+from court_date_info import CourtDateInfo
+from housing_location_info import HousingLocationInfo
+from inmate import LOGGED_FIELDS
+from models import ChargesHistory, CountyInmate, CourtDate, CourtLocation, HousingHistory, HousingLocation, \
+    InmateChange, InmateDocument
+
+MAX_RECORDS = 50000
+
+# keeps the IN clauses below SQLite's limit of 999 parameters per statement
+CHUNK_SIZE = 500
+
+CHARGES_HISTORY = 'charges_history'
+COURT_DATES = 'court_dates'
+HOUSING_HISTORY = 'housing_history'
+JAIL_ID = 'jail_id'
+
+_DATE_FORMAT = '%Y-%m-%d'
+_DATETIME_FORMATS = ['%Y-%m-%dT%H:%M:%S.%f', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M:%S', _DATE_FORMAT]
+_TRUE_VALUES = {'1', 'true', 't', 'yes'}
+_FALSE_VALUES = {'0', 'false', 'f', 'no'}
+
+# fields that appear in the API's output but are not loaded
+_IGNORED_KEYS = {'about_this_data', 'id', 'inmate', 'resource_uri'}
+
+# CSV files hold at most one entry of each history per row, repeat the jail_id to add more
+_CSV_HISTORY_COLUMNS = {
+    'housing_location': (HOUSING_HISTORY, 'housing_location'),
+    'housing_date_discovered': (HOUSING_HISTORY, 'housing_date_discovered'),
+    'charges': (CHARGES_HISTORY, 'charges'),
+    'charges_citation': (CHARGES_HISTORY, 'charges_citation'),
+    'charges_date_seen': (CHARGES_HISTORY, 'date_seen'),
+    'court_date': (COURT_DATES, 'date'),
+    'court_location': (COURT_DATES, 'location'),
+}
+
+
+def _blank(value):
+    return value is None or value == ''
+
+
+def _boolean(value):
+    if _blank(value) or isinstance(value, bool):
+        return None if _blank(value) else value
+    if unicode(value).lower() in _TRUE_VALUES:
+        return True
+    if unicode(value).lower() in _FALSE_VALUES:
+        return False
+    raise ValueError("'%s' is not a boolean" % value)
+
+
+def _date(value):
+    if _blank(value):
+        return None
+    try:
+        return datetime.strptime(value, _DATE_FORMAT).date()
+    except (TypeError, ValueError):
+        raise ValueError("'%s' is not a YYYY-MM-DD date" % value)
+
+
+def _datetime(value):
+    if _blank(value):
+        return None
+    for datetime_format in _DATETIME_FORMATS:
+        try:
+            return datetime.strptime(value, datetime_format)
+        except (TypeError, ValueError):
+            pass
+    raise ValueError("'%s' is not a YYYY-MM-DDTHH:MM:SS date and time" % value)
+
+
+def _integer(value):
+    if _blank(value):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError("'%s' is not an integer" % value)
+
+
+def _string(max_length):
+    def convert(value):
+        if _blank(value):
+            return None
+        if not isinstance(value, basestring):
+            raise ValueError("'%s' is not a string" % value)
+        if len(value) > max_length:
+            raise ValueError("'%s' is longer than %d characters" % (value, max_length))
+        return value
+    return convert
+
+
+def _text(value):
+    return None if _blank(value) else _string(len(value))(value)
+
+
+_INMATE_FIELDS = {
+    'person_id': _string(64),
+    'race': _string(4),
+    'gender': _string(1),
+    'height': _integer,
+    'weight': _integer,
+    'age_at_booking': _integer,
+    'booking_date': _date,
+    'bail_status': _string(50),
+    'bail_amount': _integer,
+    'discharge_date_earliest': _datetime,
+    'discharge_date_latest': _datetime,
+    'in_jail': _boolean,
+}
+
+
+def _named(value, key):
+    """
+    History entries in the API's output hold nested objects, for instance the whole housing location,
+    while loaders are more likely to send just the name.
+    """
+    return value.get(key) if isinstance(value, dict) else value
+
+
+def _convert(entry, key, converter):
+    try:
+        return converter(entry.get(key))
+    except ValueError as e:
+        raise ValueError('%s: %s' % (key, e))
+
+
+def _history(raw_record, history_name, convert_entry):
+    entries = raw_record.get(history_name) or []
+    if not isinstance(entries, list):
+        raise ValueError('%s: must be a list' % history_name)
+    history = []
+    for entry in entries:
+        if not isinstance(entry, dict):
+            raise ValueError('%s: entries must be objects' % history_name)
+        history.append(convert_entry(entry))
+    return history
+
+
+def _housing_history_entry(entry):
+    housing_location = _string(40)(_named(entry.get('housing_location'), 'housing_location'))
+    if housing_location is None:
+        raise ValueError('housing_history: housing_location is required')
+    return housing_location, _convert(entry, 'housing_date_discovered', _date)
+
+
+def _charges_history_entry(entry):
+    return (_convert(entry, 'charges', _text), _convert(entry, 'charges_citation', _text),
+            _convert(entry, 'date_seen', _date))
+
+
+def _court_dates_entry(entry):
+    court_date = _convert(entry, 'date', _date)
+    location = _text(_named(entry.get('location'), 'location'))
+    if court_date is None or location is None:
+        raise ValueError('court_dates: date and location are required')
+    return court_date, location
+
+
+def inmate_record(raw_record):
+    """
+    Validates and converts a raw record, a dictionary decoded from JSON or built from a CSV row.
+    Raises ValueError describing the first problem found.
+    """
+    jail_id = raw_record.get(JAIL_ID)
+    if not isinstance(jail_id, basestring) or not 0 < len(jail_id) <= 15:
+        raise ValueError('jail_id: must be a string of 1 to 15 characters')
+    fields = {}
+    for key, value in raw_record.iteritems():
+        if key in _INMATE_FIELDS:
+            fields[key] = _convert(raw_record, key, _INMATE_FIELDS[key])
+        elif key not in _IGNORED_KEYS and key not in [JAIL_ID, HOUSING_HISTORY, CHARGES_HISTORY, COURT_DATES]:
+            raise ValueError("unknown field '%s'" % key)
+    if fields.get('in_jail', False) is None:
+        del fields['in_jail']
+    return {
+        JAIL_ID: jail_id,
+        'fields': fields,
+        HOUSING_HISTORY: _history(raw_record, HOUSING_HISTORY, _housing_history_entry),
+        CHARGES_HISTORY: _history(raw_record, CHARGES_HISTORY, _charges_history_entry),
+        COURT_DATES: _history(raw_record, COURT_DATES, _court_dates_entry),
+    }
+
+
+def records_from_csv(text):
+    """
+    Returns the records and the list of errors found in CSV text, which must have a header row.
+    """
+    records, errors = [], []
+    reader = csv.DictReader(StringIO(text))
+    for row in reader:
+        raw_record = {}
+        for column, value in row.iteritems():
+            # blank cells leave the value unchanged
+            if _blank(value):
+                continue
+            value = value.decode('utf-8')
+            if column in _CSV_HISTORY_COLUMNS:
+                history_name, key = _CSV_HISTORY_COLUMNS[column]
+                raw_record.setdefault(history_name, [{}])[0][key] = value
+            else:
+                raw_record[column] = value
+        try:
+            records.append(inmate_record(raw_record))
+        except ValueError as e:
+            errors.append('line %d: %s' % (reader.line_num, e))
+    return _merged(records), errors
+
+
+def records_from_ndjson(text):
+    """
+    Returns the records and the list of errors found in newline delimited JSON text, one inmate
+    object per line.
+    """
+    records, errors = [], []
+    for line_number, line in enumerate(text.splitlines(), 1):
+        if line.strip() == '':
+            continue
+        try:
+            raw_record = json.loads(line)
+            if not isinstance(raw_record, dict):
+                raise ValueError('not a JSON object')
+            records.append(inmate_record(raw_record))
+        except ValueError as e:
+            errors.append('line %d: %s' % (line_number, e))
+    return _merged(records), errors
+
+
+def _merged(records):
+    """
+    Combines records with the same jail_id, later field values win and histories are concatenated
+    """
+    merged = {}
+    for record in records:
+        if record[JAIL_ID] not in merged:
+            merged[record[JAIL_ID]] = record
+        else:
+            merged_record = merged[record[JAIL_ID]]
+            merged_record['fields'].update(record['fields'])
+            for history_name in [HOUSING_HISTORY, CHARGES_HISTORY, COURT_DATES]:
+                merged_record[history_name].extend(record[history_name])
+    return merged.values()
+
+
+def _chunks(values):
+    values = list(values)
+    for index in range(0, len(values), CHUNK_SIZE):
+        yield values[index:index + CHUNK_SIZE]
+
+
+class BulkInmates:
+    """
+    Writes batches of validated inmate records, see inmate_record, with their histories in a single
+    transaction. Existing rows are looked up a chunk at a time and new rows are bulk inserted. Stored
+    inmates are only written the fields that changed, with one UPDATE for all the inmates given the
+    same values, so seeing a batch again, when most inmates just get a new last_seen_date, costs an
+    UPDATE per chunk. History entries that are already stored are skipped, so replaying a batch is
+    harmless.
+
+    Changes are logged to InmateChange as the scraper logs them. The CurrentInmate table is not
+    refreshed, it is rebuilt at the end of the next scrape or by refresh_current_population.
+    """
+
+    def __init__(self, monitor):
+        self._monitor = monitor
+
+    def _court_locations(self, records):
+        """
+        Returns the court locations used by the records, by normalized location string, creating
+        the missing ones.
+        """
+        court_date_info = CourtDateInfo(None, None, self._monitor)
+        parsed_locations = {}
+        for record in records:
+            normalized_entries = []
+            for court_date, location in record[COURT_DATES]:
+                normalized_location, parsed_location = court_date_info.parse_court_location(location)
+                parsed_locations[normalized_location] = parsed_location
+                normalized_entries.append((court_date, normalized_location))
+            record[COURT_DATES] = normalized_entries
+        court_locations = self._stored_court_locations(parsed_locations.keys())
+        CourtLocation.objects.bulk_create([CourtLocation(location=location, **parsed_locations[location])
+                                           for location in parsed_locations if location not in court_locations])
+        court_locations.update(self._stored_court_locations(set(parsed_locations) - set(court_locations)))
+        return court_locations
+
+    def _debug(self, msg):
+        self._monitor.debug('BulkInmates: %s' % msg)
+
+    def _housing_locations(self, records):
+        """
+        Returns the housing locations used by the records, by name, creating the missing ones.
+        """
+        names = set(name for record in records for name, _ in record[HOUSING_HISTORY])
+        housing_locations = {}
+        for chunk in _chunks(names):
+            housing_locations.update(HousingLocation.objects.in_bulk(chunk))
+        housing_location_info = HousingLocationInfo(None, None, self._monitor)
+        new_housing_locations = [housing_location_info.parse_housing_location(name)
+                                 for name in names if name not in housing_locations]
+        HousingLocation.objects.bulk_create(new_housing_locations)
+        for housing_location in new_housing_locations:
+            housing_locations[housing_location.housing_location] = housing_location
+        return housing_locations
+
+    @staticmethod
+    def _in_jail(record, housing_locations):
+        """
+        Unless given, whether an inmate is in jail follows from their latest housing location.
+        Returns None when it cannot be told.
+        """
+        fields = record['fields']
+        if 'in_jail' in fields or not record[HOUSING_HISTORY]:
+            return fields.get('in_jail')
+        if fields.get('discharge_date_earliest') is not None:
+            return False
+        latest_name, _ = max(record[HOUSING_HISTORY], key=lambda entry: entry[1])
+        return housing_locations[latest_name].in_jail
+
+    def save(self, records):
+        """
+        Stores the records, returns the number of inmates created and updated.
+        """
+        start_time = datetime.now()
+        jail_ids = [record[JAIL_ID] for record in records]
+        with transaction.commit_on_success():
+            housing_locations = self._housing_locations(records)
+            court_locations = self._court_locations(records)
+            created, updated, changes = self._save_inmates(records, housing_locations, start_time)
+            new_histories = self._save_histories(jail_ids, records, court_locations)
+            self._log_changes(records, changes, new_histories, start_time)
+            for chunk in _chunks(jail_ids):
+                InmateDocument.objects.filter(jail_id__in=chunk).delete()
+        self._debug('stored %d new and %d updated inmates in %s' % (created, updated,
+                                                                    str(datetime.now() - start_time)))
+        return created, updated
+
+    @staticmethod
+    def _log_changes(records, changes, new_histories, last_seen_date):
+        """
+        Logs every creation, resurrection and discharge, updates only when something changed, see
+        Inmate.save
+        """
+        inmate_changes = []
+        for record in records:
+            jail_id = record[JAIL_ID]
+            change, fields = changes[jail_id]
+            fields = fields + [history_name for history_name in [HOUSING_HISTORY, CHARGES_HISTORY, COURT_DATES]
+                               if history_name in new_histories.get(jail_id, ())]
+            if change != InmateChange.UPDATED or fields:
+                inmate_changes.append(InmateChange(jail_id=jail_id, change=change,
+                                                   changed=record['fields'].get('last_seen_date', last_seen_date),
+                                                   fields=','.join(fields)[:255]))
+        InmateChange.objects.bulk_create(inmate_changes)
+
+    @staticmethod
+    def _save_histories(jail_ids, records, court_locations):
+        """
+        Stores the history entries not stored yet, returns the names of the histories added to by
+        jail_id.
+        """
+        stored_housing, stored_charges, stored_court_dates = set(), set(), set()
+        for chunk in _chunks(jail_ids):
+            stored_housing.update(HousingHistory.objects.filter(inmate__in=chunk)
+                                                        .values_list('inmate_id', 'housing_location_id'))
+            stored_charges.update(ChargesHistory.objects.filter(inmate__in=chunk)
+                                                        .values_list('inmate_id', 'charges', 'charges_citation',
+                                                                     'date_seen'))
+            stored_court_dates.update(CourtDate.objects.filter(inmate__in=chunk)
+                                                       .values_list('inmate_id', 'date', 'location_id'))
+        new_housing, new_charges, new_court_dates = [], [], []
+        new_histories = {}
+        for record in records:
+            jail_id = record[JAIL_ID]
+            for name, housing_date_discovered in record[HOUSING_HISTORY]:
+                if (jail_id, name) not in stored_housing:
+                    stored_housing.add((jail_id, name))
+                    new_housing.append(HousingHistory(inmate_id=jail_id, housing_location_id=name,
+                                                      housing_date_discovered=housing_date_discovered))
+                    new_histories.setdefault(jail_id, set()).add(HOUSING_HISTORY)
+            for charges, charges_citation, date_seen in record[CHARGES_HISTORY]:
+                if (jail_id, charges, charges_citation, date_seen) not in stored_charges:
+                    stored_charges.add((jail_id, charges, charges_citation, date_seen))
+                    new_charges.append(ChargesHistory(inmate_id=jail_id, charges=charges,
+                                                      charges_citation=charges_citation, date_seen=date_seen))
+                    new_histories.setdefault(jail_id, set()).add(CHARGES_HISTORY)
+            for court_date, location in record[COURT_DATES]:
+                location_id = court_locations[location]
+                if (jail_id, court_date, location_id) not in stored_court_dates:
+                    stored_court_dates.add((jail_id, court_date, location_id))
+                    new_court_dates.append(CourtDate(inmate_id=jail_id, date=court_date, location_id=location_id))
+                    new_histories.setdefault(jail_id, set()).add(COURT_DATES)
+        HousingHistory.objects.bulk_create(new_housing)
+        ChargesHistory.objects.bulk_create(new_charges)
+        CourtDate.objects.bulk_create(new_court_dates)
+        return new_histories
+
+    def _save_inmates(self, records, housing_locations, last_seen_date):
+        """
+        Returns the number of inmates created and updated, and the change made to each inmate by
+        jail_id, as the InmateChange change and the logged fields that changed.
+        """
+        stored_inmates = {}
+        for chunk in _chunks(record[JAIL_ID] for record in records):
+            for stored_inmate in CountyInmate.objects.filter(jail_id__in=chunk).values(JAIL_ID, *_INMATE_FIELDS):
+                stored_inmates[stored_inmate[JAIL_ID]] = stored_inmate
+        new_inmates, changes = [], {}
+        default_inmate = CountyInmate()
+        # jail_ids of the stored inmates by the values they are to be given
+        updates = {}
+        for record in records:
+            jail_id = record[JAIL_ID]
+            fields = dict(record['fields'])
+            in_jail = self._in_jail(record, housing_locations)
+            if in_jail is not None:
+                fields['in_jail'] = in_jail
+            if jail_id not in stored_inmates:
+                new_inmates.append(CountyInmate(jail_id=jail_id, **fields))
+                changes[jail_id] = (InmateChange.CREATED, [field_name for field_name in LOGGED_FIELDS
+                                                           if getattr(new_inmates[-1], field_name) !=
+                                                           getattr(default_inmate, field_name)])
+                continue
+            stored_inmate = stored_inmates[jail_id]
+            changed_fields = dict((field_name, value) for field_name, value in fields.iteritems()
+                                  if field_name in stored_inmate and stored_inmate[field_name] != value)
+            changes[jail_id] = (self._change(stored_inmate, changed_fields),
+                                [field_name for field_name in LOGGED_FIELDS if field_name in changed_fields])
+            # last_seen_date is only set automatically by save(), update() skips it, records of old
+            # details, such as generated ones, carry their own
+            changed_fields['last_seen_date'] = fields.get('last_seen_date', last_seen_date)
+            updates.setdefault(tuple(sorted(changed_fields.iteritems())), []).append(jail_id)
+        for values, jail_ids in updates.iteritems():
+            for chunk in _chunks(jail_ids):
+                CountyInmate.objects.filter(jail_id__in=chunk).update(**dict(values))
+        CountyInmate.objects.bulk_create(new_inmates)
+        return len(new_inmates), len(records) - len(new_inmates), changes
+
+    @staticmethod
+    def _change(stored_inmate, changed_fields):
+        if 'discharge_date_earliest' in changed_fields:
+            if stored_inmate['discharge_date_earliest'] is None:
+                return InmateChange.DISCHARGED
+            if changed_fields['discharge_date_earliest'] is None:
+                return InmateChange.RESURRECTED
+        return InmateChange.UPDATED
+
+    @staticmethod
+    def _stored_court_locations(locations):
+        court_locations = {}
+        for chunk in _chunks(locations):
+            court_locations.update(CourtLocation.objects.filter(location__in=chunk).values_list('location', 'id'))
+        return court_locations
@@ -5,10 +5,11 @@ from utils import just_empty_lines, strip_the_lines, yesterday
 
 class Charges:
 
-    def __init__(self, inmate, inmate_details, monitor):
+    def __init__(self, inmate, inmate_details, monitor, date_seen=None):
         self._inmate = inmate
         self._inmate_details = inmate_details
         self._monitor = monitor
+        self._date_seen = date_seen if date_seen is not None else yesterday()
 
     def _debug(self, msg):
         self._monitor.debug('Charges: %s' % msg)
@@ -18,11 +19,13 @@ class Charges:
         Stores the inmates charges if they are new or if they have been changes
         Charges: charges come on two lines. The first line is a citation and the
         # second is an optional description of the charges.
+        Returns True if a new charge was stored
         """
+        create_new_charge = False
         try:
             charges = strip_the_lines(self._inmate_details.charges().splitlines())
             if just_empty_lines(charges):
-                return
+                return False
 
             # Capture Charges and Citations if specified
             parsed_charges_citation = charges[0]
@@ -37,7 +40,7 @@ class Charges:
             if create_new_charge:
                     new_charge = self._inmate.charges_history.create(charges=parsed_charges,
                                                                      charges_citation=parsed_charges_citation)
-                    new_charge.date_seen = yesterday()
+                    new_charge.date_seen = self._date_seen
                     new_charge.save()
         except DatabaseError as e:
             self._debug("Could not save charges '%s' and citation '%s'\nException is %s" % (parsed_charges,
@@ -45,3 +48,4 @@ class Charges:
                                                                                                 str(e)))
         except Exception, e:
             self._debug("Unknown exception for inmate '%s'\nException is %s" % (self._inmate.jail_id, str(e)))
+        return create_new_charge
@@ -15,6 +15,9 @@ class CourtDateInfo:
         self._monitor.debug('CourtDateInfo: %s' % msg)
 
     def _parse_court_location(self):
+        return self.parse_court_location(self._inmate_details.court_house_location())
+
+    def parse_court_location(self, location_string):
 
         """
         Takes a location string of the form:
@@ -44,8 +47,6 @@ class CourtDateInfo:
         Note that room_number and zip_code are stored as ints, not strings.
         """
 
-        location_string = self._inmate_details.court_house_location()
-
         if location_string == "":
             return "", {}
 
@@ -93,7 +94,11 @@ class CourtDateInfo:
             return "\n".join(lines), {}
 
     def save(self):
+        """
+        Returns True if a new court date was stored
+        """
         # Court date parsing
+        created_court_date = False
         try:
             next_court_date = self._inmate_details.next_court_date()
             if next_court_date is not None:
@@ -107,10 +112,11 @@ class CourtDateInfo:
 
                 try:
                     # Get or create a court date for this inmate
-                    court_date, _ = self._inmate.court_dates.get_or_create(date=next_court_date.strftime('%Y-%m-%d'),
-                                                                           location=location)
+                    court_date, created_court_date = self._inmate.court_dates.get_or_create(
+                        date=next_court_date.strftime('%Y-%m-%d'), location=location)
                 except DatabaseError as e:
                     self._debug("For inmate %s, could not save next Court Date history '%s'.\nException is %s" %
                                 (self._inmate.jail_id, court_date, str(e)))
         except Exception, e:
             self._debug("Unknown exception for inmate '%s'\nException is %s" % (self._inmate.jail_id, str(e)))
+        return created_court_date
@@ -0,0 +1,85 @@
+from datetime import date, datetime
+
+from django.db import transaction
+from django.db.utils import DatabaseError
+
+from models import ChargesHistory, CountyInmate, CourtDate, CurrentInmate, HousingHistory
+
+_INMATE_FIELDS = ['jail_id', 'person_id', 'race', 'gender', 'age_at_booking', 'booking_date', 'bail_status',
+                  'bail_amount', 'in_jail']
+
+
+class CurrentPopulation:
+    """
+    Maintains the CurrentInmate table, a denormalized copy of the inmates currently in the jail
+    system. Each history table is read once, for all active inmates, rather than once per inmate.
+    """
+
+    def __init__(self, monitor):
+        self._monitor = monitor
+
+    @staticmethod
+    def _active_inmates():
+        return CountyInmate.objects.filter(discharge_date_earliest__isnull=True)
+
+    def _debug(self, msg):
+        self._monitor.debug('CurrentPopulation: %s' % msg)
+
+    def _latest_charges(self):
+        latest_charges = {}
+        for inmate_id, charges, charges_citation in \
+                ChargesHistory.objects.filter(inmate__discharge_date_earliest__isnull=True)\
+                                      .order_by('inmate', 'date_seen', 'id')\
+                                      .values_list('inmate_id', 'charges', 'charges_citation'):
+            latest_charges[inmate_id] = {'charges': charges, 'charges_citation': charges_citation}
+        return latest_charges
+
+    def _latest_housing(self):
+        latest_housing = {}
+        for inmate_id, housing_location, division, in_program, housing_date_discovered in \
+                HousingHistory.objects.filter(inmate__discharge_date_earliest__isnull=True)\
+                                      .order_by('inmate', 'housing_date_discovered', 'id')\
+                                      .values_list('inmate_id', 'housing_location_id',
+                                                   'housing_location__division', 'housing_location__in_program',
+                                                   'housing_date_discovered'):
+            latest_housing[inmate_id] = {'housing_location': housing_location, 'division': division,
+                                         'in_program': in_program, 'housing_date_discovered': housing_date_discovered}
+        return latest_housing
+
+    def _next_court_dates(self):
+        """
+        The next court date is the first one from today on, if there is none then the most recent one.
+        """
+        today = date.today()
+        next_court_dates = {}
+        for inmate_id, court_date, court_location in \
+                CourtDate.objects.filter(inmate__discharge_date_earliest__isnull=True)\
+                                 .order_by('inmate', 'date')\
+                                 .values_list('inmate_id', 'date', 'location__location'):
+            cur_next = next_court_dates.get(inmate_id)
+            if cur_next is None or cur_next['next_court_date'] < today:
+                next_court_dates[inmate_id] = {'next_court_date': court_date, 'court_location': court_location}
+        return next_court_dates
+
+    def refresh(self):
+        """
+        Rebuilds the current population in a single transaction, so readers never see a partial table.
+        """
+        start_time = datetime.now()
+        try:
+            latest_housing = self._latest_housing()
+            latest_charges = self._latest_charges()
+            next_court_dates = self._next_court_dates()
+            current_inmates = []
+            for values in self._active_inmates().values(*_INMATE_FIELDS):
+                jail_id = values['jail_id']
+                values.update(latest_housing.get(jail_id, {}))
+                values.update(latest_charges.get(jail_id, {}))
+                values.update(next_court_dates.get(jail_id, {}))
+                current_inmates.append(CurrentInmate(refreshed=start_time, **values))
+            with transaction.commit_on_success():
+                CurrentInmate.objects.all().delete()
+                CurrentInmate.objects.bulk_create(current_inmates)
+            self._debug('refreshed %d inmates in %s' % (len(current_inmates), str(datetime.now() - start_time)))
+        except DatabaseError as e:
+            self._debug("Could not refresh current population\nException is %s" % str(e))
@@ -5,11 +5,12 @@ from models import HousingLocation
 
 class HousingLocationInfo:
 
-    def __init__(self, inmate, inmate_details, monitor):
+    def __init__(self, inmate, inmate_details, monitor, date_discovered=None):
         self._inmate = inmate
         self._inmate_details = inmate_details
         self._monitor = monitor
         self._housing_location = None
+        self._date_discovered = date_discovered if date_discovered is not None else yesterday()
         self._location_segments = None
 
     def _debug(self, msg):
@@ -59,7 +60,19 @@ class HousingLocationInfo:
         self._set_sub_division(join_with_space_and_convert_spaces(self._location_segments[1:3], ""),
                                self._location_segments[3:])
 
+    def parse_housing_location(self, housing_location_name):
+        """
+        Returns a new, unsaved, HousingLocation with its fields parsed out of housing_location_name
+        """
+        self._housing_location = HousingLocation(housing_location=housing_location_name)
+        self._process_housing_location()
+        return self._housing_location
+
     def save(self):
+        """
+        Returns True if the inmate was found in a new housing location
+        """
+        new_history = False
         try:
             inmate_housing_location = self._inmate_details.housing_location()
             if inmate_housing_location != '':
@@ -77,7 +90,7 @@ class HousingLocationInfo:
                     housing_history, new_history = \
                         self._inmate.housing_history.get_or_create(housing_location=self._housing_location)
                     if new_history:
-                        housing_history.housing_date_discovered = yesterday()
+                        housing_history.housing_date_discovered = self._date_discovered
                         housing_history.save()
                         self._inmate.in_jail = self._housing_location.in_jail
                 except DatabaseError as e:
@@ -85,6 +98,7 @@ class HousingLocationInfo:
                                 (self._inmate.jail_id, inmate_housing_location, str(e)))
         except Exception, e:
             self._debug("Unknown exception for inmate '%s'\nException is %s" % (self._inmate.jail_id, str(e)))
+        return new_history
 
     def _set_day_release(self):
         for element in self._location_segments:
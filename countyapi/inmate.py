@@ -1,9 +1,10 @@
 from datetime import datetime, date, time
 
+from django.db.models import Count
 from django.db.utils import DatabaseError
 
 from utils import convert_to_int
-from models import CountyInmate
+from models import ChargesHistory, CountyInmate, CourtDate, HousingHistory, InmateChange, InmateDocument
 from charges import Charges
 from court_date_info import CourtDateInfo
 from housing_location_info import HousingLocationInfo
@@ -12,16 +13,25 @@ from utils import ONE_DAY
 _MIDNIGHT = time()
 _NUMBER_DAYS_AGO = 5
 
+# Inmate fields whose changes are recorded in the InmateChange log
+LOGGED_FIELDS = ['person_id', 'booking_date', 'gender', 'race', 'height', 'weight', 'age_at_booking', 'bail_amount',
+                  'bail_status', 'in_jail']
+
 
 class Inmate:
     """
     Inmate handling code lifted whole sale from inmate_utils file in countyapi/management/commands
     """
 
-    def __init__(self, inmate_id, inmate_details, monitor):
+    def __init__(self, inmate_id, inmate_details, monitor, seen=None):
+        """
+        seen is when the inmate details were fetched, it defaults to now. Passing it replays old
+        details, in which case the caller must switch off last_seen_date's auto_now.
+        """
         self._inmate_id = inmate_id
         self._inmate_details = inmate_details
         self._monitor = monitor
+        self._seen = seen
         self._inmate = None
 
     @staticmethod
@@ -41,20 +51,33 @@ class Inmate:
             self._inmate.in_jail = self._inmate.housing_history.latest().housing_location.in_jail
         return resurrected
 
-    def _debug(self, msg):
-        self._monitor.debug('Inmate: %s' % msg)
+    def _debug(self, msg, args=None):
+        self._monitor.debug('Inmate: ' + msg, args=args)
+
+    def _changed_fields(self, previous_values):
+        return [field_name for field_name, previous_value in zip(LOGGED_FIELDS, previous_values)
+                if CountyInmate._meta.get_field(field_name).to_python(getattr(self._inmate, field_name)) !=
+                previous_value]
+
+    def _date_discovered(self):
+        """
+        Histories are dated the day before the details were fetched, None means yesterday
+        """
+        return None if self._seen is None else self._seen.date() - ONE_DAY
 
     @staticmethod
-    def discharge(inmate_id, monitor):
+    def discharge(inmate_id, monitor, discharged=None):
         try:
             inmate = CountyInmate.objects.get(jail_id=inmate_id)
             if inmate:
-                now = datetime.now()
+                now = discharged if discharged is not None else datetime.now()
                 inmate.discharge_date_earliest = inmate.last_seen_date
                 inmate.discharge_date_latest = now
                 inmate.in_jail = False
                 inmate.save()
-                monitor.debug("Inmate: Discharged inmate %s" % inmate_id)
+                InmateChange.objects.create(jail_id=inmate_id, change=InmateChange.DISCHARGED, changed=now)
+                InmateDocument.objects.filter(jail_id=inmate_id).delete()
+                monitor.debug("Inmate: Discharged inmate %s", args=(inmate_id,))
         except DatabaseError as e:
             monitor.debug("Could not save inmate '%s'\nException is %s" % (inmate_id, str(e)))
         except Exception, e:
@@ -64,7 +87,8 @@ class Inmate:
         """
         Gets or creates inmate record based on jail_id and stores the url used to fetch the inmate info
         """
-        inmate, created = CountyInmate.objects.get_or_create(jail_id=self._inmate_id)
+        defaults = {} if self._seen is None else {'last_seen_date': self._seen}
+        inmate, created = CountyInmate.objects.get_or_create(jail_id=self._inmate_id, defaults=defaults)
         return inmate, created
 
     @staticmethod
@@ -76,6 +100,48 @@ class Inmate:
         """
         return CountyInmate.objects.filter(booking_date=booking_date)
 
+    @staticmethod
+    def known_inmates_ids_between(start_date, end_date):
+        """
+        Returns the jail ids of the inmates booked from start_date to end_date, both included, in one
+        query that is read as it is iterated over, without building models.
+        """
+        return CountyInmate.objects.filter(booking_date__range=(start_date, end_date))\
+                                   .order_by().values_list('jail_id', flat=True).iterator()
+
+    @staticmethod
+    def active_inmates_last_seen(seen_before):
+        """
+        Returns (jail id, last seen date, booking date) of the inmates still in jail last seen before
+        seen_before, in one query that is read as it is iterated over.
+        """
+        return CountyInmate.objects.filter(discharge_date_earliest=None, last_seen_date__lt=seen_before)\
+                                   .order_by().values_list('jail_id', 'last_seen_date', 'booking_date').iterator()
+
+    @staticmethod
+    def active_inmates_ids_with_court_date_between(start_date, end_date):
+        """
+        Returns the set of jail ids of the inmates still in jail with a court date from start_date to
+        end_date, both included.
+        """
+        return set(CourtDate.objects.filter(inmate__discharge_date_earliest=None, date__range=(start_date, end_date))
+                                    .order_by().values_list('inmate_id', flat=True))
+
+    @staticmethod
+    def active_inmates_history_changes_since(since_date):
+        """
+        Returns, for each inmate still in jail, the number of housing and charges changes discovered
+        from since_date on, those with none left out.
+        """
+        changes = {}
+        for history_model, date_field in ((HousingHistory, 'housing_date_discovered'), (ChargesHistory, 'date_seen')):
+            for inmate_id, number_changes in history_model.objects\
+                    .filter(**{'inmate__discharge_date_earliest': None, date_field + '__gte': since_date})\
+                    .order_by().values('inmate_id').annotate(number_changes=Count('id'))\
+                    .values_list('inmate_id', 'number_changes'):
+                changes[inmate_id] = changes.get(inmate_id, 0) + number_changes
+        return changes
+
     @staticmethod
     def recently_discharged_inmates():
         today = date.today()
@@ -89,20 +155,32 @@ class Inmate:
         otherwise returns as inmate's details were not found
         """
         updated_msg = "Updated"
+        change = InmateChange.UPDATED
         try:
             self._inmate, created = self._inmate_record_get_or_create()
+            if created:
+                change = InmateChange.CREATED
+            previous_values = [getattr(self._inmate, field_name) for field_name in LOGGED_FIELDS]
             if self._clear_discharged():
                 updated_msg = "Resurrected"
+                change = InmateChange.RESURRECTED
             self._store_person_id()
             self._store_booking_date()
             self._store_physical_characteristics()
-            self._store_housing_location()
+            new_histories = []
+            if self._store_housing_location():
+                new_histories.append('housing_history')
             self._store_bail_info()
-            self._store_charges()
-            self._store_next_court_info()
+            if self._store_charges():
+                new_histories.append('charges_history')
+            if self._store_next_court_info():
+                new_histories.append('court_dates')
+            if self._seen is not None:
+                self._inmate.last_seen_date = self._seen
             try:
                 self._inmate.save()
-                self._debug("%s inmate %s" % ("Created" if created else updated_msg, self._inmate_id))
+                self._debug("%s inmate %s", ("Created" if created else updated_msg, self._inmate_id))
+                self._log_change(change, self._changed_fields(previous_values) + new_histories)
             except DatabaseError as e:
                 self._debug("Could not save inmate '%s'\nException is %s" % (self._inmate_id, str(e)))
         except DatabaseError as e:
@@ -110,6 +188,17 @@ class Inmate:
         except Exception, e:
             self._debug("Unknown exception for inmate '%s'\nException is %s" % (self._inmate_id, str(e)))
 
+    def _log_change(self, change, fields):
+        """
+        Every creation, resurrection and discharge is logged, updates only when something changed.
+        The inmate's stored document, see InmateDocuments, is out of date whenever a change is logged.
+        """
+        if change != InmateChange.UPDATED or fields:
+            InmateChange.objects.create(jail_id=self._inmate_id, change=change,
+                                        changed=self._seen if self._seen is not None else datetime.now(),
+                                        fields=','.join(fields)[:255])
+            InmateDocument.objects.filter(jail_id=self._inmate_id).delete()
+
     def _store_bail_info(self):
         # Bond: If the value is an integer, it's a dollar
         # amount. Otherwise, it's a status, e.g. "* NO BOND *".
@@ -123,16 +212,17 @@ class Inmate:
         self._inmate.booking_date = self._inmate_details.booking_date()
 
     def _store_charges(self):
-        charges_info = Charges(self._inmate, self._inmate_details, self._monitor)
-        charges_info.save()
+        charges_info = Charges(self._inmate, self._inmate_details, self._monitor, self._date_discovered())
+        return charges_info.save()
 
     def _store_housing_location(self):
-        housing_location_info = HousingLocationInfo(self._inmate, self._inmate_details, self._monitor)
-        housing_location_info.save()
+        housing_location_info = HousingLocationInfo(self._inmate, self._inmate_details, self._monitor,
+                                                    self._date_discovered())
+        return housing_location_info.save()
 
     def _store_next_court_info(self):
         next_court_date_info = CourtDateInfo(self._inmate, self._inmate_details, self._monitor)
-        next_court_date_info.save()
+        return next_court_date_info.save()
 
     def _store_person_id(self):
         self._inmate.person_id = self._inmate_details.hash_id()
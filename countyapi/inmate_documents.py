@@ -0,0 +1,71 @@
+from datetime import datetime
+
+from django.db import transaction
+from django.db.models import Q
+from django.db.utils import DatabaseError
+from django.test.client import RequestFactory
+
+from api import CountyInmateResource, COUNTY_INMATE_URL, INMATE_DOCUMENT_VERSION, RELATED
+from models import CountyInmate, InmateDocument
+
+BATCH_SIZE = 500
+
+_JSON = 'application/json'
+
+
+class InmateDocuments:
+    """
+    Builds the InmateDocument table, the precomputed detail responses of the CountyInmate API.
+
+    Documents are rendered by the API resource itself, so they match what it would have returned.
+    Inmates are processed in batches with their histories prefetched, which costs a handful of
+    queries per batch instead of several per inmate.
+    """
+
+    def __init__(self, monitor):
+        self._monitor = monitor
+        self._resource = CountyInmateResource()
+        self._request_factory = RequestFactory()
+
+    def _debug(self, msg):
+        self._monitor.debug('InmateDocuments: %s' % msg)
+
+    def _render(self, inmate, related):
+        params = {'format': 'json'}
+        if related:
+            params[RELATED] = '1'
+        request = self._request_factory.get('%s%s/' % (COUNTY_INMATE_URL, inmate.jail_id), params)
+        bundle = self._resource.build_bundle(obj=inmate, request=request)
+        bundle = self._resource.full_dehydrate(bundle)
+        bundle = self._resource.alter_detail_data_to_serialize(request, bundle)
+        return self._resource.serialize(request, bundle, _JSON)
+
+    def _store_batch(self, jail_ids, generated):
+        inmates = CountyInmate.objects.filter(jail_id__in=jail_ids)\
+                                      .prefetch_related('court_dates__location', 'housing_history__housing_location',
+                                                        'charges_history')
+        documents = [InmateDocument(jail_id=inmate.jail_id, version=INMATE_DOCUMENT_VERSION, generated=generated,
+                                    document=self._render(inmate, False),
+                                    related_document=self._render(inmate, True))
+                     for inmate in inmates]
+        with transaction.commit_on_success():
+            InmateDocument.objects.filter(jail_id__in=jail_ids).delete()
+            InmateDocument.objects.bulk_create(documents)
+
+    def rebuild(self, seen_since=None):
+        """
+        Rebuilds the documents of inmates seen since seen_since, along with any inmate that has no
+        document of the current version. If seen_since is None all documents are rebuilt.
+        """
+        start_time = datetime.now()
+        inmates = CountyInmate.objects.all()
+        if seen_since is not None:
+            current_documents = InmateDocument.objects.filter(version=INMATE_DOCUMENT_VERSION).values('jail_id')
+            inmates = inmates.filter(Q(last_seen_date__gte=seen_since) | ~Q(jail_id__in=current_documents))
+        jail_ids = list(inmates.values_list('jail_id', flat=True))
+        try:
+            for index in range(0, len(jail_ids), BATCH_SIZE):
+                self._store_batch(jail_ids[index:index + BATCH_SIZE], start_time)
+            self._debug('built %d documents in %s' % (len(jail_ids), str(datetime.now() - start_time)))
+        except DatabaseError as e:
+            self._debug("Could not build inmate documents\nException is %s" % str(e))
@@ -0,0 +1,274 @@
+from datetime import datetime, timedelta
+import json
+from optparse import make_option
+import os
+from random import Random
+import resource
+import signal
+import urllib2
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+import gevent
+from gevent.pool import Pool
+from gevent.pywsgi import WSGIServer
+
+from countyapi.models import CountyInmate, CourtDate, HousingHistory
+
+API_URL = '/api/1.0/'
+
+QUERIES_HEADER = 'X-Benchmark-Queries'
+WORKER_HEADER = 'X-Benchmark-Worker'
+PEAK_MEMORY_HEADER = 'X-Benchmark-Peak-Memory-KB'
+
+PERCENTILES = [50, 95, 99]
+
+# Gunicorn runs the API with this many worker processes, see scripts/gunicorn.sh
+WORKERS = 4
+
+
+class Command(BaseCommand):
+
+    help = ("Load tests the API. Serves it locally from pre forked worker processes, as gunicorn does, and runs a "
+            "mix of list, filter, order, related=1, limit=0 and format requests against the database's inmates, "
+            "from concurrent clients. Reports latency percentiles, throughput and SQL queries for each kind of "
+            "request and the peak memory of each worker. Results can be saved and compared with an earlier run.")
+
+    option_list = BaseCommand.option_list + (
+        make_option('--requests', action='store', type='int', dest='number_requests', default=1000,
+                    help='Total number of requests.'),
+        make_option('--concurrency', action='store', type='int', dest='concurrency', default=20,
+                    help='Number of clients sending requests at once.'),
+        make_option('--workers', action='store', type='int', dest='workers', default=WORKERS,
+                    help='Number of worker processes serving the API.'),
+        make_option('--seed', action='store', type='int', dest='seed', default=0,
+                    help='Seed used to pick the inmates and dates requested.'),
+        make_option('--results-file', action='store', dest='results_file', default=None,
+                    help='Save the results, as JSON, to this file.'),
+        make_option('--compare', action='store', dest='compare', default=None,
+                    help='Results file of an earlier run to compare this one with.'),
+    )
+
+    def handle(self, *args, **options):
+        if options['number_requests'] < 1 or options['concurrency'] < 1 or options['workers'] < 1:
+            raise CommandError('--requests, --concurrency and --workers must be at least 1')
+        if not CountyInmate.objects.exists():
+            raise CommandError('There are no inmates to request, see the generate_dataset command')
+        server = WSGIServer(('127.0.0.1', 0), ProfiledApplication(get_wsgi_application()), log=None)
+        server.init_socket()
+        base_url = 'http://127.0.0.1:%d' % server.server_port
+        worker_pids = start_workers(server, options['workers'])
+        try:
+            # built once the workers are forked, so their peak memory leaves out the requests
+            requests = request_mix(Random(options['seed']), options['number_requests'])
+            results = run_requests(base_url, requests, options['concurrency'])
+        finally:
+            for pid in worker_pids:
+                os.kill(pid, signal.SIGTERM)
+                os.waitpid(pid, 0)
+        results['workers'] = options['workers']
+        results['concurrency'] = options['concurrency']
+        previous = None
+        if options['compare']:
+            with open(options['compare']) as results_file:
+                previous = json.load(results_file)
+        print_results(results, previous)
+        if options['results_file']:
+            with open(options['results_file'], 'w') as results_file:
+                json.dump(results, results_file, indent=2, sort_keys=True)
+
+
+class ProfiledApplication:
+    """
+    Wraps the Django application to tell the client, in response headers, how many SQL queries
+    the request took and which worker, with what peak memory, served it.
+    """
+
+    def __init__(self, application):
+        self._application = application
+
+    def __call__(self, environ, start_response):
+        # connections are per greenlet, so this is the request's own connection
+        connection.use_debug_cursor = True
+        response = {}
+
+        def capture_start_response(status, headers, exc_info=None):
+            response['status'], response['headers'] = status, headers
+            return lambda data: None
+
+        body = self._application(environ, capture_start_response)
+        try:
+            content = ''.join(body)
+            number_queries = len(connection.queries)
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+        start_response(response['status'], response['headers'] + [
+            (QUERIES_HEADER, str(number_queries)),
+            (WORKER_HEADER, str(os.getpid())),
+            (PEAK_MEMORY_HEADER, str(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)),
+        ])
+        return [content]
+
+
+def start_workers(server, number_workers):
+    """
+    Forks the worker processes, each serving the API on the server's listening socket. Returns their pids.
+    """
+    connection.close()
+    worker_pids = []
+    for _ in range(number_workers):
+        pid = gevent.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, lambda signal_number, frame: os._exit(0))
+            server.serve_forever()
+            os._exit(0)
+        worker_pids.append(pid)
+    return worker_pids
+
+
+def request_mix(random, number_requests):
+    """
+    Returns (kind, path) pairs, the kinds in the proportions of REQUEST_KINDS, about inmates and
+    dates picked at random from the database.
+    """
+    jail_ids = list(CountyInmate.objects.values_list('jail_id', flat=True))
+    booking_dates = list(CountyInmate.objects.values_list('booking_date', flat=True).distinct())
+    court_dates = list(CourtDate.objects.values_list('date', flat=True).distinct()[:1000]) or booking_dates
+    housing_dates = list(HousingHistory.objects.values_list('housing_date_discovered', flat=True)
+                         .distinct()[:1000]) or booking_dates
+    values = {
+        'jail_id': lambda: random.choice(jail_ids),
+        'booking_date': lambda: random.choice(booking_dates).strftime('%Y-%m-%d'),
+        'week_before': lambda: (random.choice(booking_dates) - timedelta(7)).strftime('%Y-%m-%d'),
+        'court_date': lambda: random.choice(court_dates).strftime('%Y-%m-%d'),
+        'housing_date': lambda: random.choice(housing_dates).strftime('%Y-%m-%d'),
+        'gender': lambda: random.choice(['M', 'F']),
+        'race': lambda: random.choice(['BK', 'WH', 'LW', 'LB']),
+    }
+    kinds = [kind for kind, weight, _ in REQUEST_KINDS for _ in range(weight)]
+    paths = dict((kind, path) for kind, _, path in REQUEST_KINDS)
+    requests = []
+    for _ in range(number_requests):
+        kind = random.choice(kinds)
+        path = paths[kind]
+        requests.append((kind, API_URL + path.format(**dict((name, value()) for name, value in values.iteritems()
+                                                             if '{%s}' % name in path))))
+    return requests
+
+
+# (kind, weight, path) of the requests made, the weights roughly follow the API's traffic
+REQUEST_KINDS = [
+    ('inmate detail', 20, 'countyinmate/{jail_id}/'),
+    ('inmate detail related', 10, 'countyinmate/{jail_id}/?related=1'),
+    ('inmates in jail', 8, 'countyinmate/?in_jail=true'),
+    ('inmates by booking date', 10, 'countyinmate/?booking_date={booking_date}'),
+    ('inmates booked since, ordered', 8, 'countyinmate/?booking_date__gte={week_before}&order_by=-booking_date'),
+    ('inmates by gender and race', 6, 'countyinmate/?gender={gender}&race={race}&order_by=jail_id'),
+    ('inmates by booking date, limit=0', 5, 'countyinmate/?booking_date={booking_date}&limit=0'),
+    ('inmates by booking date, related', 5, 'countyinmate/?booking_date={booking_date}&related=1'),
+    ('inmates by booking date, csv', 3, 'countyinmate/?booking_date={booking_date}&format=csv'),
+    ('inmates by booking date, jsonp', 2, 'countyinmate/?booking_date={booking_date}&format=jsonp'),
+    ('court dates on a day', 6, 'courtdate/?date={court_date}'),
+    ('court dates on a day, related', 3, 'courtdate/?date={court_date}&related=1'),
+    ('housing history since', 5, 'housinghistory/?housing_date_discovered__gte={housing_date}'
+                                 '&order_by=housing_date_discovered'),
+    ('housing history of an inmate', 4, 'housinghistory/?inmate={jail_id}'),
+    ('daily population counts, limit=0', 3, 'dailypopulationcounts/?limit=0'),
+    ('daily bookings counts, limit=0', 2, 'dailybookingscounts/?booking_date__gte={week_before}&limit=0'),
+]
+
+
+def run_requests(base_url, requests, concurrency):
+    timings = {}
+    workers = {}
+    errors = []
+
+    def make_request(kind, path):
+        start_time = datetime.now()
+        try:
+            response = urllib2.urlopen(base_url + path)
+            response.read()
+        except (urllib2.URLError, IOError) as e:
+            errors.append('%s: %s' % (path, e))
+            return
+        elapsed = (datetime.now() - start_time).total_seconds()
+        timings.setdefault(kind, []).append((elapsed, int(response.info()[QUERIES_HEADER])))
+        worker = response.info()[WORKER_HEADER]
+        workers[worker] = max(workers.get(worker, 0), int(response.info()[PEAK_MEMORY_HEADER]))
+
+    pool = Pool(concurrency)
+    start_time = datetime.now()
+    for kind, path in requests:
+        pool.spawn(make_request, kind, path)
+    pool.join()
+    elapsed = (datetime.now() - start_time).total_seconds()
+    all_timings = [timing for kind_timings in timings.values() for timing in kind_timings]
+    return {
+        'elapsed': elapsed,
+        'errors': errors,
+        'overall': summary(all_timings, elapsed),
+        'kinds': dict((kind, summary(kind_timings, elapsed)) for kind, kind_timings in timings.iteritems()),
+        'worker_peak_memory_mb': sorted(memory_kb / 1024.0 for memory_kb in workers.values()),
+    }
+
+
+def summary(timings, elapsed):
+    latencies = sorted(latency for latency, _ in timings)
+    queries = [number_queries for _, number_queries in timings]
+    result = {
+        'requests': len(timings),
+        'throughput': len(timings) / elapsed if elapsed else 0,
+        'mean_queries': sum(queries) / float(len(queries)) if queries else 0,
+        'max_queries': max(queries) if queries else 0,
+    }
+    for percent in PERCENTILES:
+        result['p%d' % percent] = percentile(latencies, percent)
+    return result
+
+
+def percentile(sorted_values, percent):
+    """
+    Returns the nearest rank percentile of the sorted values
+    """
+    if not sorted_values:
+        return 0
+    rank = max(int(round(percent / 100.0 * len(sorted_values))), 1)
+    return sorted_values[rank - 1]
+
+
+def print_results(results, previous=None):
+    print("%d requests from %d clients to %d workers in %.1f seconds, %d errors" %
+          (results['overall']['requests'], results['concurrency'], results['workers'], results['elapsed'],
+           len(results['errors'])))
+    for error in results['errors'][:10]:
+        print("    %s" % error)
+    print("%-34s %8s %8s %8s %8s %9s %8s" % ('', 'requests', 'p50 ms', 'p95 ms', 'p99 ms', 'req/s', 'queries'))
+    rows = [('overall', results['overall'])] + sorted(results['kinds'].iteritems())
+    for kind, kind_summary in rows:
+        print("%-34s %8d %8.1f %8.1f %8.1f %9.1f %8.1f" %
+              (kind, kind_summary['requests'], kind_summary['p50'] * 1000, kind_summary['p95'] * 1000,
+               kind_summary['p99'] * 1000, kind_summary['throughput'], kind_summary['mean_queries']))
+        previous_summary = previous_kind_summary(previous, kind)
+        if previous_summary:
+            print("%-34s %8s %8s %8s %8s %9s %8s" %
+                  ('    change from earlier run', '', _change(kind_summary, previous_summary, 'p50'),
+                   _change(kind_summary, previous_summary, 'p95'), _change(kind_summary, previous_summary, 'p99'),
+                   _change(kind_summary, previous_summary, 'throughput'),
+                   _change(kind_summary, previous_summary, 'mean_queries')))
+    print("Peak memory per worker: %s MB" % ', '.join('%.1f' % memory for memory in results['worker_peak_memory_mb']))
+
+
+def previous_kind_summary(previous, kind):
+    if not previous:
+        return None
+    if kind == 'overall':
+        return previous['overall']
+    return previous['kinds'].get(kind)
+
+
+def _change(current, previous, field):
+    if not previous[field]:
+        return '-'
+    return '%+.0f%%' % ((current[field] - previous[field]) * 100.0 / previous[field])
@@ -0,0 +1,105 @@
+from datetime import date, datetime
+from importlib import import_module
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from countyapi.inmate import Inmate
+from countyapi.models import CountyInmate
+from countyapi.synthetic_data import SyntheticInmates
+
+
+BATCH_SIZE = 5000
+HOT_QUERY_INDEXES_MIGRATION = '0035_add_hot_query_indexes'
+
+
+class Command(BaseCommand):
+
+    help = "Times the hot inmate queries and shows their query plans, optionally on a synthetic dataset."
+
+    option_list = BaseCommand.option_list + (
+        make_option('--populate', action='store', type='int', dest='populate', default=0,
+                    help='Add this many synthetic inmates to the database before benchmarking.'),
+        make_option('--runs', action='store', type='int', dest='runs', default=5,
+                    help='Number of times each query is run, the average time is reported.'),
+        make_option('--before-after', action='store_true', dest='before_after', default=False,
+                    help=('Benchmark without the hot query indexes, by dropping the indexes of migration %s, '
+                          'and then with them, recreated. Nothing else in the schema is touched.' %
+                          HOT_QUERY_INDEXES_MIGRATION)),
+    )
+
+    def handle(self, *args, **options):
+        if options['populate'] > 0:
+            self.populate(options['populate'])
+        print("Number of inmates: %d" % CountyInmate.objects.count())
+        if options['before_after']:
+            # only the indexes are dropped, migrating back would also drop the tables of the later migrations
+            hot_query_indexes = import_module('countyapi.migrations.%s' % HOT_QUERY_INDEXES_MIGRATION).Migration()
+            with transaction.commit_on_success():
+                hot_query_indexes.backwards(None)
+            try:
+                print("\n*** Before: without hot query indexes ***")
+                self.benchmark(options['runs'])
+            finally:
+                with transaction.commit_on_success():
+                    hot_query_indexes.forwards(None)
+            print("\n*** After: with hot query indexes ***")
+        self.benchmark(options['runs'])
+
+    def benchmark(self, runs):
+        for name, query_set in hot_queries():
+            elapsed = 0
+            for _ in range(runs):
+                start_time = datetime.now()
+                number_rows = len(list(query_set.all()))
+                elapsed += (datetime.now() - start_time).total_seconds()
+            print("\n%s: %d rows, %.4f seconds on average" % (name, number_rows, elapsed / runs))
+            for line in explain(query_set):
+                print("    %s" % line)
+
+    @staticmethod
+    def populate(number_inmates):
+        """
+        Bulk loads synthetic inmates. The last_seen_date field is normally set automatically on every
+        save, here it is switched off so the generated values are stored.
+        """
+        last_seen_date = CountyInmate._meta.get_field('last_seen_date')
+        last_seen_date.auto_now = False
+        try:
+            batch = []
+            with transaction.commit_on_success():
+                for inmate in SyntheticInmates(seed=number_inmates).inmates(number_inmates):
+                    batch.append(CountyInmate(**inmate))
+                    if len(batch) == BATCH_SIZE:
+                        CountyInmate.objects.bulk_create(batch)
+                        batch = []
+                CountyInmate.objects.bulk_create(batch)
+        finally:
+            last_seen_date.auto_now = True
+
+
+def explain(query_set):
+    """
+    Returns the database's query plan for the query set, one line per plan step
+    """
+    sql, params = query_set.query.sql_with_params()
+    explain_cmd = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+    cursor = connection.cursor()
+    cursor.execute(explain_cmd + sql, params)
+    return [' '.join(str(column) for column in row) for row in cursor.fetchall()]
+
+
+def hot_queries():
+    a_week_ago = date.today().toordinal() - 7
+    return [
+        ('active inmates', Inmate.active_inmates()),
+        ('recently discharged inmates', Inmate.recently_discharged_inmates()),
+        ('known inmates for a date', Inmate.known_inmates_for_date(date.fromordinal(a_week_ago))),
+        ('known inmates ids for a week', CountyInmate.objects.filter(booking_date__range=(
+            date.fromordinal(a_week_ago), date.today())).order_by().values_list('jail_id', flat=True)),
+        ('API in_jail=true', CountyInmate.objects.filter(in_jail=True)),
+        ('API booking_date range', CountyInmate.objects.filter(booking_date__gte=date.fromordinal(a_week_ago))),
+        ('API person_id', CountyInmate.objects.filter(person_id='0' * 64)),
+        ('API gender and race', CountyInmate.objects.filter(gender='F', race='WH')),
+    ]
@@ -0,0 +1,112 @@
+from datetime import datetime
+import logging
+from optparse import make_option
+import os.path
+import resource
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from south.management.commands import patch_for_test_db_setup
+
+from countyapi.inmate import Inmate
+from countyapi.models import CountyInmate
+from scraper.controller import Controller
+from scraper.fake_sheriff_site import FakeSheriffSite
+from scraper.http import Http
+from scraper.inmate_details import InmateDetails
+from scraper.inmates import Inmates
+from scraper.inmates_scraper import InmatesScraper, WORKERS_TO_START
+from scraper.monitor import Monitor
+from scraper.raw_inmate_data import RawInmateData
+from scraper.search_commands import SearchCommands
+from utils import yesterday
+
+log = logging.getLogger('main')
+
+
+class Command(BaseCommand):
+
+    help = ("Runs the scraper, Controller, SearchCommands, InmatesScraper and Inmates, against a local fake of the "
+            "sheriff's website and reports pages fetched per second, database writes per second and peak memory. "
+            "It works on a scratch test database, created and destroyed by the command. The first run finds the "
+            "fake site's inmates, the following ones update their status, as on the nights after.")
+
+    option_list = BaseCommand.option_list + (
+        make_option('--runs', action='store', type='int', dest='runs', default=2,
+                    help='Number of scraper runs.'),
+        make_option('--days', action='store', type='int', dest='days', default=7,
+                    help="Number of days of bookings on the fake site, up to yesterday."),
+        make_option('--bookings-per-day', action='store', type='int', dest='bookings_per_day', default=300,
+                    help='Highest booking number on each day.'),
+        make_option('--missing-density', action='store', type='float', dest='missing_density', default=0.05,
+                    help='Fraction of booking numbers, up to the highest, that have no inmate.'),
+        make_option('--latency', action='store', type='float', dest='latency', default=0.05,
+                    help='Average number of seconds the fake site takes to serve a page.'),
+        make_option('--error-rate', action='store', type='float', dest='error_rate', default=0.0,
+                    help='Fraction of requests the fake site fails with a server error.'),
+        make_option('--workers', action='store', type='int', dest='workers', default=WORKERS_TO_START,
+                    help='Number of inmates scraper workers.'),
+        make_option('--attempts', action='store', type='int', dest='attempts', default=1,
+                    help=('Number of attempts at fetching a page. Missing inmates are errors too, so more than one '
+                          'attempt makes every probe for a missing inmate wait between attempts.')),
+        make_option('--pipelined', action='store_true', dest='pipelined', default=False,
+                    help='Run the scrape phases at once, see the scraper --pipelined option.'),
+    )
+
+    def handle(self, *args, **options):
+        site = FakeSheriffSite(days=options['days'], bookings_per_day=options['bookings_per_day'],
+                               missing_density=options['missing_density'], latency=options['latency'],
+                               error_rate=options['error_rate'])
+        details_url = site.start()
+        test_database_name = self.create_scratch_database()
+        try:
+            print("Fake site has %d inmates, serving at %s" % (len(list(site.jail_ids())), details_url))
+            for run in range(1, options['runs'] + 1):
+                if run > 1:
+                    # as if the inmates were last seen by yesterday's run, so they are updated
+                    CountyInmate.objects.update(last_seen_date=datetime.combine(yesterday(), datetime.min.time()))
+                self.benchmark_run(run, details_url, options)
+            print("Peak memory: %.1f MB" % (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0))
+        finally:
+            site.stop()
+            connection.creation.destroy_test_db(test_database_name, verbosity=0)
+
+    @staticmethod
+    def benchmark_run(run, details_url, options):
+        monitor = Monitor(log, no_debug_msgs=int(options['verbosity']) < 2)
+        inmates = Inmates(Inmate, RawInmateData(None, None, monitor), monitor)
+        inmates_scraper = InmatesScraper(Http(number_attempts=options['attempts'], initial_sleep_period=0), inmates,
+                                         InmateDetails, monitor, workers_to_start=options['workers'],
+                                         details_url=details_url)
+        controller = Controller(monitor, SearchCommands(inmates_scraper, monitor), inmates_scraper, inmates)
+        start_time = datetime.now()
+        controller.run(options['pipelined'])
+        controller.wait_for_finish()
+        elapsed = (datetime.now() - start_time).total_seconds()
+        monitor.flush()
+        metrics = monitor.metrics
+        pages_found = metrics.counter('http_fetches', {'found': True})
+        pages = pages_found + metrics.counter('http_fetches', {'found': False})
+        writes = sum(metrics.histogram('db_write_seconds', {'operation': operation}).count
+                     for operation in ['save', 'discharge']
+                     if metrics.histogram('db_write_seconds', {'operation': operation}) is not None)
+        print("Run %d: %.1f seconds, %d pages (%d found) %.1f pages per second, %d database writes %.1f per second, "
+              "%d inmates in jail" % (run, elapsed, pages, pages_found, pages / elapsed, writes, writes / elapsed,
+                                      CountyInmate.objects.filter(discharge_date_earliest=None).count()))
+        for phase, timing in controller.phase_timings.iteritems():
+            print("    %-32s %.1f seconds" % (phase, timing.total_seconds()))
+
+    @staticmethod
+    def create_scratch_database():
+        """
+        Creates the test database, named after the configured one, and switches to it. Every
+        connection, including those of the scraper's greenlets, then uses it.
+        """
+        database = settings.DATABASES['default']
+        if database['ENGINE'].endswith('sqlite3') and not database.get('TEST_NAME'):
+            # the default in memory database would be a different, empty, one for each connection
+            database['TEST_NAME'] = os.path.join(tempfile.gettempdir(), 'benchmark_scraper.sqlite3')
+        patch_for_test_db_setup()
+        return connection.creation.create_test_db(verbosity=0, autoclobber=True)
@@ -0,0 +1,16 @@
+import logging
+
+from django.core.management.base import BaseCommand
+
+from countyapi.inmate_documents import InmateDocuments
+from scraper.monitor import Monitor
+
+log = logging.getLogger('main')
+
+
+class Command(BaseCommand):
+
+    help = "Rebuilds the precomputed JSON documents served by the CountyInmate detail API."
+
+    def handle(self, *args, **options):
+        InmateDocuments(Monitor(log)).rebuild()
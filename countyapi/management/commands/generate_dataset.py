@@ -0,0 +1,82 @@
+from datetime import datetime
+import logging
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from countyapi.bulk_inmates import BulkInmates
+from countyapi.models import ChargesHistory, CountyInmate, CourtDate, HousingHistory
+from countyapi.synthetic_data import BOOKINGS_PER_DAY, MAX_BOOKINGS_PER_DAY, SyntheticInmates
+from scraper.monitor import Monitor
+
+log = logging.getLogger('main')
+
+
+class Command(BaseCommand):
+
+    help = ("Fills the database with a synthetic dataset, inmates with their housing, charges and court date "
+            "histories, using the real housing and court location formats, to reproduce the scaling of the API, "
+            "generate_summaries and audit_db locally. Rows are bulk inserted, a batch of inmates per transaction. "
+            "The same seed generates the same dataset.")
+
+    option_list = BaseCommand.option_list + (
+        make_option('--inmates', action='store', type='int', dest='number_inmates', default=100000,
+                    help='Number of inmates to generate.'),
+        make_option('--bookings-per-day', action='store', type='int', dest='bookings_per_day',
+                    default=BOOKINGS_PER_DAY,
+                    help='Number of inmates booked each day, going back from the end date, at most %d.' %
+                         MAX_BOOKINGS_PER_DAY),
+        make_option('--end-date', action='store', dest='end_date', default=None,
+                    help='Day after the last bookings, format is YYYY-MM-DD, defaults to today.'),
+        make_option('--seed', action='store', type='int', dest='seed', default=0,
+                    help='Seed of the random values.'),
+        make_option('--batch-size', action='store', type='int', dest='batch_size', default=5000,
+                    help='Number of inmates stored per transaction.'),
+    )
+
+    def handle(self, *args, **options):
+        if options['number_inmates'] < 1 or options['batch_size'] < 1 or options['bookings_per_day'] < 1:
+            raise CommandError('--inmates, --batch-size and --bookings-per-day must be at least 1')
+        if options['bookings_per_day'] > MAX_BOOKINGS_PER_DAY:
+            raise CommandError('--bookings-per-day must be at most %d, jail ids hold a 3 digit booking number' %
+                               MAX_BOOKINGS_PER_DAY)
+        end_date = None
+        if options['end_date']:
+            end_date = datetime.strptime(options['end_date'], '%Y-%m-%d').date()
+        start_time = datetime.now()
+        created, updated = generate(SyntheticInmates(seed=options['seed'], end_date=end_date),
+                                    options['number_inmates'], options['bookings_per_day'], options['batch_size'],
+                                    Monitor(log, no_debug_msgs=int(options['verbosity']) < 2))
+        elapsed = (datetime.now() - start_time).total_seconds()
+        print("Stored %d new and %d updated inmates in %.1f seconds, %.0f inmates per second" %
+              (created, updated, elapsed, (created + updated) / elapsed if elapsed else 0))
+        print("Database now holds %d inmates, %d housing history, %d charges history and %d court date rows" %
+              (CountyInmate.objects.count(), HousingHistory.objects.count(), ChargesHistory.objects.count(),
+               CourtDate.objects.count()))
+
+
+def generate(synthetic_inmates, number_inmates, bookings_per_day, batch_size, monitor):
+    """
+    Stores the generated inmates, with their histories, through BulkInmates. Returns the number
+    of inmates created and updated.
+    """
+    bulk_inmates = BulkInmates(monitor)
+    last_seen_date = CountyInmate._meta.get_field('last_seen_date')
+    last_seen_date.auto_now = False
+    created = updated = 0
+    try:
+        batch = []
+        for inmate in synthetic_inmates.inmates(number_inmates, bookings_per_day):
+            record = {'jail_id': inmate.pop('jail_id'), 'fields': inmate}
+            record.update(synthetic_inmates.histories(inmate))
+            batch.append(record)
+            if len(batch) == batch_size:
+                batch_created, batch_updated = bulk_inmates.save(batch)
+                created, updated = created + batch_created, updated + batch_updated
+                batch = []
+        if batch:
+            batch_created, batch_updated = bulk_inmates.save(batch)
+            created, updated = created + batch_created, updated + batch_updated
+    finally:
+        last_seen_date.auto_now = True
+    return created, updated
@@ -0,0 +1,16 @@
+import logging
+
+from django.core.management.base import BaseCommand
+
+from countyapi.current_population import CurrentPopulation
+from scraper.monitor import Monitor
+
+log = logging.getLogger('main')
+
+
+class Command(BaseCommand):
+
+    help = "Rebuilds the current population table from the inmate and history tables."
+
+    def handle(self, *args, **options):
+        CurrentPopulation(Monitor(log)).refresh()
@@ -0,0 +1,181 @@
+from datetime import datetime, time
+import logging
+from optparse import make_option
+import os.path
+import subprocess
+import sys
+import zlib
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from countyapi.current_population import CurrentPopulation
+from countyapi.inmate import Inmate
+from countyapi.inmate_documents import InmateDocuments
+from countyapi.models import CountyInmate
+from scraper.monitor import Monitor
+from scraper.raw_inmate_data import raw_inmate_records, snap_shot_date
+from utils import ONE_DAY
+
+log = logging.getLogger('main')
+
+_MIDNIGHT = time()
+
+
+class Command(BaseCommand):
+
+    args = '<raw inmate data file or directory> ...'
+
+    help = ("Rebuilds or backfills the database from raw inmate data snapshots, the daily CSV or columnar files "
+            "written by the scraper, without fetching anything from the Cook County Jail website. Each inmate goes "
+            "through the same update code as when scraped, snapshots are applied in date order. The current "
+            "population and the inmate documents are rebuilt at the end.")
+
+    option_list = BaseCommand.option_list + (
+        make_option('--workers', action='store', type='int', dest='workers', default=1,
+                    help=('Number of processes, each one replays the inmates whose jail ids hash to it, so every '
+                          'inmate is still updated in date order. Only useful with a database that handles '
+                          'concurrent writers, such as PostgreSQL.')),
+        make_option('--shard', action='store', type='int', dest='shard', default=None,
+                    help='Replay only this shard, of --workers shards, used by the worker processes.'),
+        make_option('--batch-size', action='store', type='int', dest='batch_size', default=500,
+                    help='Number of inmates stored per transaction.'),
+        make_option('--discharge', action='store_true', dest='discharge', default=False,
+                    help=('Discharge inmates that are in a snapshot but missing from the next one, as the scraper '
+                          'does when it can no longer find them.')),
+    )
+
+    def handle(self, *args, **options):
+        snap_shots = snap_shot_files(args)
+        if not snap_shots:
+            raise CommandError('No raw inmate data files given')
+        if options['workers'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--workers and --batch-size must be at least 1')
+        if options['shard'] is not None:
+            print(replay_shard(options['shard'], options['workers'], snap_shots, options['batch_size'],
+                               options['discharge'], int(options['verbosity']) > 1))
+            return
+        start_time = datetime.now()
+        if options['workers'] == 1:
+            number_replayed = replay_shard(0, 1, snap_shots, options['batch_size'], options['discharge'],
+                                           int(options['verbosity']) > 1)
+        else:
+            number_replayed = self.replay_in_workers(args, options)
+        elapsed = (datetime.now() - start_time).total_seconds()
+        print("Replayed %d inmate records from %d files in %.1f seconds, %.0f records per second" %
+              (number_replayed, len(snap_shots), elapsed, number_replayed / elapsed if elapsed else 0))
+        start_time = datetime.now()
+        refresh_derived_data(snap_shots, int(options['verbosity']) > 1)
+        print("Rebuilt the current population and the inmate documents in %.1f seconds" %
+              (datetime.now() - start_time).total_seconds())
+
+    @staticmethod
+    def replay_in_workers(args, options):
+        """
+        Runs this command once per shard, in separate processes rather than with multiprocessing,
+        which does not mix with the gevent monkey patching done by manage.py.
+        """
+        command = [sys.executable, sys.argv[0], 'replay_raw_inmate_data', '--workers=%d' % options['workers'],
+                   '--batch-size=%d' % options['batch_size'], '--verbosity=%s' % options['verbosity']]
+        if options['discharge']:
+            command.append('--discharge')
+        workers = [subprocess.Popen(command + ['--shard=%d' % shard] + list(args), stdout=subprocess.PIPE)
+                   for shard in range(options['workers'])]
+        number_replayed = 0
+        for worker in workers:
+            output, _ = worker.communicate()
+            if worker.returncode != 0:
+                raise CommandError('A replay worker failed with exit code %d' % worker.returncode)
+            number_replayed += int(output.splitlines()[-1])
+        return number_replayed
+
+
+def replay_shard(shard, number_shards, snap_shots, batch_size, discharge, verbose):
+    """
+    Replays, in date order, the inmates of every snapshot whose jail ids fall in the shard.
+    Returns the number of records replayed.
+
+    Most inmates are unchanged from one snapshot to the next, for them all the update code would
+    do is set last_seen_date, so that is done for the whole batch in one query.
+    """
+    monitor = Monitor(log, no_debug_msgs=not verbose)
+    last_seen_date = CountyInmate._meta.get_field('last_seen_date')
+    last_seen_date.auto_now = False
+    number_replayed = 0
+    try:
+        previous_records = {}
+        for snap_shot_date, file_name in snap_shots:
+            seen = _seen(snap_shot_date)
+            records = {}
+            batch = []
+            for inmate_record in raw_inmate_records(file_name):
+                if in_shard(inmate_record.jail_id(), shard, number_shards):
+                    batch.append(inmate_record)
+                    if len(batch) == batch_size:
+                        _save_batch(batch, seen, monitor, previous_records, records)
+                        batch = []
+            _save_batch(batch, seen, monitor, previous_records, records)
+            if discharge:
+                with transaction.commit_on_success():
+                    for jail_id in set(previous_records) - set(records):
+                        Inmate.discharge(jail_id, monitor, seen)
+            previous_records = records
+            number_replayed += len(records)
+    finally:
+        last_seen_date.auto_now = True
+    return number_replayed
+
+
+def refresh_derived_data(snap_shots, verbose):
+    """
+    Rebuilds the CurrentInmate table and the documents of the inmates replayed, those seen since the
+    first snapshot, which were written for the inmates as they were before the replay.
+    """
+    monitor = Monitor(log, no_debug_msgs=not verbose)
+    CurrentPopulation(monitor).refresh()
+    InmateDocuments(monitor).rebuild(seen_since=_seen(snap_shots[0][0]))
+    monitor.flush()
+
+
+def _save_batch(batch, seen, monitor, previous_records, records):
+    unchanged_jail_ids = []
+    with transaction.commit_on_success():
+        for inmate_record in batch:
+            jail_id = inmate_record.jail_id()
+            if previous_records.get(jail_id) == inmate_record:
+                unchanged_jail_ids.append(jail_id)
+            else:
+                Inmate(jail_id, inmate_record, monitor, seen).save()
+            records[jail_id] = inmate_record
+        CountyInmate.objects.filter(jail_id__in=unchanged_jail_ids).update(last_seen_date=seen)
+
+
+def _seen(snap_shot_date):
+    # the scraper names its snapshot after the day before it runs, the date it gives new history
+    return datetime.combine(snap_shot_date + ONE_DAY, _MIDNIGHT)
+
+
+def in_shard(jail_id, shard, number_shards):
+    return zlib.crc32(jail_id.encode('utf-8')) % number_shards == shard
+
+
+def snap_shot_files(paths):
+    """
+    Returns (snapshot date, file name) pairs, in date order, for the given files and the raw
+    inmate data files found under the given directories.
+    """
+    file_names = []
+    for path in paths:
+        if os.path.isdir(path):
+            for dir_path, _, dir_file_names in os.walk(path):
+                file_names.extend(os.path.join(dir_path, file_name) for file_name in dir_file_names)
+        else:
+            file_names.append(path)
+    snap_shots = []
+    for file_name in file_names:
+        file_snap_shot_date = snap_shot_date(file_name)
+        if file_snap_shot_date is not None:
+            snap_shots.append((file_snap_shot_date, file_name))
+        elif file_name in paths:
+            raise CommandError("'%s' is not named after its snapshot date, as in YYYY-MM-DD.csv" % file_name)
+    return sorted(snap_shots)
@@ -0,0 +1,215 @@
+from contextlib import contextmanager
+from datetime import datetime
+import json
+import logging
+
+from django.conf import settings
+from django.core.urlresolvers import Resolver404, resolve
+from django.db import connection, DatabaseError
+from django.db.backends.util import CursorDebugWrapper
+from django.http import HttpResponse
+
+log = logging.getLogger('main')
+
+PROFILE = 'profile'
+
+PROFILE_STATS_PATH = '/api/profile/'
+
+APPLICATION_JSON = 'application/json'
+
+# Number of the request's slowest SQL statements logged with their query plans
+SLOWEST_STATEMENTS = 3
+
+DEHYDRATE = 'dehydrate'
+SERIALIZE = 'serialize'
+META = 'meta'
+PHASES = [DEHYDRATE, SERIALIZE, META]
+
+
+class ProfilerMiddleware:
+    """
+    Profiles the requests, from an IP in ALLOWED_POST_IPS, that ask for it with profile=1. The
+    number of SQL queries, the SQL time, the time spent by JailResource dehydrating, serializing
+    and adding the disclaimer and meta data, and the total time are returned in X-Profile-*
+    response headers, the slowest statements are logged along with their query plans.
+
+    Per endpoint totals are kept for the profiled requests and served, as JSON, at
+    PROFILE_STATS_PATH to allowed IPs. They are per process, so per gunicorn worker.
+
+    The connection records the queries of a profiled request only, it is put back as it was once
+    the request is done, whether it succeeded or not.
+    """
+
+    def process_exception(self, request, exception):
+        profile = getattr(request, PROFILE, None)
+        if profile is not None:
+            profile.stop_recording()
+        return None
+
+    def process_request(self, request):
+        if not allowed(request):
+            return None
+        if request.path_info == PROFILE_STATS_PATH:
+            return HttpResponse(json.dumps(endpoint_stats.as_dict(), indent=2, sort_keys=True),
+                                content_type=APPLICATION_JSON)
+        if request.GET.get(PROFILE) == '1':
+            request.profile = RequestProfile(len(connection.queries))
+            request.profile.start_recording()
+        return None
+
+    def process_response(self, request, response):
+        profile = getattr(request, PROFILE, None)
+        if profile is None:
+            return response
+        profile.stop_recording()
+        profile.finish(connection.queries)
+        response['X-Profile-Queries'] = str(len(profile.queries))
+        response['X-Profile-SQL-Seconds'] = '%.4f' % profile.sql_seconds
+        for phase in PHASES:
+            response['X-Profile-%s-Seconds' % phase.capitalize()] = '%.4f' % profile.phase_seconds[phase]
+        response['X-Profile-Total-Seconds'] = '%.4f' % profile.total_seconds
+        endpoint_stats.add(endpoint(request), profile)
+        log_slowest_statements(request, profile)
+        return response
+
+
+class RequestProfile:
+
+    def __init__(self, first_query):
+        self._first_query = first_query
+        self._recording = None
+        self._start_time = datetime.now()
+        self._active_phases = set()
+        self.phase_seconds = dict((phase, 0.0) for phase in PHASES)
+        self.queries = []
+        self.sql_seconds = 0.0
+        self.total_seconds = 0.0
+
+    def finish(self, queries):
+        self.total_seconds = (datetime.now() - self._start_time).total_seconds()
+        self.queries = queries[self._first_query:]
+        self.sql_seconds = sum(float(query['time']) for query in self.queries)
+
+    def start_recording(self):
+        """
+        Has the connection record the queries, with their parameters, see ParamsCursorDebugWrapper
+        """
+        self._recording = (connection.use_debug_cursor, connection.make_debug_cursor)
+        connection.use_debug_cursor = True
+        connection.make_debug_cursor = lambda cursor: ParamsCursorDebugWrapper(cursor, connection)
+
+    def stop_recording(self):
+        if self._recording is not None:
+            connection.use_debug_cursor, connection.make_debug_cursor = self._recording
+            self._recording = None
+
+    @contextmanager
+    def timed(self, phase):
+        """
+        Adds the time the block takes to the phase. Resources dehydrate their related resources
+        while being dehydrated, only the outermost block is counted.
+        """
+        if phase in self._active_phases:
+            yield
+            return
+        self._active_phases.add(phase)
+        start_time = datetime.now()
+        try:
+            yield
+        finally:
+            self.phase_seconds[phase] += (datetime.now() - start_time).total_seconds()
+            self._active_phases.discard(phase)
+
+
+class EndpointStats:
+
+    def __init__(self):
+        self._stats = {}
+
+    def add(self, endpoint_name, profile):
+        stats = self._stats.setdefault(endpoint_name, {'requests': 0, 'queries': 0, 'sql_seconds': 0.0,
+                                                       'total_seconds': 0.0, 'max_total_seconds': 0.0,
+                                                       'phase_seconds': dict((phase, 0.0) for phase in PHASES)})
+        stats['requests'] += 1
+        stats['queries'] += len(profile.queries)
+        stats['sql_seconds'] += profile.sql_seconds
+        stats['total_seconds'] += profile.total_seconds
+        stats['max_total_seconds'] = max(stats['max_total_seconds'], profile.total_seconds)
+        for phase in PHASES:
+            stats['phase_seconds'][phase] += profile.phase_seconds[phase]
+
+    def as_dict(self):
+        return self._stats
+
+
+endpoint_stats = EndpointStats()
+
+
+class ParamsCursorDebugWrapper(CursorDebugWrapper):
+    """
+    Records each statement as the debug cursor does, along with the statement and parameters as
+    they were run. The recorded sql has the parameters written in, unquoted, which the database
+    cannot always run again, so query plans are asked for with these.
+    """
+
+    def execute(self, sql, params=()):
+        try:
+            return super(ParamsCursorDebugWrapper, self).execute(sql, params)
+        finally:
+            self.db.queries[-1].update(raw_sql=sql, params=params)
+
+
+@contextmanager
+def timed(request, phase):
+    """
+    Times the block as part of the request's profile, does nothing if the request is not profiled.
+    """
+    profile = getattr(request, PROFILE, None)
+    if profile is None:
+        yield
+    else:
+        with profile.timed(phase):
+            yield
+
+
+def allowed(request):
+    return request.META.get('REMOTE_ADDR') in settings.ALLOWED_POST_IPS
+
+
+def endpoint(request):
+    """
+    Names the request's endpoint after its resource and view, as in 'countyinmate api_dispatch_detail'
+    """
+    try:
+        match = resolve(request.path_info)
+    except Resolver404:
+        return request.path_info
+    return ' '.join(name for name in [match.kwargs.get('resource_name'), match.url_name] if name)
+
+
+def explain(query):
+    """
+    Returns the query plan of a recorded query, one line per plan step. Queries recorded without
+    their parameters, such as the several runs of an executemany, are explained as logged.
+    """
+    explain_cmd = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+    try:
+        cursor = connection.cursor()
+        if 'raw_sql' in query:
+            cursor.execute(explain_cmd + query['raw_sql'], query['params'])
+        else:
+            cursor.execute(explain_cmd + query['sql'])
+        return [' '.join(str(column) for column in row) for row in cursor.fetchall()]
+    except DatabaseError as e:
+        reason = '' if 'raw_sql' in query else ', explained without its parameters'
+        return ['no query plan%s: %s' % (reason, e)]
+
+
+def log_slowest_statements(request, profile):
+    slowest = sorted(profile.queries, key=lambda query: float(query['time']), reverse=True)[:SLOWEST_STATEMENTS]
+    log.debug('Profiled %s: %d queries, %.4f seconds of SQL, %.4f seconds in total' %
+              (request.get_full_path(), len(profile.queries), profile.sql_seconds, profile.total_seconds))
+    for query in slowest:
+        log.debug('    %s seconds: %s' % (query['time'], query['sql']))
+        for line in explain(query):
+            log.debug('        %s' % line)
@@ -6,10 +6,10 @@ class CountyInmate(models.Model):
     Model that represents a Cook County Jail inmate.
     """
     jail_id = models.CharField(max_length=15, primary_key=True)
-    person_id = models.CharField(max_length=64, null=True)
+    person_id = models.CharField(max_length=64, null=True, db_index=True)
     race = models.CharField(max_length=4, null=True, blank=True)
     last_seen_date = models.DateTimeField(auto_now=True)
-    booking_date = models.DateField(null=True)
+    booking_date = models.DateField(null=True, db_index=True)
     discharge_date_earliest = models.DateTimeField(null=True)
     discharge_date_latest = models.DateTimeField(null=True)
     gender = models.CharField(max_length=1, null=True, blank=True)
@@ -25,6 +25,13 @@ class CountyInmate(models.Model):
 
     class Meta:
         ordering = ['-jail_id']
+        # supports the active / recently discharged inmate queries used by the scraper
+        # and the in_jail, gender and race filters of the API
+        index_together = [
+            ['discharge_date_earliest', 'last_seen_date'],
+            ['in_jail', 'jail_id'],
+            ['gender', 'race'],
+        ]
 
 
 class CourtDate(models.Model):
@@ -38,6 +45,7 @@ class CourtDate(models.Model):
     class Meta:
         ordering = ['date']
         get_latest_by = 'date'
+        index_together = [['inmate', 'date']]
 
 
 class CourtLocation(models.Model):
@@ -65,6 +73,7 @@ class HousingHistory(models.Model):
     class Meta:
         ordering = ['housing_date_discovered']
         get_latest_by = 'housing_date_discovered'
+        index_together = [['inmate', 'housing_date_discovered']]
 
 
 class HousingLocation(models.Model):
@@ -88,6 +97,9 @@ class ChargesHistory(models.Model):
     charges_citation = models.TextField(null=True)
     date_seen = models.DateField(null=True)
 
+    class Meta:
+        index_together = [['inmate', 'date_seen']]
+
 
 class InmateSummaries(models.Model):
     """
@@ -154,3 +166,79 @@ class DailyBookingsCounts(models.Model):
 
     class Meta:
         ordering = ['booking_date']
+
+
+class CurrentInmate(models.Model):
+    """
+    Model that represents an inmate in the current jail population, with their latest housing
+    location, charges and next court date copied onto the record so it can be read without
+    touching the history tables. Rebuilt at the end of every scrape.
+    """
+    jail_id = models.CharField(max_length=15, primary_key=True)
+    person_id = models.CharField(max_length=64, null=True)
+    race = models.CharField(max_length=4, null=True, blank=True)
+    gender = models.CharField(max_length=1, null=True, blank=True)
+    age_at_booking = models.IntegerField(null=True, blank=True)
+    booking_date = models.DateField(null=True)
+    bail_status = models.CharField(max_length=50, null=True)
+    bail_amount = models.IntegerField(null=True, blank=True)
+    in_jail = models.BooleanField(default=True)
+    housing_location = models.CharField(max_length=40, null=True)
+    division = models.CharField(max_length=4, null=True)
+    in_program = models.CharField(max_length=60, null=True)
+    housing_date_discovered = models.DateField(null=True)
+    charges = models.TextField(null=True)
+    charges_citation = models.TextField(null=True)
+    next_court_date = models.DateField(null=True)
+    court_location = models.TextField(null=True)
+    refreshed = models.DateTimeField()
+
+    def __unicode__(self):
+        return self.jail_id
+
+    class Meta:
+        ordering = ['-jail_id']
+
+
+class InmateDocument(models.Model):
+    """
+    Model that holds the precomputed JSON responses for an inmate's detail views, with and
+    without related=1, so they can be served without any further database access.
+    """
+    jail_id = models.CharField(max_length=15, primary_key=True)
+    version = models.IntegerField()
+    generated = models.DateTimeField()
+    document = models.TextField()
+    related_document = models.TextField()
+
+    def __unicode__(self):
+        return self.jail_id
+
+
+class InmateChange(models.Model):
+    """
+    Model that logs every change the scraper makes to an inmate record, in the order they were
+    made, so API clients can sync just the changes since the last id they saw.
+    """
+    CREATED = 'C'
+    UPDATED = 'U'
+    DISCHARGED = 'D'
+    RESURRECTED = 'R'
+    CHANGE_CHOICES = (
+        (CREATED, 'created'),
+        (UPDATED, 'updated'),
+        (DISCHARGED, 'discharged'),
+        (RESURRECTED, 'resurrected'),
+    )
+
+    jail_id = models.CharField(max_length=15, db_index=True)
+    change = models.CharField(max_length=1, choices=CHANGE_CHOICES)
+    changed = models.DateTimeField()
+    fields = models.CharField(max_length=255, blank=True)
+
+    def __unicode__(self):
+        return '%s %s' % (self.jail_id, self.change)
+
+    class Meta:
+        ordering = ['id']
+
@@ -0,0 +1,188 @@
+from datetime import date, datetime, time
+import hashlib
+from random import Random
+import re
+
+from utils import ONE_DAY
+
+
+BOOKINGS_PER_DAY = 250
+# jail ids end with a 3 digit booking number, YYYY-MMDDnnn
+MAX_BOOKINGS_PER_DAY = 999
+MEAN_LENGTH_OF_STAY = 45  # days
+MEAN_DAYS_BETWEEN_MOVES = 20  # from one housing location to another
+MEAN_DAYS_BETWEEN_COURT_DATES = 21
+
+# Rough make up of the jail population, used as weights
+GENDERS = [('M', 88), ('F', 12)]
+RACES = [('BK', 68), ('LW', 13), ('LB', 3), ('LT', 1), ('WH', 12), ('W', 1), ('AS', 1), ('IN', 1)]
+NO_BOND_STATUSES = ['NO BOND', 'REFUSED', 'BOND IS SET']
+
+# (citation, description) as found on the inmate details page
+CHARGES = [
+    ('720 ILCS 570 402(c) [5101110]', 'POSS AMT CON SUB EXCEPT(A)/(D)'),
+    ('625 ILCS 5 6-303(d) [5883000]', 'DRIVING REVOKED/SUSPENDED 2ND+'),
+    ('720 ILCS 5 12-3.2(a)(1) [10418]', 'DOMESTIC BATTERY/BODILY HARM'),
+    ('720 ILCS 5 19-1(a) [1110000]', 'BURGLARY'),
+    ('720 ILCS 5 16-1(a)(1)(A) [1080000]', 'THEFT/UNAUTHORIZED CONTROL'),
+    ('720 ILCS 5 24-1.6(a)(1) [13500]', 'AGG UUW/VEH/PCL/NO FOID'),
+    ('720 ILCS 5 18-2(a)(2) [1202000]', 'ARMED ROBBERY/ARMED W/FIREARM'),
+    ('720 ILCS 5 12-3.05(d)(4) [16425]', 'AGG BATTERY/PEACE OFFICER'),
+    ('730 ILCS 5 3-3-7 [5000000]', 'PAROLE VIOLATION'),
+    ('720 ILCS 5 9-1(a)(1) [0910000]', 'FIRST DEGREE MURDER'),
+]
+
+# (location name, branch name, address, city, zip code, weight) of the courts inmates are sent to
+COURT_HOUSES = [
+    ('Criminal C', 'Criminal Courts Building', '2650 South California Avenue', 'Chicago', 60608, 60),
+    ('Markham', 'Markham', '16501 South Kedzie Parkway', 'Markham', 60426, 10),
+    ('Skokie', 'Skokie', '5600 Old Orchard Road', 'Skokie', 60077, 8),
+    ('Maywood', 'Maywood', '1500 Maybrook Avenue', 'Maywood', 60153, 8),
+    ('Bridgeview', 'Bridgeview', '10220 South 76th Avenue', 'Bridgeview', 60455, 7),
+    ('Rolling Me', 'Rolling Meadows', '2121 Euclid Avenue', 'Rolling Meadows', 60008, 7),
+]
+
+# Housing location formats of each division of the jail, with weights, see HousingLocationInfo
+HOUSING_LOCATION_FORMATS = [
+    ('01-D-{number}-{letter}-{number}', 10),
+    ('02-D{number}-{letter}-{number}-{letter}', 15),
+    ('03-AX-{letter}-{number}', 2),
+    ('04-{letter}{number}-{number}', 5),
+    ('05-{letter}-{number}-{number}-{number}', 10),
+    ('06-{letter}-{number}-{number}', 10),
+    ('08-{number}{letter}-{letter}-{number}', 5),
+    ('09-{letter}-{number}-{number}', 8),
+    ('10-{letter}-{number}-{number}', 10),
+    ('11-{letter}{letter}-{number}-{number}', 12),
+    ('14-{letter}-{number}', 3),
+    ('15-EM', 6),
+    ('15-DR', 1),
+    ('17-MOMS', 1),
+    ('17-WR-N-{letter}-{number}', 2),
+]
+
+_SIX_PM = time(18)
+
+
+class SyntheticInmates:
+    """
+    Generates statistically plausible, but entirely made up, values for CountyInmate records.
+
+    The generator is seeded so the same dataset can be regenerated to compare runs. Values are
+    returned as dictionaries of model field values, which keeps this module free of any
+    database access; callers decide how to load them.
+    """
+
+    def __init__(self, seed=0, end_date=None):
+        self._random = Random(seed)
+        self._end_date = end_date if end_date is not None else date.today()
+
+    def _age_at_booking(self):
+        return min(max(int(self._random.gauss(33, 11)), 17), 80)
+
+    def _arrival_dates(self, start_date, end_date, mean_days_between):
+        """
+        Returns the dates of events happening on average every mean_days_between days, from
+        start_date to end_date, the first one on start_date
+        """
+        dates = [start_date]
+        while True:
+            next_date = dates[-1] + ONE_DAY * max(int(self._random.expovariate(1.0 / mean_days_between)), 1)
+            if next_date > end_date:
+                return dates
+            dates.append(next_date)
+
+    def _bail(self):
+        if self._random.random() < 0.2:
+            return None, self._random.choice(NO_BOND_STATUSES)
+        return self._random.choice([1000, 2500, 5000, 10000, 20000, 50000, 100000, 250000]), None
+
+    def _court_location(self):
+        location_name, branch_name, address, city, zip_code = self._pick([(court_house[:5], court_house[5])
+                                                                           for court_house in COURT_HOUSES])
+        room_number = self._random.randint(101, 799)
+        return '%s\n%s, Room:%d\n%s Room: %d\n%s, IL %d' % (location_name, branch_name, room_number, address,
+                                                            room_number, city, zip_code)
+
+    def _discharge_date(self, booking_date):
+        length_of_stay = int(self._random.expovariate(1.0 / MEAN_LENGTH_OF_STAY))
+        discharge_date = booking_date + ONE_DAY * length_of_stay
+        return None if discharge_date >= self._end_date else discharge_date
+
+    def histories(self, inmate):
+        """
+        Generates the housing, charges and court date histories of an inmate, as returned by inmate(),
+        in the (housing location, date discovered), (charges, citation, date seen) and (court date,
+        court location) forms used by bulk_inmates.
+        """
+        last_seen = inmate['last_seen_date'].date()
+        first_seen = min(inmate['booking_date'] + ONE_DAY, last_seen)
+        housing_history = [(self._housing_location(), moved)
+                           for moved in self._arrival_dates(first_seen, last_seen, MEAN_DAYS_BETWEEN_MOVES)]
+        charges_history = []
+        for date_seen in [first_seen] + ([last_seen] if self._random.random() < 0.1 else []):
+            citation, description = self._random.choice(CHARGES)
+            charges_history.append((description, citation, date_seen))
+        court_location = self._court_location()
+        court_dates = []
+        for court_date in self._arrival_dates(first_seen, last_seen + ONE_DAY * 30, MEAN_DAYS_BETWEEN_COURT_DATES):
+            if self._random.random() < 0.2:
+                court_location = self._court_location()
+            court_dates.append((court_date, court_location))
+        return {'housing_history': housing_history, 'charges_history': charges_history, 'court_dates': court_dates}
+
+    def _housing_location(self):
+        return re.sub(r'\{(number|letter)\}',
+                      lambda match: (str(self._random.randint(1, 4)) if match.group(1) == 'number'
+                                     else self._random.choice('ABCDEFGHJKLN')),
+                      self._pick(HOUSING_LOCATION_FORMATS))
+
+    def _pick(self, weighted_choices):
+        choice = self._random.uniform(0, sum(weight for _, weight in weighted_choices))
+        for value, weight in weighted_choices:
+            choice -= weight
+            if choice <= 0:
+                return value
+        return weighted_choices[-1][0]
+
+    def inmate(self, jail_id, booking_date):
+        gender, race = self._pick(GENDERS), self._pick(RACES)
+        bail_amount, bail_status = self._bail()
+        discharge_date = self._discharge_date(booking_date)
+        if discharge_date is None:
+            last_seen = datetime.combine(max(self._end_date - ONE_DAY, booking_date), _SIX_PM)
+            discharge_earliest = discharge_latest = None
+        else:
+            last_seen = discharge_earliest = datetime.combine(discharge_date, _SIX_PM)
+            discharge_latest = discharge_earliest + ONE_DAY
+        return {
+            'jail_id': jail_id,
+            'person_id': hashlib.sha256('%s%d' % (jail_id, self._random.random())).hexdigest(),
+            'race': race,
+            'gender': gender,
+            'height': self._random.randint(500, 606),
+            'weight': self._random.randint(110, 300),
+            'age_at_booking': self._age_at_booking(),
+            'booking_date': booking_date,
+            'bail_amount': bail_amount,
+            'bail_status': bail_status,
+            'last_seen_date': last_seen,
+            'discharge_date_earliest': discharge_earliest,
+            'discharge_date_latest': discharge_latest,
+            'in_jail': discharge_date is None and self._random.random() < 0.9,
+        }
+
+    def inmates(self, number_inmates, bookings_per_day=BOOKINGS_PER_DAY):
+        """
+        Generates number_inmates inmates, booked over consecutive days ending the day before the end
+        date.
+        """
+        number_days = (number_inmates + bookings_per_day - 1) / bookings_per_day
+        booking_date = self._end_date - ONE_DAY * number_days
+        generated = 0
+        while generated < number_inmates:
+            for booking_number in range(1, min(bookings_per_day, number_inmates - generated) + 1):
+                jail_id = booking_date.strftime('%Y-%m%d') + '%03d' % booking_number
+                yield self.inmate(jail_id, booking_date)
+                generated += 1
+            booking_date += ONE_DAY
@@ -2,7 +2,8 @@ from django.conf.urls import patterns, include, url
 from tastypie.api import Api
 from countyapi.api import CountyInmateResource, CourtLocationResource, \
     CourtDateResource, HousingLocationResource, HousingHistoryResource, \
-    DailyPopulationCountsResource, DailyBookingsCountsResource, ChargesHistoryResource
+    DailyPopulationCountsResource, DailyBookingsCountsResource, ChargesHistoryResource, CurrentPopulationResource, \
+    InmateChangeResource
 
 v1_api = Api(api_name='1.0')
 v1_api.register(CountyInmateResource())
@@ -13,5 +14,7 @@ v1_api.register(HousingHistoryResource())
 v1_api.register(DailyPopulationCountsResource())
 v1_api.register(DailyBookingsCountsResource())
 v1_api.register(ChargesHistoryResource())
+v1_api.register(CurrentPopulationResource())
+v1_api.register(InmateChangeResource())
 
 urlpatterns = patterns('', url(r'^api/', include(v1_api.urls)))
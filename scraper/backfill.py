@@ -0,0 +1,175 @@
+from time import time
+
+import gevent
+
+from controller import Controller
+from countyapi.inmate import Inmate
+from http import Http
+from inmate_details import InmateDetails
+from inmates import Inmates
+from inmates_scraper import InmatesScraper, CCJ_INMATE_DETAILS_URL
+from jail_ids import JailIdIndex
+from raw_inmate_data import RawInmateData
+from request_budget import RequestBudget
+from search_commands import MAX_INMATE_NUMBER, SearchCommands
+from utils import ONE_DAY, yesterday
+
+# fetching workers of a backfill, split between its pipelines, as many as a nightly run has
+WORKERS = 70
+
+# the most requests a sharded backfill sends the sheriff's site, all pipelines together, unless told
+# otherwise, about what the nightly run's workers send
+REQUESTS_PER_SECOND = 20
+
+# seconds between the progress reports of a backfill
+PROGRESS_REPORT_INTERVAL = 60
+
+
+class Backfill:
+    """
+    Searches for the inmates, booked from start_date to end_date, that are missing from the
+    database, as after an outage. The days are split into shards, each one searched at the same
+    time by a pipeline of its own, Controller, SearchCommands and InmatesScraper, the workers
+    split between them. The pipelines together send at most requests_per_second requests, see
+    RequestBudget, REQUESTS_PER_SECOND by default when there are several shards, as many as the
+    workers manage when there is one. They share the ids of the inmates already known, looked up
+    once, and hand the inmates found to one Inmates, so the database has a single writer.
+    Progress is reported as each day is done and every PROGRESS_REPORT_INTERVAL.
+    """
+
+    def __init__(self, monitor, start_date, end_date=None, shards=1, requests_per_second=None,
+                 workers=WORKERS, http_attempts=None, details_url=CCJ_INMATE_DETAILS_URL):
+        self._monitor = monitor
+        self._start_date = start_date
+        self._end_date = end_date
+        self._shards = shards
+        if requests_per_second is None and shards > 1:
+            requests_per_second = REQUESTS_PER_SECOND
+        self._request_budget = RequestBudget(requests_per_second) if requests_per_second is not None else None
+        self._workers = workers
+        self._http_attempts = http_attempts
+        self._details_url = details_url
+
+    def _debug(self, msg):
+        self._monitor.debug('Backfill: %s' % msg)
+
+    def _pipeline(self, inmates, workers, progress):
+        monitor = self._monitor.for_pipeline()
+        http = Http(request_budget=self._request_budget) if self._http_attempts is None else \
+            Http(number_attempts=self._http_attempts, request_budget=self._request_budget)
+        inmates_scraper = InmatesScraper(http, inmates, InmateDetails, monitor, workers_to_start=workers,
+                                         details_url=self._details_url, progress=progress)
+        return monitor, Controller(monitor, SearchCommands(inmates_scraper, monitor), inmates_scraper, inmates,
+                                   finish_inmates=False)
+
+    def run(self):
+        end_date = self._end_date if self._end_date is not None else yesterday()
+        known_inmates_ids = JailIdIndex(Inmate.known_inmates_ids_between(self._start_date, end_date))
+        progress = BackfillProgress(self._monitor, expected_probes(known_inmates_ids, self._start_date, end_date))
+        progress.start()
+        inmates = Inmates(Inmate, RawInmateData(None, None, self._monitor), self._monitor)
+        shards = shard_date_ranges(self._start_date, end_date, self._shards)
+        pipelines = []
+        for shard_start_date, shard_end_date in shards:
+            self._debug('searching %s to %s' % (shard_start_date, shard_end_date))
+            monitor, controller = self._pipeline(inmates, max(self._workers // len(shards), 1), progress)
+            controller.find_missing_inmates(shard_start_date, shard_end_date, known_inmates_ids)
+            pipelines.append((monitor, controller))
+        self._debug('waiting for the %d pipelines to finish' % len(pipelines))
+        for monitor, controller in pipelines:
+            controller.wait_for_finish()
+            monitor.flush()
+        inmates.finish()
+        inmates.wait_until_idle()
+        progress.stop()
+        return progress
+
+
+class BackfillProgress:
+    """
+    Counts the probes for inmates, and the inmates found, on each day of a backfill. The
+    InmatesScraper tells it of every probe, see probed().
+    """
+
+    def __init__(self, monitor, expected_probes, report_interval=PROGRESS_REPORT_INTERVAL):
+        self._monitor = monitor
+        self._expected_probes = expected_probes
+        self._report_interval = report_interval
+        self._probes = dict.fromkeys(expected_probes, 0)
+        self._found = dict.fromkeys(expected_probes, 0)
+        self.days_done = len([day for day, number_probes in expected_probes.iteritems() if number_probes == 0])
+        self._start_time = time()
+        self._reporter = None
+
+    def _debug(self, msg, args=None):
+        self._monitor.debug('Backfill: ' + msg, args=args)
+
+    def found(self):
+        return sum(self._found.itervalues())
+
+    def probed(self, inmate_id, found):
+        day = _day_key(inmate_id)
+        self._probes[day] = self._probes.get(day, 0) + 1
+        if found:
+            self._found[day] = self._found.get(day, 0) + 1
+        if self._probes[day] == self._expected_probes.get(day):
+            self.days_done += 1
+            self._debug('day %s done, %d probes, %d inmates found, %d of %d days done',
+                        (day, self._probes[day], self._found[day], self.days_done, len(self._expected_probes)))
+
+    def probes(self):
+        return sum(self._probes.itervalues())
+
+    def report(self):
+        elapsed = time() - self._start_time
+        self._debug('%d of %d probes, %d inmates found, %.1f probes per second, %d of %d days done',
+                    (self.probes(), sum(self._expected_probes.itervalues()), self.found(),
+                     self.probes() / elapsed if elapsed else 0, self.days_done, len(self._expected_probes)))
+
+    def _report_periodically(self):
+        while True:
+            gevent.sleep(self._report_interval)
+            self.report()
+
+    def start(self):
+        self._start_time = time()
+        self._reporter = gevent.spawn(self._report_periodically)
+
+    def stop(self):
+        if self._reporter is not None:
+            self._reporter.kill()
+            self._reporter = None
+        self.report()
+
+
+def expected_probes(known_inmates_ids, start_date, end_date, number_to_fetch=MAX_INMATE_NUMBER):
+    """
+    Returns, for each day, the number of booking numbers the search probes, those not already known.
+    """
+    probes = {}
+    cur_date = start_date
+    while cur_date <= end_date:
+        known = [number for number in known_inmates_ids.booking_numbers_on(cur_date) if 1 <= number <= number_to_fetch]
+        probes[cur_date.strftime('%Y-%m%d')] = number_to_fetch - len(known)
+        cur_date += ONE_DAY
+    return probes
+
+
+def shard_date_ranges(start_date, end_date, shards):
+    """
+    Splits the days from start_date to end_date into at most shards (start, end) ranges of
+    consecutive days, the lengths differing by one day at most.
+    """
+    number_days = (end_date - start_date).days + 1
+    shards = max(min(shards, number_days), 1)
+    ranges = []
+    shard_start_date = start_date
+    for shard in range(shards):
+        shard_days = number_days // shards + (1 if shard < number_days % shards else 0)
+        ranges.append((shard_start_date, shard_start_date + ONE_DAY * (shard_days - 1)))
+        shard_start_date += ONE_DAY * shard_days
+    return ranges
+
+
+def _day_key(inmate_id):
+    return inmate_id[0:9]
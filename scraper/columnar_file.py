@@ -0,0 +1,179 @@
+from array import array
+from datetime import datetime
+import json
+import os
+import struct
+import sys
+import zlib
+
+MAGIC = 'CCJCOLUMNAR1\n'
+
+# Column types, values are stored as their JSON representation and converted back on reading
+DATE = 'date'
+DATETIME = 'datetime'
+INTEGER = 'integer'
+STRING = 'string'
+
+# Column encodings
+DICTIONARY = 'dictionary'  # each distinct value stored once, rows hold its index
+PLAIN = 'plain'  # for columns where most values are unique, like ids
+
+_DATE_FORMAT = '%Y-%m-%d'
+_DATETIME_FORMAT = '%Y-%m-%dT%H:%M:%S'
+_HEADER_LENGTH = struct.Struct('<I')
+
+
+def _decode_value(value, column_type):
+    if value is None:
+        return None
+    if column_type == DATE:
+        return datetime.strptime(value, _DATE_FORMAT).date()
+    if column_type == DATETIME:
+        return datetime.strptime(value, _DATETIME_FORMAT)
+    return value
+
+
+def _encode_value(value, column_type):
+    if value is None:
+        return None
+    if column_type == DATE:
+        return value.strftime(_DATE_FORMAT)
+    if column_type == DATETIME:
+        return value.strftime(_DATETIME_FORMAT)
+    if column_type == INTEGER:
+        return int(value)
+    return unicode(value)
+
+
+def _little_endian(codes):
+    if sys.byteorder != 'little':
+        codes.byteswap()
+    return codes
+
+
+class ColumnarWriter:
+    """
+    Writes a table to a compressed, column oriented, file. Rows are kept in memory until close(),
+    when each column is encoded and compressed on its own, so a reader can load just the columns it
+    needs. The whole table is held in memory until then, close() writes the file and fsyncs it.
+
+    The file holds a JSON header, giving the number of rows and where each column's data is, followed
+    by the zlib compressed column data. Dictionary encoded columns are stored as a JSON list of their
+    distinct values plus an array of indexes into it, one per row.
+    """
+
+    def __init__(self, file_name, columns, compression_level=6):
+        """
+        columns is a list of (name, type, encoding) tuples, in the order values are given to add()
+        """
+        self._file_name = file_name
+        self._columns = columns
+        self._compression_level = compression_level
+        self._values = [[] for _ in columns]
+        self._number_rows = 0
+
+    def add(self, row):
+        for column_values, value in zip(self._values, row):
+            column_values.append(value)
+        self._number_rows += 1
+
+    def close(self):
+        chunks = []
+
+        def add_chunk(data):
+            offset = sum(len(chunk) for chunk in chunks)
+            chunks.append(zlib.compress(data, self._compression_level))
+            return [offset, len(chunks[-1])]
+
+        header_columns = []
+        for (name, column_type, encoding), column_values in zip(self._columns, self._values):
+            encoded_values = [_encode_value(value, column_type) for value in column_values]
+            header_column = {'name': name, 'type': column_type, 'encoding': encoding}
+            if encoding == DICTIONARY:
+                dictionary, codes = self._dictionary_encode(encoded_values)
+                header_column['dictionary'] = add_chunk(json.dumps(dictionary))
+                header_column['typecode'] = codes.typecode
+                header_column['codes'] = add_chunk(_little_endian(codes).tostring())
+            else:
+                header_column['values'] = add_chunk(json.dumps(encoded_values))
+            header_columns.append(header_column)
+        header = json.dumps({'number_rows': self._number_rows, 'columns': header_columns})
+        with open(self._file_name, 'wb') as columnar_file:
+            columnar_file.write(MAGIC)
+            columnar_file.write(_HEADER_LENGTH.pack(len(header)))
+            columnar_file.write(header)
+            for chunk in chunks:
+                columnar_file.write(chunk)
+            columnar_file.flush()
+            os.fsync(columnar_file.fileno())
+        self._values = [[] for _ in self._columns]
+
+    @staticmethod
+    def _dictionary_encode(values):
+        dictionary, codes, value_codes = [], [], {}
+        for value in values:
+            code = value_codes.get(value)
+            if code is None:
+                code = value_codes[value] = len(dictionary)
+                dictionary.append(value)
+            codes.append(code)
+        return dictionary, array('H' if len(dictionary) <= 0xFFFF else 'I', codes)
+
+
+class ColumnarReader:
+    """
+    Reads files written by ColumnarWriter. Only the columns asked for are read and decompressed.
+    """
+
+    def __init__(self, file_name):
+        self._file = open(file_name, 'rb')
+        if self._file.read(len(MAGIC)) != MAGIC:
+            self._file.close()
+            raise ValueError("'%s' is not a columnar file" % file_name)
+        header_length, = _HEADER_LENGTH.unpack(self._file.read(_HEADER_LENGTH.size))
+        header = json.loads(self._file.read(header_length))
+        self._data_start = self._file.tell()
+        self.number_rows = header['number_rows']
+        self._columns = header['columns']
+        self.column_names = [column['name'] for column in self._columns]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def _chunk(self, location):
+        offset, length = location
+        self._file.seek(self._data_start + offset)
+        return zlib.decompress(self._file.read(length))
+
+    def close(self):
+        self._file.close()
+
+    def column(self, name):
+        """
+        Returns the list of values of the named column
+        """
+        try:
+            header_column = self._columns[self.column_names.index(name)]
+        except ValueError:
+            raise KeyError(name)
+        column_type = header_column['type']
+        if header_column['encoding'] == DICTIONARY:
+            dictionary = [_decode_value(value, column_type)
+                          for value in json.loads(self._chunk(header_column['dictionary']))]
+            codes = array(str(header_column['typecode']))
+            codes.fromstring(self._chunk(header_column['codes']))
+            return [dictionary[code] for code in _little_endian(codes)]
+        return [_decode_value(value, column_type) for value in json.loads(self._chunk(header_column['values']))]
+
+    def rows(self, column_names=None):
+        """
+        Generates the rows as dictionaries, holding just the named columns or all of them
+        """
+        if column_names is None:
+            column_names = self.column_names
+        columns = [self.column(name) for name in column_names]
+        for index in range(self.number_rows):
+            yield dict((name, column[index]) for name, column in zip(column_names, columns))
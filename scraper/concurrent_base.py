@@ -1,8 +1,11 @@
-from datetime import date
+from heapq import heappop, heappush
+from itertools import count
+from time import time
 
 import gevent
-from gevent.queue import JoinableQueue
-from monitor import MONITOR_VERBOSE_DMSG_LEVEL
+from gevent.event import Event
+from joinable_priority_queue import JoinablePriorityQueue
+from monitor import MONITOR_DEFAULT_DMSG_LEVEL, MONITOR_VERBOSE_DMSG_LEVEL
 from throwable_commands_queue import ThrowawayCommandsQueue
 
 
@@ -14,21 +17,41 @@ class ConcurrentBase(object):
     + _notify()
     + _put()
     + finish()
+    + wait_until_idle()
 
+    Commands are carried out earliest deadline first. A command's deadline is the time it was put
+    plus the deadline given to _put(), so a command with a short deadline jumps ahead of those with
+    longer ones, but never ahead of one that has waited longer than the difference between them.
+    Commands with the same deadline are carried out in the order they were put.
+
+    With max_pending set, at most that many commands wait in the queue and _put() blocks until a
+    worker frees a place, which holds back whatever is feeding commands faster than they can be
+    carried out. A freed place goes to the blocked command with the earliest deadline, not to the
+    one that blocked first, so a saturated queue keeps the same order. max_queue_depth and
+    blocked_puts record how full the queue got.
     """
-    
-    def __init__(self, monitor, workers=1):
+
+    def __init__(self, monitor, workers=1, max_pending=None):
         self.klass = type(self)
         self.klass_name = self.klass.__name__
         self.FINISHED_PROCESSING = '{0}: finished processing'.format(self.klass_name)
         self._monitor = monitor
         self._workers_to_start = workers
+        self._max_pending = max_pending
+        self.max_queue_depth = 0
+        self.blocked_puts = 0
+        # the commands in the queue, and the blocked ones waiting for a place, earliest deadline first
+        self._places_taken = 0
+        self._blocked_commands = []
         self._read_commands_q, self._write_commands_q = None, None
+        self._commands_put = count()
         self._setup_command_system()
         gevent.sleep(0)
 
-    def _debug(self, msg, debug_level=None):
-        self._monitor.debug('{0}: {1}'.format(self.klass_name, msg), debug_level)
+    def _debug(self, msg, debug_level=None, args=None):
+        # checked first so a message at a level that is off costs no more than the check
+        if self._monitor.debug_enabled(debug_level if debug_level is not None else MONITOR_DEFAULT_DMSG_LEVEL):
+            self._monitor.debug(self.klass_name + ': ' + msg, debug_level, args)
 
     def finish(self):
         self._prevent_new_requests_from_being_processed()
@@ -46,25 +69,65 @@ class ConcurrentBase(object):
         while True:
             try:
                 ## do arbitrary command
-                func, args = self._read_commands_q.get()
+                _, _, func, args = self._read_commands_q.get()
+                self._free_place()
                 func(args)
             finally:
                 self._read_commands_q.task_done()
 
-    def _put(self, method, args):
-        ## tell some worker to do arbitrary command
-        self._write_commands_q.put((method, args))
+    def _free_place(self):
+        if self._max_pending is None:
+            return
+        if self._blocked_commands:
+            # the place goes straight to the most urgent blocked command, queued here rather than
+            # by its _put() so the queue never looks done while it is on its way
+            command, admitted = heappop(self._blocked_commands)
+            self._read_commands_q.put(command)
+            admitted.set()
+        else:
+            self._places_taken -= 1
+
+    def _put(self, method, args, deadline=0):
+        ## tell some worker to do arbitrary command, deadline is in seconds from now
+        command = (time() + deadline, next(self._commands_put), method, args)
+        commands_q = self._write_commands_q
+        bounded = self._max_pending is not None and commands_q is self._read_commands_q
+        if bounded and self._places_taken == self._max_pending:
+            # _free_place() queues the command once it gets a place
+            self.blocked_puts += 1
+            admitted = Event()
+            heappush(self._blocked_commands, (command, admitted))
+            admitted.wait()
+        else:
+            if bounded:
+                self._places_taken += 1
+            commands_q.put(command)
+        self.max_queue_depth = max(self.max_queue_depth, commands_q.qsize())
         gevent.sleep(0)
 
+    def wait_until_idle(self):
+        """
+        Blocks until every command put so far has been carried out
+        """
+        self._read_commands_q.join()
+
+    def queue_depth(self):
+        return self._read_commands_q.qsize()
+
     def _setup_command_system(self):
         # we have two refs to the commands queue,
         # but write_commands_q will switch to throwaway
-        # after we receive a finish command
-        self._read_commands_q = JoinableQueue(None)
+        # after we receive a finish command, max_pending is kept by _put() rather than the queue
+        # as the queue wakes its blocked puts in the order they blocked
+        self._read_commands_q = JoinablePriorityQueue()
         self._write_commands_q = self._read_commands_q 
         for x in range(self._workers_to_start):
             gevent.spawn(self._process_commands)
 
     def _wait_for_processing_to_finish(self):
         self._read_commands_q.join()
+        self._debug('command queue peaked at %d of %s pending commands, puts blocked %d times',
+                    args=(self.max_queue_depth, self._max_pending or 'unlimited', self.blocked_puts))
+        self._monitor.metrics.set_gauge('queue_max_depth', self.max_queue_depth, {'stage': self.klass_name})
+        self._monitor.metrics.set_gauge('queue_blocked_puts', self.blocked_puts, {'stage': self.klass_name})
         self._monitor.notify(self.klass, self.FINISHED_PROCESSING)
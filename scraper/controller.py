@@ -1,9 +1,12 @@
-from datetime import date
+from collections import OrderedDict
+from datetime import date, datetime
 
 import gevent
+from gevent.event import Event
 from gevent.queue import Queue
 
 from heartbeat import Heartbeat
+from jail_ids import JailIdIndex
 
 from search_commands import SearchCommands
 from utils import ONE_DAY
@@ -12,176 +15,231 @@ from utils import ONE_DAY
 NEW_INMATE_SEARCH_WINDOW_SIZE = 5
 
 
+class Phase:
+    """
+    A step of a Controller pipeline. start is called, in its own greenlet, once every phase named
+    in after has finished. The phase finishes when notifier sends msg, a msg of None matching any
+    message, or, if there is no notifier, as soon as start returns.
+    """
+
+    def __init__(self, name, start, notifier=None, msg=None, after=()):
+        self.name = name
+        self.start = start
+        self.notifier = notifier
+        self.msg = msg
+        self.after = after
+
+    def finished_by(self, notifier, msg):
+        return self.notifier is not None and notifier == self.notifier and self.msg in (None, msg)
+
+
 class Controller:
+    """
+    Orchestrates a scrape as a pipeline of phases, see Phase. The controller does nothing between
+    phases: it is driven by the notifications it listens for, and the heartbeat that used to wake
+    it every second is off unless asked for. How long each phase took is kept in phase_timings.
+
+    With finish_inmates False the inmates writer is shared with other controllers, it is left
+    running at the end of the pipeline for its owner to finish.
+    """
 
     _CONTROLLER_NOTIFY_MSG_TEMPLATE = 'Controller: %s'
-    _RECEIVED_ACTIVE_IDS_COMMAND = _CONTROLLER_NOTIFY_MSG_TEMPLATE % 'Received active ids'
-    _RECEIVED_KNOWN_INMATES_COMMAND = _CONTROLLER_NOTIFY_MSG_TEMPLATE % 'Received known inmates ids'
-    _RECEIVED_RECENTLY_DISCHARGED_INMATES_IDS_COMMAND = \
-        _CONTROLLER_NOTIFY_MSG_TEMPLATE % 'Received recently discharged inmates ids'
-    _START_COMMAND = _CONTROLLER_NOTIFY_MSG_TEMPLATE % 'Start'
     STOP_COMMAND = _CONTROLLER_NOTIFY_MSG_TEMPLATE % 'Halt'
 
-    def __init__(self, monitor, search_commands, inmate_scraper, inmates):
+    def __init__(self, monitor, search_commands, inmate_scraper, inmates, heartbeat=False, finish_inmates=True):
         self._monitor = monitor
         self._search_commands = search_commands
         self._inmate_scraper = inmate_scraper
         self._inmates = inmates
+        self._heartbeat = heartbeat
+        self._finish_inmates = finish_inmates
         self.heartbeat_count = 0
         self.is_running = False
+        self.phase_timings = OrderedDict()
         self._worker = []
-        self.inmates_response_q = Queue(None)
-        self._inmates_worker = []
-        self._inmates_response = []
+        self.inmates_response_q = Queue(1)
+        # pipelined runs have two requests to inmates outstanding at once
+        self.discharged_inmates_response_q = Queue(1)
         self._start_date_missing_inmates = None
-        self._active_inmate_ids = []
+        self._end_date_missing_inmates = None
+        self._active_inmate_ids = JailIdIndex()
+        self._known_inmate_ids = JailIdIndex()
+        self._recently_discharged_ids = JailIdIndex()
+        self._phases = []
+        self._phases_started = {}
+        self._phases_finished = set()
+        self._stopped = Event()
         self._today = date.today()
 
     def _active_inmates(self):
         self._inmates.active_inmates_ids(self.inmates_response_q)
-        self._retrieve_inmates_response(self._RECEIVED_ACTIVE_IDS_COMMAND)
+        self._active_inmate_ids = self.inmates_response_q.get()
+
+    def _check_if_really_discharged(self):
+        self._search_commands.check_if_really_discharged(self._recently_discharged_ids)
 
     def _debug(self, msg):
         self._monitor.debug('Controller: %s' % msg)
 
-    def _end_index_active_inmate_ids_in_search_window(self):
-        end_date = (self._today - ONE_DAY * (NEW_INMATE_SEARCH_WINDOW_SIZE + 2)).strftime('%Y-%m%d')
-        for i in range(len(self._active_inmate_ids)):
-            if end_date >= self._active_inmate_ids[i][0:9]:
-                return i
-        return len(self._active_inmate_ids)
-
-    def find_missing_inmates(self, start_date):
+    def _finish_phases(self):
+        phases = [Phase('inmates scraper finish', self._inmate_scraper.finish, self._inmate_scraper.__class__,
+                        after=[self._phases[-1].name])]
+        if self._finish_inmates:
+            phases.append(Phase('inmates finish', self._inmates.finish, self._inmates.__class__,
+                                after=['inmates scraper finish']))
+        return phases
+
+    def find_missing_inmates(self, start_date, end_date=None, known_inmates_ids=None):
+        """
+        Searches for the inmates booked from start_date to end_date, yesterday by default, that are
+        not in the database. known_inmates_ids, a JailIdIndex covering those days, saves looking
+        them up.
+        """
         if not self.is_running:
             self._start_date_missing_inmates = start_date
-            self._worker = [gevent.spawn(self._find_missing_inmates)]
-            self._notify(self._START_COMMAND)
+            self._end_date_missing_inmates = end_date
+            if known_inmates_ids is None:
+                self._phases = [Phase('known inmates ids', self._known_inmates)]
+            else:
+                self._known_inmate_ids = known_inmates_ids
+                self._phases = []
+            self._phases.append(Phase('missing inmates search', self._find_missing_inmates,
+                                      self._search_commands.__class__, SearchCommands.FINISHED_FIND_INMATES,
+                                      after=[phase.name for phase in self._phases]))
+            self._phases.extend(self._finish_phases())
+            self._start_pipeline()
 
     def _find_missing_inmates(self):
-        self.is_running = True
-        self._debug('find_missing_inmates started')
-        self.heartbeat_count = 0
-        heartbeat = Heartbeat(self._monitor)
-        heartbeat_class = heartbeat.__class__
-        keep_running = True
-        while keep_running:
-            notifier, msg = self._monitor.notification()
-            if notifier == heartbeat_class:
-                self.heartbeat_count += 1
-            else:
-                self._debug('hb count %d, from %s, received - %s' % (self.heartbeat_count,
-                                                                     str(notifier).split('.')[-1],
-                                                                     msg))
-                if msg == self.STOP_COMMAND:
-                    keep_running = False
-                elif notifier == self._search_commands.__class__:
-                    if msg == SearchCommands.FINISHED_FIND_INMATES:
-                        self._debug('inmates scraper finish')
-                        self._inmate_scraper.finish()
-                    else:
-                        self._debug('Unknown notification from %s, received - %s' % (notifier, msg))
-                elif notifier == self._inmate_scraper.__class__:
-                    self._debug('inmates finish')
-                    self._inmates.finish()
-                elif notifier == self._inmates.__class__:
-                    keep_running = False
-                elif notifier == self.__class__:
-                    if msg == self._START_COMMAND:
-                        self._debug('find known inmates')
-                        self._known_inmates()
-                    elif msg == self._RECEIVED_KNOWN_INMATES_COMMAND:
-                        self._debug('find missing inmates')
-                        self._search_commands.find_inmates(exclude_list=self._inmates_response,
-                                                           start_date=self._start_date_missing_inmates)
-                else:
-                    self._debug('Unknown notification from %s, received - %s' % (notifier, msg))
-        self._start_date_missing_inmates = None
-        self.is_running = False
-        self._debug('find_missing_inmates stopped')
+        self._search_commands.find_inmates(exclude_list=self._known_inmate_ids,
+                                           start_date=self._start_date_missing_inmates,
+                                           end_date=self._end_date_missing_inmates)
 
     def _find_new_inmates(self):
-        end_index = self._end_index_active_inmate_ids_in_search_window()
-        self._search_commands.find_inmates(exclude_list=self._active_inmate_ids[0:end_index],
+        # the search only looks up the days in its window, the ids booked on other days are passed over
+        self._search_commands.find_inmates(exclude_list=self._active_inmate_ids,
                                            start_date=self._today - ONE_DAY * (NEW_INMATE_SEARCH_WINDOW_SIZE + 1))
 
     def _known_inmates(self):
-        self._inmates.known_inmates_ids_starting_with(self.inmates_response_q, self._start_date_missing_inmates)
-        self._retrieve_inmates_response(self._RECEIVED_KNOWN_INMATES_COMMAND)
-
-    def _notify(self, notification_msg):
-        self._monitor.notify(self.__class__, notification_msg)
-
-    def _recently_discharged_inmates_ids(self):
-        self._inmates.recently_discharged_inmates_ids(self.inmates_response_q)
-        self._retrieve_inmates_response(self._RECEIVED_RECENTLY_DISCHARGED_INMATES_IDS_COMMAND)
-
-    def _retrieve_inmates_response(self, received_notification_msg):
-        def _get_response_msg():
-            self._retrieve_inmates_response_1(received_notification_msg)
-        self._inmates_worker = [gevent.spawn(_get_response_msg)]
-        gevent.sleep(0)
-
-    def _retrieve_inmates_response_1(self, received_notification_msg):
-        self._inmates_response = self.inmates_response_q.get()
-        self._notify(received_notification_msg)
-
-    def run(self):
-        if not self.is_running:
-            self._worker = [gevent.spawn(self._run)]
-            self._notify(self._START_COMMAND)
-
-    def _run(self):
-        self.is_running = True
+        self._inmates.known_inmates_ids_starting_with(self.inmates_response_q, self._start_date_missing_inmates,
+                                                      self._end_date_missing_inmates)
+        self._known_inmate_ids = self.inmates_response_q.get()
+
+    def _notification(self, notifier, msg):
+        if notifier == Heartbeat:
+            self.heartbeat_count += 1
+            return
+        self._debug('hb count %d, from %s, received - %s' % (self.heartbeat_count, str(notifier).split('.')[-1],
+                                                             msg))
+        if msg == self.STOP_COMMAND:
+            self._stopped.set()
+            return
+        for phase in self._phases:
+            if phase.name in self._phases_started and phase.name not in self._phases_finished and \
+                    phase.finished_by(notifier, msg):
+                self._phase_finished(phase)
+                return
+        self._debug('Unknown notification from %s, received - %s' % (notifier, msg))
+
+    def _phase_finished(self, phase):
+        self._phases_finished.add(phase.name)
+        self.phase_timings[phase.name] = datetime.now() - self._phases_started[phase.name]
+        self._debug('%s finished in %s' % (phase.name, str(self.phase_timings[phase.name])))
+        self._monitor.metrics.set_gauge('phase_seconds', self.phase_timings[phase.name].total_seconds(),
+                                        {'phase': phase.name})
+        if len(self._phases_finished) == len(self._phases):
+            self._stopped.set()
+        else:
+            self._start_ready_phases()
+
+    def _recently_discharged_inmates_ids(self, response_q):
+        self._inmates.recently_discharged_inmates_ids(response_q)
+        self._recently_discharged_ids = response_q.get()
+
+    def run(self, pipelined=False):
+        """
+        Runs a full scrape. Normally the status update, the new inmates search and the discharged
+        inmates check follow each other. With pipelined they all run at once, they cover distinct
+        sets of jail ids, so the scrape takes about as long as the longest of them.
+        """
+        if self.is_running:
+            return
+        if pipelined:
+            self._phases = [
+                Phase('active inmates ids', self._active_inmates),
+                Phase('recently discharged inmates ids',
+                      lambda: self._recently_discharged_inmates_ids(self.discharged_inmates_response_q)),
+                Phase('update inmates status', self._update_inmates_status, self._search_commands.__class__,
+                      SearchCommands.FINISHED_UPDATE_INMATES_STATUS, after=['active inmates ids']),
+                Phase('new inmates search', self._find_new_inmates, self._search_commands.__class__,
+                      SearchCommands.FINISHED_FIND_INMATES, after=['active inmates ids']),
+                Phase('discharged inmates check', self._check_if_really_discharged, self._search_commands.__class__,
+                      SearchCommands.FINISHED_CHECK_OF_RECENTLY_DISCHARGED_INMATES,
+                      after=['recently discharged inmates ids']),
+            ]
+            self._phases.append(Phase('inmates scraper finish', self._inmate_scraper.finish,
+                                      self._inmate_scraper.__class__,
+                                      after=['update inmates status', 'new inmates search',
+                                             'discharged inmates check']))
+            if self._finish_inmates:
+                self._phases.append(Phase('inmates finish', self._inmates.finish, self._inmates.__class__,
+                                          after=['inmates scraper finish']))
+        else:
+            self._phases = [
+                Phase('active inmates ids', self._active_inmates),
+                Phase('update inmates status', self._update_inmates_status, self._search_commands.__class__,
+                      SearchCommands.FINISHED_UPDATE_INMATES_STATUS, after=['active inmates ids']),
+                Phase('new inmates search', self._find_new_inmates, self._search_commands.__class__,
+                      SearchCommands.FINISHED_FIND_INMATES, after=['update inmates status']),
+                Phase('recently discharged inmates ids',
+                      lambda: self._recently_discharged_inmates_ids(self.inmates_response_q),
+                      after=['new inmates search']),
+                Phase('discharged inmates check', self._check_if_really_discharged, self._search_commands.__class__,
+                      SearchCommands.FINISHED_CHECK_OF_RECENTLY_DISCHARGED_INMATES,
+                      after=['recently discharged inmates ids']),
+            ]
+            self._phases.extend(self._finish_phases())
+        self._start_pipeline()
+
+    def _run_phase(self, phase):
+        self._debug('%s started' % phase.name)
+        phase.start()
+        if phase.notifier is None:
+            self._phase_finished(phase)
+
+    def _run_pipeline(self):
         self._debug('started')
-        self.heartbeat_count = 0
-        heartbeat = Heartbeat(self._monitor)
-        heartbeat_class = heartbeat.__class__
-        keep_running = True
-        while keep_running:
-            notifier, msg = self._monitor.notification()
-            if notifier == heartbeat_class:
-                self.heartbeat_count += 1
-            else:
-                self._debug('hb count %d, from %s, received - %s' % (self.heartbeat_count,
-                                                                     str(notifier).split('.')[-1],
-                                                                     msg))
-                if msg == self.STOP_COMMAND:
-                    keep_running = False
-                elif notifier == self._search_commands.__class__:
-                    if msg == SearchCommands.FINISHED_UPDATE_INMATES_STATUS:
-                        self._debug('initiate search for new inmates')
-                        self._find_new_inmates()
-                    elif msg == SearchCommands.FINISHED_FIND_INMATES:
-                        self._debug('fetch recently discharged inmate ids')
-                        self._recently_discharged_inmates_ids()
-                    elif msg == SearchCommands.FINISHED_CHECK_OF_RECENTLY_DISCHARGED_INMATES:
-                        self._debug('initiate inmates scraper finish')
-                        self._inmate_scraper.finish()
-                    else:
-                        self._debug('Unknown notification from %s, received - %s' % (notifier, msg))
-                elif notifier == self._inmate_scraper.__class__:
-                    self._debug('inmates finish')
-                    self._inmates.finish()
-                elif notifier == self._inmates.__class__:
-                    keep_running = False
-                elif notifier == self.__class__:
-                    if msg == self._START_COMMAND:
-                        self._debug('find active inmates')
-                        self._active_inmates()
-                    elif msg == self._RECEIVED_ACTIVE_IDS_COMMAND:
-                        self._debug('update inmates status')
-                        self._active_inmate_ids = self._inmates_response
-                        self._search_commands.update_inmates_status(self._inmates_response)
-                    elif msg == self._RECEIVED_RECENTLY_DISCHARGED_INMATES_IDS_COMMAND:
-                        self._debug('initiate confirmation search of recently discharged inmates')
-                        self._search_commands.check_if_really_discharged(self._inmates_response)
-                else:
-                    self._debug('Unknown notification from %s, received - %s' % (notifier, msg))
+        heartbeat = Heartbeat(self._monitor) if self._heartbeat else None
+        self._monitor.add_listener(self._notification)
+        self._start_ready_phases()
+        self._stopped.wait()
+        self._monitor.remove_listener(self._notification)
+        if heartbeat is not None:
+            heartbeat.stop()
+        self._start_date_missing_inmates = None
+        self._end_date_missing_inmates = None
         self.is_running = False
         self._debug('stopped')
 
+    def _start_pipeline(self):
+        self.is_running = True
+        self.heartbeat_count = 0
+        self.phase_timings = OrderedDict()
+        self._phases_started, self._phases_finished = {}, set()
+        self._stopped.clear()
+        self._worker = [gevent.spawn(self._run_pipeline)]
+
+    def _start_ready_phases(self):
+        for phase in self._phases:
+            if phase.name not in self._phases_started and \
+                    all(after_name in self._phases_finished for after_name in phase.after):
+                self._phases_started[phase.name] = datetime.now()
+                gevent.spawn(self._run_phase, phase)
+
     def stop_command(self):
         return self.STOP_COMMAND
 
+    def _update_inmates_status(self):
+        self._search_commands.update_inmates_status(self._active_inmate_ids)
+
     def wait_for_finish(self):
         gevent.joinall(self._worker)
@@ -0,0 +1,250 @@
+from datetime import date, timedelta
+from random import Random
+from urlparse import parse_qs
+
+import gevent
+from gevent.pywsgi import WSGIServer
+
+from utils import ONE_DAY
+
+DETAILS_PATH = '/search2/details.asp'
+
+_CHARGES = [
+    ('625 ILCS 5 6-303(d) [5883000]', 'DRIVING REVOKED/SUSPENDED 2ND+'),
+    ('720 ILCS 570 402(c) [5101110]', 'POSS AMT CON SUB EXCEPT(A)/(D)'),
+    ('720 ILCS 5 12-3.2(a)(1) [10418]', 'DOMESTIC BATTERY/BODILY HARM'),
+    ('720 ILCS 5 19-1(a) [1110000]', 'BURGLARY'),
+    ('720 ILCS 5 16-1(a)(1)(A) [1080000]', 'THEFT/UNAUTHORIZED CONTROL'),
+    ('720 ILCS 5 24-1.6(a)(1) [13500]', 'AGG UUW/VEH/PCL/NO FOID'),
+]
+_COURT_LOCATIONS = [
+    'Markham<br />\n          Markham, Room:101<br />\n          16501 South Kedzie Parkway Room: 101<br />\n'
+    '          Markham, IL&nbsp;60426',
+    '26th & California<br />\n          Criminal Courts Building, Room:506<br />\n'
+    '          2650 South California Avenue Room: 506<br />\n          Chicago, IL&nbsp;60608',
+    'Skokie<br />\n          Skokie, Room:104<br />\n          5600 Old Orchard Road Room: 104<br />\n'
+    '          Skokie, IL&nbsp;60077',
+]
+_FIRST_NAMES = ['JAMES', 'MICHAEL', 'ROBERT', 'MARIA', 'DAVID', 'JOSE', 'LATOYA', 'KEVIN', 'ANTHONY', 'TANYA']
+_HOUSING_LOCATIONS = ['02-D2-T-3-T', '05-L-2-2-1', '01-D-1-1-1', '06-E-3-2', '11-AA-1-2', '15-2A-D-4', '10-B-3-4',
+                      '17-WR-N-B-2', '04-B-2-3', 'RCDC']
+_LAST_NAMES = ['SMITH', 'JOHNSON', 'WILLIAMS', 'JONES', 'BROWN', 'GARCIA', 'MARTINEZ', 'JACKSON', 'PUGH', 'WASHINGTON']
+_RACES = ['BK', 'BK', 'BK', 'WH', 'LW', 'LT', 'AS', 'IN']
+
+_PAGE_TEMPLATE = u'''<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.0 Transitional//EN" "http://www.w3.org/TR/xhtml1/DTD/xhtml1-transitional.dtd">
+
+
+<html xmlns="http://www.w3.org/1999/xhtml">
+<head>
+<meta http-equiv="Content-Type" content="text/html; charset=utf-8" />
+<title>Cook County Sheriff Inmate Locator Search Results</title>
+</head>
+
+<body class="oneColElsCtrHdr">
+
+<div id="container">
+  <div id="mainContent"><h1> Individual Inmate Report</h1>
+    <table border="0" cellpadding="5" cellspacing="1" width=100%%>
+      <tr>
+        <td bgcolor="#6699CC" align="center" colspan="2"><font size=2 face="arial, helvetica" color="white"> Booking #</td>
+        <td bgcolor="#6699CC" align="center" colspan="3"><font size=2 face="arial, helvetica" color="white"> Inmate Full Name</td>
+        <td width="72" align="center" bgcolor="#6699CC"><font size=2 face="arial, helvetica" color="white"> Date of Birth</td>
+         <td width="67" align="center" bgcolor="#6699CC"><font size=2 face="arial, helvetica" color="white"> Race</td>
+        <td width="71" align="center" bgcolor="#6699CC"><font size=2 face="arial, helvetica" color="white">Gender</td>
+        <td width="73" align="center" bgcolor="#6699CC"><font size=2 face="arial, helvetica" color="white">Height</td>
+        <td width="63" align="center" bgcolor="#6699CC"><font size=2 face="arial, helvetica" color="white">Weight</td>
+      </tr>
+
+      <tr>
+        <td bgcolor="white" colspan="2"><font size=2 face="arial, helvetica" color="#003366"> %(jail_id)s</td>
+        <td bgcolor="white" colspan="3"><font size=2 face="arial, helvetica" color="#003366"> %(name)s </td>
+        <td bgcolor="white"><font size=2 face="arial, helvetica" color="#003366"> %(birth_date)s</td>
+        <td bgcolor="white"><font size=2 face="arial, helvetica" color="#003366"> <div align="center">
+          %(race)s
+        </div></td>
+        <td bgcolor="white"><font size=2 face="arial, helvetica" color="#003366"> <div align="center">
+          %(gender)s
+        </div></td>
+        <td bgcolor="white"><font size=2 face="arial, helvetica" color="#003366"> <div align="center">
+          %(height)s
+        </div></td>
+        <td bgcolor="white"><font size=2 face="arial, helvetica" color="#003366"> <div align="center">
+          %(weight)s
+        </div></td>
+      </tr>
+      </table>
+    <table border="0" cellpadding="5" cellspacing="1" width=100%%>
+      <tr>
+        <td bgcolor="#6699CC" align="center" colspan="2"><font size=2 face="arial, helvetica" color="white"> Booked Date</td>
+        <td width="23%%" align="center" bgcolor="#6699CC" ><font size=2 face="arial, helvetica" color="white"> Housing Location</td>
+        <td bgcolor="#6699CC" align="center" colspan="4"><font size=2 face="arial, helvetica" color="white"> Visiting Day / Time</font></td>
+        <td width="10%%" align="center" bgcolor="#6699CC"><font size=2 face="arial, helvetica" color="white"> Bail Amount</font></td>
+
+      </tr>
+      <tr>
+        <td bgcolor="white" align="center" colspan="2"><font size=2 face="arial, helvetica" color="#003366"> %(booking_date)s</td>
+        <td bgcolor="white" ><font size=2 face="arial, helvetica" color="#003366"> %(housing_location)s </td>
+        <td bgcolor="white" colspan="4"><font size=2 face="arial, helvetica" color="#003366">
+          Sunday    &nbsp; 3:30p - 8:30p</td>
+        <td bgcolor="white" align="right"><font size=2 face="arial, helvetica" color="#003366"> <div align="center">
+          %(bail_amount)s
+        </div></td>
+
+      </tr>
+      <tr>
+      <td bgcolor="#6699CC" colspan="9" align="center" valign="top"><font size=2 face="arial, helvetica" color="white"> Charges</td>
+      </tr>
+      <tr>
+      <td bgcolor="white" align="center" colspan="9" valign="top"><font size=2 face="arial, helvetica" color="#003366"> %(charge_code)s<br />
+	  %(charge_description)s
+      </td>
+      </tr>
+    </table>
+    <table border="0" cellpadding="5" cellspacing="1" width=100%%>
+      <tr>
+        <td bgcolor="#6699CC" colspan="5" align="center" valign="top"><font size=2 face="arial, helvetica" color="white"> Next Court Date</td>
+        <td bgcolor="#6699CC" align="center" colspan="5"><font size=2 face="arial, helvetica" color="white"> Court House Location</td>
+      </tr>
+
+      <tr>
+        <td bgcolor="white" align="center" colspan="5" valign="top"><font size=2 face="arial, helvetica" color="#003366"> %(court_date)s</td>
+        <td bgcolor="white" colspan="5"><font size=2 face="arial, helvetica" color="#003366"> %(court_location)s</td>
+      </tr>
+    </table>
+
+    <table width="100%%" border="0">
+      <tr>
+        <td width="21%%" rowspan=3><a href="photo.asp?jailnumber=%(jail_id)s" target="_blank"><img src="images\\InmatePhotos\\photo.jpg" alt="photo" width="128" height="107"/></a></td>
+        <td width="79%%"><a href="http:\\\\www7.cookcountysheriff.org\\visitor.asp?jailid=%(jail_id)s&name=%(name)s ">Register online</a> to visit</td>
+      </tr>
+      <tr>
+        <td>OR</td>
+
+      </tr>
+      <tr>
+        <td><a href="VisitorApplicationAdobeReader061213.pdf" target="_blank" >Download</a> Printable form</td>
+
+      </tr>
+    </table>
+%(boilerplate)s
+	<!-- end #mainContent --></div>
+<!-- end #container --></div>
+</body>
+</html>
+'''
+
+# Stands in for the visiting and bonding instructions that make up most of a real page
+_BOILERPLATE = u'''    <p><b>Requirements for Entry into the Facility:</b> <br />
+      <b>Identification:</b> All visitors must be in possession of one valid photo identification including:<br />
+    </p>
+    <p><b>Instructions for Bonding Out an Inmate:</b> <br />
+      <b>Where:</b> Division Five, 2700 South California Avenue<br />
+      <b>Time:</b> 9 AM to 9 PM Sunday through Saturday, including Holidays<br />
+    </p>
+''' * 12
+
+
+class FakeSheriffSite:
+    """
+    A local stand in for the inmate details pages of the Cook County Sheriff's website, for
+    benchmarking the scraper without touching the real one.
+
+    The population is every booking number up to bookings_per_day on each of the last days days,
+    less a missing_density fraction of them. Each inmate's details are derived from their jail id,
+    so every request for an inmate gets the same page. Pages take latency seconds on average to
+    serve, and an error_rate fraction of requests fail with a server error. Unknown jail ids get a
+    not found error.
+    """
+
+    def __init__(self, days=7, bookings_per_day=300, missing_density=0.05, latency=0.0, error_rate=0.0, seed=0,
+                 today=None):
+        self._days = days
+        self._bookings_per_day = bookings_per_day
+        self._missing_density = missing_density
+        self._latency = latency
+        self._error_rate = error_rate
+        self._seed = seed
+        self._today = today if today is not None else date.today()
+        self._random = Random(seed)
+        self._server = None
+        self.requests_served = 0
+
+    def __call__(self, environ, start_response):
+        self.requests_served += 1
+        if self._latency:
+            gevent.sleep(self._random.uniform(0, self._latency * 2))
+        jail_id = parse_qs(environ.get('QUERY_STRING', '')).get('jailnumber', [''])[0]
+        if environ['PATH_INFO'] != DETAILS_PATH or not self.exists(jail_id):
+            return _response(start_response, '404 Not Found', 'Not Found')
+        if self._error_rate and self._random.random() < self._error_rate:
+            return _response(start_response, '500 Internal Server Error', 'Internal Server Error')
+        return _response(start_response, '200 OK', self.page(jail_id))
+
+    def details_url(self):
+        host, port = self._server.address
+        return 'http://%s:%d%s?jailnumber=' % (host, port, DETAILS_PATH)
+
+    def exists(self, jail_id):
+        try:
+            booking_date = date(int(jail_id[0:4]), int(jail_id[5:7]), int(jail_id[7:9]))
+            booking_number = int(jail_id[9:])
+        except ValueError:
+            return False
+        return (self._today - ONE_DAY * self._days <= booking_date < self._today and
+                1 <= booking_number <= self._bookings_per_day and
+                self._inmate_random(jail_id).random() >= self._missing_density)
+
+    def _inmate_random(self, jail_id):
+        return Random('%s-%s' % (self._seed, jail_id))
+
+    def jail_ids(self):
+        """
+        Generates the jail ids of the inmates on the site
+        """
+        for day_index in range(self._days, 0, -1):
+            prefix = (self._today - ONE_DAY * day_index).strftime('%Y-%m%d')
+            for booking_number in range(1, self._bookings_per_day + 1):
+                jail_id = '%s%03d' % (prefix, booking_number)
+                if self.exists(jail_id):
+                    yield jail_id
+
+    def page(self, jail_id):
+        inmate_random = self._inmate_random(jail_id)
+        inmate_random.random()  # used by exists()
+        booking_date = date(int(jail_id[0:4]), int(jail_id[5:7]), int(jail_id[7:9]))
+        charge_code, charge_description = inmate_random.choice(_CHARGES)
+        bail = inmate_random.choice([None, 1000, 5000, 20000, 50000, 250000])
+        return _PAGE_TEMPLATE % {
+            'jail_id': jail_id,
+            'name': '%s, %s' % (inmate_random.choice(_LAST_NAMES), inmate_random.choice(_FIRST_NAMES)),
+            'birth_date': (booking_date - timedelta(inmate_random.randint(18 * 365, 70 * 365))).strftime('%m/%d/%Y'),
+            'race': inmate_random.choice(_RACES),
+            'gender': inmate_random.choice(['M', 'M', 'M', 'M', 'F']),
+            'height': '%d%02d' % (inmate_random.randint(5, 6), inmate_random.randint(0, 11)),
+            'weight': inmate_random.randint(110, 280),
+            'booking_date': booking_date.strftime('%m/%d/%Y'),
+            'housing_location': inmate_random.choice(_HOUSING_LOCATIONS),
+            'bail_amount': '* NO BOND *' if bail is None else '{:,}'.format(bail),
+            'charge_code': charge_code,
+            'charge_description': charge_description,
+            'court_date': (self._today + ONE_DAY * inmate_random.randint(1, 60)).strftime('%m/%d/%Y'),
+            'court_location': inmate_random.choice(_COURT_LOCATIONS),
+            'boilerplate': _BOILERPLATE,
+        }
+
+    def start(self, host='127.0.0.1', port=0):
+        """
+        Serves the site, in a greenlet, port 0 picks a free port. Returns the inmate details url.
+        """
+        self._server = WSGIServer((host, port), self, log=None)
+        self._server.start()
+        return self.details_url()
+
+    def stop(self):
+        self._server.stop()
+
+
+def _response(start_response, status, body):
+    body = body.encode('utf-8')
+    start_response(status, [('Content-Type', 'text/html; charset=utf-8'), ('Content-Length', str(len(body)))])
+    return [body]
@@ -11,9 +11,12 @@ class Heartbeat:
 
     def __init__(self, monitor):
         self._monitor = monitor
-        gevent.spawn(self._heartbeat)
+        self._worker = gevent.spawn(self._heartbeat)
 
     def _heartbeat(self):
         while True:
             gevent.sleep(HEARTBEAT_INTERVAL)
             self._monitor.notify(self.__class__)
+
+    def stop(self):
+        self._worker.kill()
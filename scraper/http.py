@@ -16,14 +16,23 @@ _STD_SLEEP_PERIODS = [1.61, 7, 13, 23, 41]
 
 class Http:
 
-    def __init__(self):
-        pass
-
-    def get(self, url, number_attempts=_STD_NUMBER_ATTEMPTS, initial_sleep_period=_STD_INITIAL_SLEEP_PERIOD):
+    def __init__(self, number_attempts=_STD_NUMBER_ATTEMPTS, initial_sleep_period=_STD_INITIAL_SLEEP_PERIOD,
+                 request_budget=None):
+        self._number_attempts = number_attempts
+        self._initial_sleep_period = initial_sleep_period
+        self._request_budget = request_budget
+
+    def get(self, url, number_attempts=None, initial_sleep_period=None):
+        if number_attempts is None:
+            number_attempts = self._number_attempts
+        if initial_sleep_period is None:
+            initial_sleep_period = self._initial_sleep_period
         attempt = 1
         sleep_period = initial_sleep_period
         while attempt <= number_attempts:
             gevent.sleep(sleep_period)
+            if self._request_budget is not None:
+                self._request_budget.acquire()
             try:
                 request = grequests.get(url)
                 grequests.map([request])
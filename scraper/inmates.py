@@ -1,12 +1,18 @@
+from time import time
 
-from utils import ONE_DAY, yesterday
+from utils import yesterday
 from concurrent_base import ConcurrentBase
+from jail_ids import JailIdIndex
+
+# inmates waiting to be stored, each one holds its raw inmate record, so fetching stops
+# once this many are waiting
+MAX_PENDING_INMATES = 50
 
 
 class Inmates(ConcurrentBase):
 
-    def __init__(self, inmate_class, raw_inmate_data, monitor):
-        super(Inmates, self).__init__(monitor)
+    def __init__(self, inmate_class, raw_inmate_data, monitor, max_pending=MAX_PENDING_INMATES):
+        super(Inmates, self).__init__(monitor, max_pending=max_pending)
         self._inmate_class = inmate_class
         self.__raw_inmate_data = raw_inmate_data
 
@@ -21,26 +27,28 @@ class Inmates(ConcurrentBase):
 
     def _create_update_inmate(self, args):
         inmate = self._inmate_class(args['inmate_id'], args['inmate_details'], self._monitor)
+        start_time = time()
         inmate.save()
+        self._monitor.metrics.observe('db_write_seconds', time() - start_time, {'operation': 'save'})
         self.__raw_inmate_data.add(args['inmate_details'])
 
     def discharge(self, inmate_id):
         self._put(self._discharge, inmate_id)
 
     def _discharge(self, inmate_id):
+        start_time = time()
         self._inmate_class.discharge(inmate_id, self._monitor)
+        self._monitor.metrics.observe('db_write_seconds', time() - start_time, {'operation': 'discharge'})
 
-    def known_inmates_ids_starting_with(self, response_queue, start_date):
-        self._put(self._known_inmates_ids_starting_with, {'response_queue': response_queue, 'start_date': start_date})
+    def known_inmates_ids_starting_with(self, response_queue, start_date, end_date=None):
+        self._put(self._known_inmates_ids_starting_with, {'response_queue': response_queue, 'start_date': start_date,
+                                                          'end_date': end_date})
 
     def _known_inmates_ids_starting_with(self, args):
-        known_inmates_ids = []
-        cur_date = args['start_date']
-        the_yesterday = yesterday()
-        while cur_date <= the_yesterday:
-            known_inmates_ids.extend([inmate.jail_id for inmate in self._inmate_class.known_inmates_for_date(cur_date)])
-            cur_date += ONE_DAY
-        args['response_queue'].put(known_inmates_ids)
+        # the index groups the ids by day for the search, see SearchCommands
+        end_date = args['end_date'] if args['end_date'] is not None else yesterday()
+        known_inmates_ids = self._inmate_class.known_inmates_ids_between(args['start_date'], end_date)
+        args['response_queue'].put(JailIdIndex(known_inmates_ids))
 
     def recently_discharged_inmates_ids(self, response_queue):
         self._put(self._recently_discharged_inmates_ids, response_queue)
@@ -53,6 +61,5 @@ class Inmates(ConcurrentBase):
 
 
 def _send_inmate_ids(response_queue, inmates):
-    inmates_ids = [inmate.jail_id for inmate in inmates]
-    response_queue.put(inmates_ids)
+    response_queue.put(JailIdIndex(inmate.jail_id for inmate in inmates))
 
@@ -1,45 +1,76 @@
+from time import time
+
 from monitor import MONITOR_VERBOSE_DMSG_LEVEL
 from concurrent_base import ConcurrentBase
+from raw_inmate_data import RawInmateRecord
 
 WORKERS_TO_START = 25
 
+# fetches waiting for a worker, whoever asks for more blocks until one is taken
+MAX_PENDING_FETCHES = WORKERS_TO_START * 4
+
+# Deadlines, in seconds, of the kinds of fetches, see ConcurrentBase. Status updates of inmates in jail
+# come first, so if a run is cut short the people currently held are the ones whose data is fresh.
+STATUS_UPDATE_DEADLINE = 0
+DISCHARGE_CHECK_DEADLINE = 60
+NEW_INMATE_PROBE_DEADLINE = 300
+
 CCJ_INMATE_DETAILS_URL = 'http://www2.cookcountysheriff.org/search2/details.asp?jailnumber='
 
 
 class InmatesScraper(ConcurrentBase):
 
-    def __init__(self, http, inmates, inmate_details_class, monitor, workers_to_start=WORKERS_TO_START):
-        super(InmatesScraper, self).__init__(monitor, workers_to_start)
+    def __init__(self, http, inmates, inmate_details_class, monitor, workers_to_start=WORKERS_TO_START,
+                 max_pending=MAX_PENDING_FETCHES, details_url=CCJ_INMATE_DETAILS_URL, progress=None):
+        super(InmatesScraper, self).__init__(monitor, workers_to_start, max_pending)
+        self._details_url = details_url
+        self._progress = progress
         self._http = http
         self._inmates = inmates
         self._inmate_details_class = inmate_details_class
 
     def create_if_exists(self, arg):
-        self._put(self._create_if_exists, arg)
+        self._put(self._create_if_exists, arg, NEW_INMATE_PROBE_DEADLINE)
 
     def _create_if_exists(self, inmate_id):
-        self._debug('check for inmate - %s' % inmate_id, MONITOR_VERBOSE_DMSG_LEVEL)
-        worked, inmate_details_in_html = self._http.get(CCJ_INMATE_DETAILS_URL + inmate_id)
+        self._debug('check for inmate - %s', MONITOR_VERBOSE_DMSG_LEVEL, (inmate_id,))
+        worked, inmate_details_in_html = self._fetch(inmate_id)
         if worked:
-            self._inmates.add(inmate_id, self._inmate_details_class(inmate_details_in_html))
+            self._inmates.add(inmate_id, self._inmate_record(inmate_details_in_html))
+        if self._progress is not None:
+            self._progress.probed(inmate_id, worked)
+
+    def _fetch(self, inmate_id):
+        start_time = time()
+        worked, inmate_details_in_html = self._http.get(self._details_url + inmate_id)
+        self._monitor.metrics.observe('http_fetch_seconds', time() - start_time)
+        self._monitor.metrics.increment('http_fetches', labels={'found': worked})
+        return worked, inmate_details_in_html
+
+    def _inmate_record(self, inmate_details_in_html):
+        # only the fields are passed on, so the parsed page can be freed as soon as they are read
+        start_time = time()
+        inmate_record = RawInmateRecord.from_details(self._inmate_details_class(inmate_details_in_html))
+        self._monitor.metrics.observe('parse_seconds', time() - start_time)
+        return inmate_record
 
     def resurrect_if_found(self, inmate_id):
-        self._put(self._resurrect_if_found, inmate_id)
+        self._put(self._resurrect_if_found, inmate_id, DISCHARGE_CHECK_DEADLINE)
 
     def _resurrect_if_found(self, inmate_id):
-        self._debug('check if really discharged inmate %s' % inmate_id, MONITOR_VERBOSE_DMSG_LEVEL)
-        worked, inmate_details_in_html = self._http.get(CCJ_INMATE_DETAILS_URL + inmate_id)
+        self._debug('check if really discharged inmate %s', MONITOR_VERBOSE_DMSG_LEVEL, (inmate_id,))
+        worked, inmate_details_in_html = self._fetch(inmate_id)
         if worked:
-            self._debug('resurrected discharged inmate %s' % inmate_id, MONITOR_VERBOSE_DMSG_LEVEL)
-            self._inmates.update(inmate_id, self._inmate_details_class(inmate_details_in_html))
+            self._debug('resurrected discharged inmate %s', MONITOR_VERBOSE_DMSG_LEVEL, (inmate_id,))
+            self._inmates.update(inmate_id, self._inmate_record(inmate_details_in_html))
 
     def update_inmate_status(self, inmate_id):
-        self._put(self._update_inmate_status, inmate_id)
+        self._put(self._update_inmate_status, inmate_id, STATUS_UPDATE_DEADLINE)
 
     def _update_inmate_status(self, inmate_id):
-        worked, inmate_details_in_html = self._http.get(CCJ_INMATE_DETAILS_URL + inmate_id)
+        worked, inmate_details_in_html = self._fetch(inmate_id)
         if worked:
-            self._inmates.update(inmate_id, self._inmate_details_class(inmate_details_in_html))
+            self._inmates.update(inmate_id, self._inmate_record(inmate_details_in_html))
         else:
             self._inmates.discharge(inmate_id)
 
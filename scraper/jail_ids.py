@@ -0,0 +1,123 @@
+from array import array
+from bisect import bisect_left, bisect_right
+
+# a jail id is its booking date followed by the booking number of the day, as in 2014-0117015
+BOOKING_NUMBERS_PER_DAY = 100000
+
+
+def _key_typecode():
+    """
+    Returns the typecode of the arrays holding the keys, which are around 2e12 and so need 64 bit
+    integers. 'q' only exists since Python 3.3, 'l' is 64 bits on 64 bit Linux and OS X but only 32
+    bits on Windows and 32 bit builds, where the index refuses to load rather than overflow.
+    """
+    for typecode in ['q', 'l']:
+        try:
+            if array(typecode).itemsize >= 8:
+                return typecode
+        except ValueError:
+            pass
+    raise ImportError('JailIdIndex needs 64 bit integer arrays, this Python build has none')
+
+
+_KEY_TYPECODE = _key_typecode()
+
+
+class JailIdIndex:
+    """
+    A sorted, read only, set of jail ids. Each id is stored as an integer, its booking date as
+    YYYYMMDD times BOOKING_NUMBERS_PER_DAY plus its booking number, in an array, so it takes 8
+    bytes rather than a string object, and membership tests and the ids booked on a given day
+    are found by bisection.
+
+    The few ids not in the usual format are kept apart, as strings, so nothing is lost.
+    """
+
+    def __init__(self, jail_ids=()):
+        keys = []
+        others = set()
+        for jail_id in jail_ids:
+            key = jail_id_key(jail_id)
+            if key is None:
+                others.add(jail_id)
+            else:
+                keys.append(key)
+        self._keys = array(_KEY_TYPECODE, sorted(set(keys)))
+        self._others = frozenset(others)
+
+    def __contains__(self, jail_id):
+        key = jail_id_key(jail_id)
+        if key is None:
+            return jail_id in self._others
+        return self._contains_key(key)
+
+    def __eq__(self, other):
+        return isinstance(other, JailIdIndex) and self._keys == other._keys and self._others == other._others
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __iter__(self):
+        for key in self._keys:
+            yield jail_id_from_key(key)
+        for jail_id in sorted(self._others):
+            yield jail_id
+
+    def __len__(self):
+        return len(self._keys) + len(self._others)
+
+    def __repr__(self):
+        return 'JailIdIndex(%d jail ids)' % len(self)
+
+    def booking_numbers_on(self, booking_date):
+        """
+        Returns the booking numbers of the ids booked on booking_date, in increasing order
+        """
+        start, end = self._day_range(booking_date, booking_date)
+        first_key = _date_key(booking_date)
+        return [key - first_key for key in self._keys[start:end]]
+
+    def booked_between(self, start_date, end_date):
+        """
+        Returns the ids booked from start_date to end_date, both included, in increasing order
+        """
+        start, end = self._day_range(start_date, end_date)
+        return [jail_id_from_key(key) for key in self._keys[start:end]]
+
+    def _contains_key(self, key):
+        position = bisect_left(self._keys, key)
+        return position < len(self._keys) and self._keys[position] == key
+
+    def _day_range(self, start_date, end_date):
+        return (bisect_left(self._keys, _date_key(start_date)),
+                bisect_right(self._keys, _date_key(end_date) + BOOKING_NUMBERS_PER_DAY - 1))
+
+
+def jail_id_for(booking_date, booking_number):
+    return booking_date.strftime('%Y-%m%d') + '%03d' % booking_number
+
+
+def jail_id_from_key(key):
+    day, booking_number = divmod(key, BOOKING_NUMBERS_PER_DAY)
+    day = '%08d' % day
+    return '%s-%s%03d' % (day[0:4], day[4:8], booking_number)
+
+
+def jail_id_key(jail_id):
+    """
+    Returns the integer the jail id is stored as, None if the id is not in the usual format
+    """
+    if not isinstance(jail_id, basestring) or len(jail_id) < 12 or jail_id[4] != '-':
+        return None
+    day, booking_number = jail_id[0:4] + jail_id[5:9], jail_id[9:]
+    if not (day.isdigit() and booking_number.isdigit()) or int(booking_number) >= BOOKING_NUMBERS_PER_DAY:
+        return None
+    key = int(day) * BOOKING_NUMBERS_PER_DAY + int(booking_number)
+    # ids that would not come back the same, such as ones with extra leading zeros, are kept apart
+    if jail_id_from_key(key) != jail_id:
+        return None
+    return key
+
+
+def _date_key(booking_date):
+    return (booking_date.year * 10000 + booking_date.month * 100 + booking_date.day) * BOOKING_NUMBERS_PER_DAY
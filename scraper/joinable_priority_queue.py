@@ -0,0 +1,44 @@
+import heapq
+
+from gevent.queue import JoinableQueue
+
+
+class _Heap(list):
+    """
+    The queue's storage. gevent's queues only append and popleft, and JoinableQueue counts
+    unfinished tasks as it does so, so keeping the items as a heap here is all it takes to make
+    the queue a priority one without losing join() and task_done().
+    """
+
+    def append(self, item):
+        heapq.heappush(self, item)
+
+    def popleft(self):
+        return heapq.heappop(self)
+
+
+class JoinablePriorityQueue(JoinableQueue):
+    """
+    A JoinableQueue that hands out its smallest item first, as gevent's PriorityQueue does.
+
+    gevent creates a queue's storage with _init() up to 1.0 and with _create_queue() since, both
+    are provided. Should a gevent version create it some other way, the queue refuses to start
+    rather than quietly hand out its items in the order they were put.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(JoinablePriorityQueue, self).__init__(*args, **kwargs)
+        if not isinstance(self.queue, _Heap):
+            raise TypeError('JoinablePriorityQueue does not support this version of gevent')
+
+    def _create_queue(self, items=()):
+        return _heap(items)
+
+    def _init(self, maxsize, items=None):
+        self.queue = _heap(items or ())
+
+
+def _heap(items):
+    heap = _Heap(items)
+    heapq.heapify(heap)
+    return heap
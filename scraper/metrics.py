@@ -0,0 +1,150 @@
+from bisect import bisect_left
+import json
+import os
+import tempfile
+
+PROMETHEUS_PREFIX = 'ccj_scraper_'
+PROMETHEUS_FILE_EXTENSION = '.prom'
+
+# Upper bounds, in seconds, of the histogram buckets, covering a fast database write to a slow, retried fetch
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Metrics:
+    """
+    Counters, gauges and histograms describing a scraper run. Each metric is identified by its name
+    and an optional dict of labels, such as the phase or the stage it is about.
+
+    The whole set can be written out at the end of a run, see write(), as JSON or in the Prometheus
+    textfile format, so runs can be compared from night to night.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self._buckets = buckets
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+
+    def as_dict(self):
+        return {
+            'counters': [_metric(key, value) for key, value in sorted(self._counters.iteritems())],
+            'gauges': [_metric(key, value) for key, value in sorted(self._gauges.iteritems())],
+            'histograms': [_metric(key, histogram.as_dict())
+                           for key, histogram in sorted(self._histograms.iteritems())],
+        }
+
+    def counter(self, name, labels=None):
+        return self._counters.get(_key(name, labels), 0)
+
+    def gauge(self, name, labels=None):
+        return self._gauges.get(_key(name, labels))
+
+    def histogram(self, name, labels=None):
+        return self._histograms.get(_key(name, labels))
+
+    def increment(self, name, amount=1, labels=None):
+        key = _key(name, labels)
+        self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, labels=None):
+        key = _key(name, labels)
+        if key not in self._histograms:
+            self._histograms[key] = Histogram(self._buckets)
+        self._histograms[key].observe(value)
+
+    def set_gauge(self, name, value, labels=None):
+        self._gauges[_key(name, labels)] = value
+
+    def to_json(self):
+        return json.dumps(self.as_dict(), indent=2, sort_keys=True)
+
+    def to_prometheus(self):
+        lines = []
+        for metric_type, metrics in [('counter', self._counters), ('gauge', self._gauges)]:
+            for name in sorted(set(key[0] for key in metrics)):
+                lines.append('# TYPE %s%s %s' % (PROMETHEUS_PREFIX, name, metric_type))
+                for key in sorted(key for key in metrics if key[0] == name):
+                    lines.append('%s%s%s %s' % (PROMETHEUS_PREFIX, name, _prometheus_labels(key[1]),
+                                                _prometheus_value(metrics[key])))
+        for name in sorted(set(key[0] for key in self._histograms)):
+            lines.append('# TYPE %s%s histogram' % (PROMETHEUS_PREFIX, name))
+            for key in sorted(key for key in self._histograms if key[0] == name):
+                histogram = self._histograms[key]
+                for upper_bound, count in histogram.cumulative_counts():
+                    lines.append('%s%s_bucket%s %d' % (PROMETHEUS_PREFIX, name,
+                                                       _prometheus_labels(key[1] + (('le', upper_bound),)), count))
+                lines.append('%s%s_sum%s %s' % (PROMETHEUS_PREFIX, name, _prometheus_labels(key[1]),
+                                                _prometheus_value(histogram.sum)))
+                lines.append('%s%s_count%s %d' % (PROMETHEUS_PREFIX, name, _prometheus_labels(key[1]),
+                                                  histogram.count))
+        return '\n'.join(lines) + '\n'
+
+    def write(self, file_name):
+        """
+        Writes the metrics in the Prometheus textfile format if file_name ends in .prom, otherwise
+        as JSON. The file is replaced in one go, so a collector never reads half of it.
+        """
+        if file_name.endswith(PROMETHEUS_FILE_EXTENSION):
+            contents = self.to_prometheus()
+        else:
+            contents = self.to_json()
+        file_descriptor, temporary_file_name = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(file_name)))
+        with os.fdopen(file_descriptor, 'w') as metrics_file:
+            metrics_file.write(contents)
+        os.chmod(temporary_file_name, 0644)
+        os.rename(temporary_file_name, file_name)
+
+
+class Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0
+        self.min = None
+        self.max = None
+
+    def as_dict(self):
+        return {'count': self.count, 'sum': self.sum, 'min': self.min, 'max': self.max,
+                'mean': self.sum / float(self.count) if self.count else None,
+                'buckets': [[_prometheus_value(upper_bound), count]
+                            for upper_bound, count in self.cumulative_counts()]}
+
+    def cumulative_counts(self):
+        """
+        Returns (upper bound, number of values at most the bound) pairs, the last bound being '+Inf'
+        """
+        total = 0
+        counts = []
+        for upper_bound, count in zip(list(self.buckets) + ['+Inf'], self.bucket_counts):
+            total += count
+            counts.append((upper_bound, total))
+        return counts
+
+    def observe(self, value):
+        self.bucket_counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.iteritems())) if labels else ()
+
+
+def _metric(key, value):
+    return {'name': key[0], 'labels': dict(key[1]), 'value': value}
+
+
+def _prometheus_labels(labels):
+    if not labels:
+        return ''
+    return '{%s}' % ','.join('%s="%s"' % (name, _prometheus_value(value).replace('\\', '\\\\')
+                                          .replace('"', '\\"').replace('\n', '\\n'))
+                             for name, value in labels)
+
+
+def _prometheus_value(value):
+    return repr(value) if isinstance(value, float) else unicode(value)
@@ -1,54 +1,138 @@
 
+from collections import deque
 import gevent
+from gevent.event import Event
 from gevent.queue import Queue
 from datetime import datetime
 
+from metrics import Metrics
+
 MONITOR_DEFAULT_DMSG_LEVEL = 1
 MONITOR_VERBOSE_DMSG_LEVEL = 2
 
+# Size of the ring buffer of messages waiting to be logged, once full the oldest ones are dropped
+MAX_PENDING_DEBUG_MSGS = 10000
+
 
 class Monitor:
     """
     Provides capabilities for monitoring operations:
         logging:
-            debug
-        notifications
+            debug, formatted lazily and written in batches by a greenlet of its own
+        metrics, counters, gauges and histograms describing the run, see Metrics
+        notifications, either delivered to listeners or, when none wants them, queued
     """
 
-    def __init__(self, log, no_debug_msgs=False, verbose_debug_mode=False):
+    def __init__(self, log, no_debug_msgs=False, verbose_debug_mode=False, verbose_sample_every=1):
         self._log = log
         self._debug_msgs = not no_debug_msgs
         self._debug_msg_level = MONITOR_VERBOSE_DMSG_LEVEL if verbose_debug_mode else MONITOR_DEFAULT_DMSG_LEVEL
+        self._verbose_sample_every = verbose_sample_every
+        self._verbose_msgs_seen = 0
+        self.dropped_debug_msgs = 0
+        self._msgs_waiting = Event()
         self._messages = self._setup_msg_system()
         self._notifications = self._setup_notification_queue()
+        self._listeners = []
+        self.metrics = Metrics()
+
+    def add_listener(self, callback, notifier=None, msg=None):
+        """
+        Has callback(notifier, msg) called, in its own greenlet, for every matching notification.
+        A notifier or msg of None matches any value.
+        """
+        self._listeners.append((notifier, msg, callback))
 
-    def debug(self, msg, debug_level=None):
+    def debug(self, msg, debug_level=None, args=None):
+        """
+        Logs msg, or msg % args when args are given. The formatting is left to the greenlet writing
+        the messages, so args should not be changed afterwards. Verbose messages, which are about
+        single inmates, are sampled, only one in verbose_sample_every is kept.
+        """
         if debug_level is None:
             debug_level = MONITOR_DEFAULT_DMSG_LEVEL
-        if self._debug_msgs and debug_level <= self._debug_msg_level:
-            self._debug(datetime.now(), msg)
+        if not self.debug_enabled(debug_level):
+            return
+        if debug_level == MONITOR_VERBOSE_DMSG_LEVEL and self._verbose_sample_every > 1:
+            self._verbose_msgs_seen += 1
+            if self._verbose_msgs_seen % self._verbose_sample_every:
+                return
+        self._debug(datetime.now(), msg, args)
 
-    def _debug(self, timestamp, msg):
-        self._messages.put((timestamp, msg))
-        gevent.sleep(0)
+    def debug_enabled(self, debug_level=MONITOR_DEFAULT_DMSG_LEVEL):
+        return self._debug_msgs and debug_level <= self._debug_msg_level
+
+    def _debug(self, timestamp, msg, args=None):
+        if len(self._messages) == self._messages.maxlen:
+            self.dropped_debug_msgs += 1
+        self._messages.append((timestamp, msg, args))
+        self._msgs_waiting.set()
+
+    def flush(self):
+        """
+        Writes the messages still waiting to be logged, to be called before exiting.
+        """
+        self._write_msgs()
+
+    def for_pipeline(self):
+        """
+        Returns a Monitor logging to the same log, with the same settings, and adding to the same
+        metrics, but with notifications of its own, so pipelines of the same classes can run side by
+        side without hearing each other's notifications.
+        """
+        monitor = Monitor(self._log, no_debug_msgs=not self._debug_msgs,
+                          verbose_debug_mode=self._debug_msg_level == MONITOR_VERBOSE_DMSG_LEVEL,
+                          verbose_sample_every=self._verbose_sample_every)
+        monitor.metrics = self.metrics
+        return monitor
 
     def notification(self):
         notification = self._notifications.get()
         return notification
 
     def notify(self, notifier, msg=''):
-        self._notifications.put((notifier, msg))
+        listeners = [callback for listener_notifier, listener_msg, callback in self._listeners
+                     if listener_notifier in (None, notifier) and listener_msg in (None, msg)]
+        if listeners:
+            for callback in listeners:
+                gevent.spawn(callback, notifier, msg)
+        else:
+            self._notifications.put((notifier, msg))
         gevent.sleep(0)
 
+    def remove_listener(self, callback):
+        self._listeners = [listener for listener in self._listeners if listener[2] != callback]
+
     def _process_msgs(self):
         while True:
-            msg = self._messages.get()
-            self._log.debug('%s - %s' % msg)
+            self._msgs_waiting.wait()
+            self._msgs_waiting.clear()
+            self._write_msgs()
 
     def _setup_msg_system(self):
-        messages = Queue(None)
+        messages = deque(maxlen=MAX_PENDING_DEBUG_MSGS)
         gevent.spawn(self._process_msgs)
         return messages
 
+    def _write_msgs(self):
+        if self.dropped_debug_msgs:
+            self._log.debug('%s - Monitor: %d debug messages dropped' % (datetime.now(), self.dropped_debug_msgs))
+            self.metrics.increment('debug_msgs_dropped', self.dropped_debug_msgs)
+            self.dropped_debug_msgs = 0
+        while self._messages:
+            timestamp, msg, args = self._messages.popleft()
+            self._log.debug('%s - %s' % (timestamp, _format(msg, args)))
+
     def _setup_notification_queue(self):
+        # only holds the few notifications sent while nothing listens, and notifiers must not block on it
         return Queue(None)
+
+
+def _format(msg, args):
+    if args is None:
+        return msg
+    try:
+        return msg % args
+    except Exception, e:
+        # the writer greenlet must outlive a bad message, or every message after it is lost
+        return '%s, args %r, could not be formatted: %s' % (msg, args, e)
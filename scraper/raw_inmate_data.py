@@ -2,8 +2,14 @@
 import os.path
 import csv
 from collections import OrderedDict
+from datetime import datetime
 import shutil
 
+import gevent
+from gevent.queue import JoinableQueue
+
+from columnar_file import ColumnarReader, ColumnarWriter, DATE, DATETIME, DICTIONARY, INTEGER, PLAIN, STRING
+
 RAW_INMATE_DATA_BUILD_DIR = 'CCJ_RAW_INMATE_DATA_BUILD_DIR'
 RAW_INMATE_DATA_RELEASE_DIR = 'CCJ_RAW_INMATE_DATA_RELEASE_DIR'
 STORE_RAW_INMATE_DATA = 'CCJ_STORE_RAW_INMATE_DATA'
@@ -11,8 +17,31 @@ STORE_RAW_INMATE_DATA = 'CCJ_STORE_RAW_INMATE_DATA'
 FEATURE_CONTROL_IDS = [RAW_INMATE_DATA_BUILD_DIR, RAW_INMATE_DATA_RELEASE_DIR]
 FEATURE_SWITCH_IDS = [STORE_RAW_INMATE_DATA]
 
+# Optional feature control, selects the snapshot file format, defaults to CSV
+RAW_INMATE_DATA_FORMAT = 'CCJ_RAW_INMATE_DATA_FORMAT'
+
+COLUMNAR_FORMAT = 'columnar'
+CSV_FORMAT = 'csv'
+
+FILE_EXTENSIONS = {COLUMNAR_FORMAT: '.columnar', CSV_FORMAT: '.csv'}
+
+_SNAP_SHOT_DATE_FORMAT = '%Y-%m-%d'
+
+# Inmates are handed to the writer in blocks, at most MAX_PENDING_BLOCKS blocks wait to be written
+BLOCK_SIZE = 250
+MAX_PENDING_BLOCKS = 4
+BUILD_FILE_BUFFER_SIZE = 1024 * 1024
+
 
 class RawInmateData:
+    """
+    Stores the details of every inmate scraped into a daily snapshot file.
+
+    add() only buffers the inmate. Rows are built and written a block at a time by a writer greenlet,
+    so storing raw data adds next to nothing to the inmate's trip to the database. The buffer is
+    bounded: add() waits when the writer falls MAX_PENDING_BLOCKS blocks behind. The file is only
+    fsync'd by finish().
+    """
 
     HEADER_METHOD_NAMES = OrderedDict([
         ('Booking_Id', 'jail_id'),
@@ -30,6 +59,23 @@ class RawInmateData:
         ('Court_Location', 'court_house_location')
     ])
 
+    # Types and encodings used by the columnar format, only the ids are mostly unique
+    COLUMNS = [
+        ('Booking_Id', STRING, PLAIN),
+        ('Booking_Date', DATE, DICTIONARY),
+        ('Inmate_Hash', STRING, PLAIN),
+        ('Gender', STRING, DICTIONARY),
+        ('Race', STRING, DICTIONARY),
+        ('Height', STRING, DICTIONARY),
+        ('Weight', STRING, DICTIONARY),
+        ('Age_At_Booking', INTEGER, DICTIONARY),
+        ('Housing_Location', STRING, DICTIONARY),
+        ('Charges', STRING, DICTIONARY),
+        ('Bail_Amount', STRING, DICTIONARY),
+        ('Court_Date', DATETIME, DICTIONARY),
+        ('Court_Location', STRING, DICTIONARY)
+    ]
+
     def __init__(self, snap_shot_date, feature_controls, monitor):
         if feature_controls is None:
             feature_controls = {}
@@ -42,18 +88,22 @@ class RawInmateData:
         self.__build_file_writer = None
         self.__build_file = None
         self.__build_file_name = None
+        self.__columnar_writer = None
+        self.__block = []
+        self.__blocks = None
+        self.__writer = None
+        self.__format = CSV_FORMAT
         self.__feature_activated = False
         self.__configure_feature(feature_controls)
 
     def add(self, inmate_details):
         if not self.__feature_activated:
             return
-        if self.__build_file_writer is None:
+        if self.__build_file_name is None:
             self.__open_build_file()
-        inmate_info = [
-            getattr(inmate_details, method_name)() for method_name in RawInmateData.HEADER_METHOD_NAMES.itervalues()
-        ]
-        self.__build_file_writer.writerow(inmate_info)
+        self.__block.append(inmate_details)
+        if len(self.__block) == BLOCK_SIZE:
+            self.__send_block()
 
     def __configure_feature(self, feature_controls):
         if not (STORE_RAW_INMATE_DATA in feature_controls and feature_controls[STORE_RAW_INMATE_DATA]):
@@ -64,10 +114,17 @@ class RawInmateData:
         okay, self.__raw_inmate_dir = self.__feature_control(feature_controls, RAW_INMATE_DATA_RELEASE_DIR)
         if not okay:
             return
+        self.__configure_format(feature_controls.get(RAW_INMATE_DATA_FORMAT))
         self.__feature_activated = True
 
-    def __debug(self, msg, debug_level=None):
-        self.__monitor.debug('{0}: {1}'.format(self.__klass_name, msg), debug_level)
+    def __configure_format(self, file_format):
+        if file_format in FILE_EXTENSIONS:
+            self.__format = file_format
+        elif file_format:
+            self.__debug("Unknown raw inmate data format '%s', using %s" % (file_format, CSV_FORMAT))
+
+    def __debug(self, msg, debug_level=None, args=None):
+        self.__monitor.debug(self.__klass_name + ': ' + msg, debug_level, args)
 
     def __ensure_year_dir(self):
         year_dir = os.path.join(self.__raw_inmate_dir, self.__snap_shot_date.strftime('%Y'))
@@ -88,18 +145,213 @@ class RawInmateData:
         return okay, dir_name
 
     def __file_name(self):
-        return self.__snap_shot_date.strftime('%Y-%m-%d.csv')
+        return self.__snap_shot_date.strftime(_SNAP_SHOT_DATE_FORMAT) + FILE_EXTENSIONS[self.__format]
 
     def finish(self):
         if not self.__feature_activated:
             return
-        self.__build_file.close()
+        if self.__build_file_name is None:
+            self.__open_build_file()
+        self.flush()
+        self.__writer.kill()
+        if self.__columnar_writer is not None:
+            self.__columnar_writer.close()
+        else:
+            os.fsync(self.__build_file.fileno())
+            self.__build_file.close()
         year_dir = self.__ensure_year_dir()
         shutil.move(self.__build_file_name, year_dir)
 
+    def flush(self):
+        """
+        Waits until every inmate added so far has been written, and pushed to the operating system
+        """
+        if self.__blocks is None:
+            return
+        self.__send_block()
+        self.__blocks.join()
+        if self.__build_file is not None:
+            self.__build_file.flush()
+
     def __open_build_file(self):
         self.__build_file_name = os.path.join(self.__build_dir, self.__file_name())
-        self.__build_file = open(self.__build_file_name, "w")
+        self.__blocks = JoinableQueue(MAX_PENDING_BLOCKS)
+        self.__writer = gevent.spawn(self.__write_blocks)
+        if self.__format == COLUMNAR_FORMAT:
+            self.__columnar_writer = ColumnarWriter(self.__build_file_name, RawInmateData.COLUMNS)
+            return
+        self.__build_file = open(self.__build_file_name, "w", BUILD_FILE_BUFFER_SIZE)
         self.__build_file_writer = csv.writer(self.__build_file)
         header_names = [header_name for header_name in RawInmateData.HEADER_METHOD_NAMES.iterkeys()]
         self.__build_file_writer.writerow(header_names)
+
+    def __send_block(self):
+        if self.__block:
+            self.__blocks.put(self.__block)
+            self.__block = []
+
+    def __write_blocks(self):
+        while True:
+            block = self.__blocks.get()
+            try:
+                for inmate_details in block:
+                    self.__write_row(inmate_details)
+            finally:
+                self.__blocks.task_done()
+
+    def __write_row(self, inmate_details):
+        """
+        Builds and writes one inmate's row, an inmate whose details cannot be read is left out on its own
+        """
+        try:
+            row = [getattr(inmate_details, method_name)()
+                   for method_name in RawInmateData.HEADER_METHOD_NAMES.itervalues()]
+            if self.__columnar_writer is not None:
+                self.__columnar_writer.add(row)
+            else:
+                self.__build_file_writer.writerow(row)
+        except Exception, e:
+            self.__debug("Could not store raw inmate data of inmate '%s', skipped it\nException is %s",
+                         args=(_jail_id(inmate_details), e))
+
+
+class RawInmateRecord:
+    """
+    One row of a raw inmate data file. Presents the same named interface as InmateDetails, so a
+    stored snapshot can be fed through the code that processes freshly scraped inmates.
+
+    It is also what the scraper hands on once it has fetched an inmate, see from_details(), as it
+    is a fraction of the size of the parsed page an InmateDetails holds on to.
+    """
+
+    def __init__(self, row):
+        self.__row = row
+
+    @staticmethod
+    def from_details(inmate_details):
+        """
+        Reads every field from inmate_details. A field that cannot be read raises the same exception
+        when asked for, so the record fails where the details would have.
+        """
+        row = {}
+        for header, method_name in RawInmateData.HEADER_METHOD_NAMES.iteritems():
+            try:
+                row[header] = getattr(inmate_details, method_name)()
+            except Exception, e:
+                row[header] = _UnreadableField(e)
+        return RawInmateRecord(row)
+
+    def __eq__(self, other):
+        return isinstance(other, RawInmateRecord) and self.__row == other.__row
+
+    def __ne__(self, other):
+        return not self == other
+
+    def age_at_booking(self):
+        return self.__value('Age_At_Booking')
+
+    def bail_amount(self):
+        return self.__value('Bail_Amount')
+
+    def booking_date(self):
+        return self.__value('Booking_Date')
+
+    def charges(self):
+        return self.__value('Charges')
+
+    def court_house_location(self):
+        return self.__value('Court_Location')
+
+    def gender(self):
+        return self.__value('Gender')
+
+    def hash_id(self):
+        return self.__value('Inmate_Hash')
+
+    def height(self):
+        return self.__value('Height')
+
+    def housing_location(self):
+        return self.__value('Housing_Location')
+
+    def jail_id(self):
+        return self.__value('Booking_Id')
+
+    def next_court_date(self):
+        return self.__value('Court_Date')
+
+    def race(self):
+        return self.__value('Race')
+
+    def weight(self):
+        return self.__value('Weight')
+
+    def __value(self, header):
+        value = self.__row[header]
+        if isinstance(value, _UnreadableField):
+            raise value.exception
+        return value
+
+
+class _UnreadableField:
+
+    def __init__(self, exception):
+        self.exception = exception
+
+
+def _jail_id(inmate_details):
+    try:
+        return inmate_details.jail_id()
+    except Exception:
+        return 'unknown'
+
+
+def _convert_datetime(value, datetime_format, just_date=False):
+    if value == '':
+        return None
+    result = datetime.strptime(value, datetime_format)
+    return result.date() if just_date else result
+
+
+def _convert_int(value):
+    return None if value == '' else int(value)
+
+
+# CSV files hold the str() of each value, None is an empty cell
+_CSV_CONVERSIONS = {
+    'Age_At_Booking': _convert_int,
+    'Booking_Date': lambda value: _convert_datetime(value, '%Y-%m-%d', True),
+    'Court_Date': lambda value: _convert_datetime(value, '%Y-%m-%d %H:%M:%S'),
+}
+
+
+def _csv_value(header, value):
+    value = value.decode('utf-8')
+    return _CSV_CONVERSIONS[header](value) if header in _CSV_CONVERSIONS else value
+
+
+def raw_inmate_records(file_name):
+    """
+    Generates the records stored in a raw inmate data file, of either format
+    """
+    if file_name.endswith(FILE_EXTENSIONS[COLUMNAR_FORMAT]):
+        with ColumnarReader(file_name) as reader:
+            for row in reader.rows():
+                yield RawInmateRecord(row)
+        return
+    with open(file_name, 'rb') as raw_inmate_data_file:
+        for row in csv.DictReader(raw_inmate_data_file):
+            yield RawInmateRecord(dict((header, _csv_value(header, value)) for header, value in row.iteritems()))
+
+
+def snap_shot_date(file_name):
+    """
+    Returns the date of the snapshot held in a raw inmate data file, None if it is not named like one
+    """
+    base_name, extension = os.path.splitext(os.path.basename(file_name))
+    if extension not in FILE_EXTENSIONS.values():
+        return None
+    try:
+        return datetime.strptime(base_name, _SNAP_SHOT_DATE_FORMAT).date()
+    except ValueError:
+        return None
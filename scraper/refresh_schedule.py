@@ -0,0 +1,81 @@
+from heapq import nlargest
+from math import sqrt
+
+from countyapi.inmate import Inmate
+from utils import ONE_DAY
+
+# an inmate whose court date is this close, before or after today, is likely to get a new one,
+# a new bail or be discharged
+COURT_DATE_DAYS_BEFORE = 2
+COURT_DATE_DAYS_AFTER = 1
+COURT_DATE_WEIGHT = 4
+
+# the first days after booking are when housing, charges and bail settle
+RECENT_BOOKING_DAYS = 7
+RECENT_BOOKING_WEIGHT = 3
+
+# each housing or charges change discovered in the last CHURN_DAYS, up to MAX_CHURN of them
+CHURN_DAYS = 30
+CHURN_WEIGHT = 1
+MAX_CHURN = 5
+
+
+class RefreshSchedule:
+    """
+    Picks the inmates in jail to refresh, within a fixed number of requests, by how likely their
+    records are to have changed since they were last seen rather than by staleness alone. Every
+    inmate's likelihood starts at 1 and grows with
+        - a court date within COURT_DATE_DAYS_BEFORE days before today or COURT_DATE_DAYS_AFTER after
+        - a booking within the last RECENT_BOOKING_DAYS days
+        - the housing and charges changes discovered in the last CHURN_DAYS days
+    and its priority is the hours since it was last seen times the square root of its likelihood.
+    Refreshing each inmate at a rate growing with the square root of its rate of change, rather
+    than with the rate itself, is what keeps the changes waiting least, on average, to be picked
+    up. So an inmate with a court hearing today is refreshed a few times as often as one who has
+    sat in the same cell for months, and no inmate waits forever, the priority of a stable one
+    keeps growing.
+
+    The facts come from four queries over all the inmates in jail, whatever the number refreshed.
+    """
+
+    def __init__(self, inmate_class=Inmate):
+        self._inmate_class = inmate_class
+
+    def inmates_to_refresh(self, now, seen_before, limit):
+        """
+        Returns the jail ids of at most limit inmates in jail last seen before seen_before, the highest
+        priority first.
+        """
+        if limit <= 0:
+            return []
+        today = now.date()
+        court_date_inmates_ids = self._inmate_class.active_inmates_ids_with_court_date_between(
+            today - ONE_DAY * COURT_DATE_DAYS_BEFORE, today + ONE_DAY * COURT_DATE_DAYS_AFTER)
+        history_changes = self._inmate_class.active_inmates_history_changes_since(today - ONE_DAY * CHURN_DAYS)
+        recent_booking_date = today - ONE_DAY * RECENT_BOOKING_DAYS
+
+        def priority(jail_id, last_seen, booking_date):
+            likelihood = change_likelihood(jail_id in court_date_inmates_ids,
+                                           booking_date is not None and booking_date >= recent_booking_date,
+                                           history_changes.get(jail_id, 0))
+            return _hours_between(last_seen, now) * sqrt(likelihood)
+
+        priorities = ((priority(jail_id, last_seen, booking_date), jail_id)
+                      for jail_id, last_seen, booking_date in self._inmate_class.active_inmates_last_seen(seen_before))
+        return [jail_id for priority, jail_id in nlargest(limit, priorities)]
+
+
+def change_likelihood(court_date_near, booked_recently, number_history_changes):
+    """
+    Returns how many times more likely than a stable inmate's an inmate's record is to have changed
+    """
+    likelihood = 1
+    if court_date_near:
+        likelihood += COURT_DATE_WEIGHT
+    if booked_recently:
+        likelihood += RECENT_BOOKING_WEIGHT
+    return likelihood + CHURN_WEIGHT * min(number_history_changes, MAX_CHURN)
+
+
+def _hours_between(start, end):
+    return max((end - start).total_seconds(), 0) / 3600.0
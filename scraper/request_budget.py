@@ -0,0 +1,25 @@
+from time import time
+
+import gevent
+
+
+class RequestBudget:
+    """
+    Spaces out the requests made to the sheriff's website, by all the Http instances sharing it,
+    so together they send at most requests_per_second. acquire() is called before each request and
+    sleeps the greenlet until the next free slot.
+    """
+
+    def __init__(self, requests_per_second):
+        self._interval = 1.0 / requests_per_second
+        self._next_slot = time()
+        self.requests = 0
+
+    def acquire(self):
+        now = time()
+        slot = max(now, self._next_slot)
+        # the slot is taken before sleeping, so the greenlets that come in meanwhile queue up behind it
+        self._next_slot = slot + self._interval
+        self.requests += 1
+        if slot > now:
+            gevent.sleep(slot - now)
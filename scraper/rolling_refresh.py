@@ -0,0 +1,121 @@
+from datetime import date, datetime, timedelta
+
+import gevent
+from gevent.event import Event
+
+from countyapi.inmate import Inmate
+from http import Http
+from inmate_details import InmateDetails
+from inmates import Inmates
+from inmates_scraper import InmatesScraper, CCJ_INMATE_DETAILS_URL
+from jail_ids import jail_id_for, JailIdIndex
+from raw_inmate_data import RawInmateData
+from refresh_schedule import RefreshSchedule
+from request_budget import RequestBudget
+from utils import ONE_DAY
+
+# a steady rate the sheriff's site takes all day, the nightly run peaks well above it
+REQUESTS_PER_SECOND = 2
+
+CYCLE_SECONDS = 15 * 60
+
+# inmates seen this recently are not refreshed again
+MIN_REFRESH_AGE = timedelta(hours=6)
+
+# number of the newest booking days probed for new inmates, today included
+PROBE_DAYS = 2
+
+# booking numbers probed past the highest known one of each day
+PROBE_AHEAD = 20
+
+
+class RollingRefresh:
+    """
+    Keeps the database fresh continuously, rather than in one nightly burst. Each cycle it
+        - probes, on the newest booking days, the booking numbers just past the highest known one
+        - refreshes the inmates in jail most likely to have changed since they were last seen, as
+          many as the cycle's share of requests_per_second allows, leaving out those seen within
+          MIN_REFRESH_AGE, see RefreshSchedule
+    then waits for the fetches and database writes, publishes the cycle's changes with publish,
+    given the cycle's start time, and writes the metrics. Every request goes through one
+    RequestBudget, so the load on the sheriff's site and on the database stays level.
+
+    The changes themselves appear in the /changes feed as they are written, see InmateChange.
+    """
+
+    def __init__(self, monitor, publish=None, requests_per_second=REQUESTS_PER_SECOND, cycle_seconds=CYCLE_SECONDS,
+                 metrics_file=None, http=None, details_url=CCJ_INMATE_DETAILS_URL):
+        self._monitor = monitor
+        self._publish = publish
+        self._requests_per_cycle = max(int(requests_per_second * cycle_seconds), 1)
+        self._cycle_seconds = cycle_seconds
+        self._metrics_file = metrics_file
+        self._http = http if http is not None else Http(request_budget=RequestBudget(requests_per_second))
+        self._details_url = details_url
+        self._refresh_schedule = RefreshSchedule(Inmate)
+        self._stopped = Event()
+        self.cycles = 0
+
+    def _debug(self, msg):
+        self._monitor.debug('RollingRefresh: %s' % msg)
+
+    def run(self, max_cycles=None):
+        """
+        Runs cycles, each one at least cycle_seconds long, until stop() is called or max_cycles is reached
+        """
+        self._debug('started, %d requests per cycle of %d seconds' % (self._requests_per_cycle, self._cycle_seconds))
+        inmates = Inmates(Inmate, RawInmateData(None, None, self._monitor), self._monitor)
+        inmates_scraper = InmatesScraper(self._http, inmates, InmateDetails, self._monitor,
+                                         details_url=self._details_url)
+        while not self._stopped.is_set() and (max_cycles is None or self.cycles < max_cycles):
+            start_time = datetime.now()
+            self.run_cycle(inmates_scraper, inmates, start_time)
+            elapsed = (datetime.now() - start_time).total_seconds()
+            if max_cycles is None or self.cycles < max_cycles:
+                self._stopped.wait(max(self._cycle_seconds - elapsed, 0))
+        self._debug('stopped after %d cycles' % self.cycles)
+
+    def run_cycle(self, inmates_scraper, inmates, start_time):
+        new_inmate_ids = self._new_inmate_probes()
+        refreshed_inmate_ids = self._refresh_schedule.inmates_to_refresh(
+            start_time, start_time - MIN_REFRESH_AGE, self._requests_per_cycle - len(new_inmate_ids))
+        for inmate_id in new_inmate_ids:
+            inmates_scraper.create_if_exists(inmate_id)
+        for inmate_id in refreshed_inmate_ids:
+            inmates_scraper.update_inmate_status(inmate_id)
+        inmates_scraper.wait_until_idle()
+        inmates.wait_until_idle()
+        if self._publish is not None:
+            self._publish(start_time)
+        self.cycles += 1
+        cycle_seconds = (datetime.now() - start_time).total_seconds()
+        self._monitor.metrics.increment('rolling_refresh_cycles')
+        self._monitor.metrics.increment('rolling_refresh_inmates', len(refreshed_inmate_ids), {'kind': 'refreshed'})
+        self._monitor.metrics.increment('rolling_refresh_inmates', len(new_inmate_ids), {'kind': 'probed'})
+        self._monitor.metrics.observe('rolling_refresh_cycle_seconds', cycle_seconds)
+        if self._metrics_file:
+            self._monitor.metrics.write(self._metrics_file)
+        self._debug('cycle %d, probed %d new and refreshed %d inmates in %.1f seconds' %
+                    (self.cycles, len(new_inmate_ids), len(refreshed_inmate_ids), cycle_seconds))
+
+    def _new_inmate_probes(self):
+        """
+        Returns the jail ids to probe on each of the newest booking days, the PROBE_AHEAD booking
+        numbers after the highest known one.
+        """
+        today = date.today()
+        first_day = today - ONE_DAY * (PROBE_DAYS - 1)
+        known_inmates_ids = JailIdIndex(Inmate.known_inmates_ids_between(first_day, today))
+        probes = []
+        cur_date = first_day
+        while cur_date <= today:
+            booking_numbers = known_inmates_ids.booking_numbers_on(cur_date)
+            highest = booking_numbers[-1] if booking_numbers else 0
+            probes.extend(jail_id_for(cur_date, booking_number)
+                          for booking_number in range(highest + 1, highest + PROBE_AHEAD + 1))
+            cur_date += ONE_DAY
+        return probes
+
+    def stop(self):
+        self._stopped.set()
+        gevent.sleep(0)
@@ -1,12 +1,18 @@
+from datetime import datetime
+from time import time
 
+from backfill import Backfill
 from controller import Controller
 from search_commands import SearchCommands
 from inmates_scraper import InmatesScraper
 from inmates import Inmates
 from countyapi.inmate import Inmate
+from countyapi.current_population import CurrentPopulation
+from countyapi.inmate_documents import InmateDocuments
 from inmate_details import InmateDetails
 from http import Http
 from raw_inmate_data import RawInmateData
+from rolling_refresh import RollingRefresh
 
 
 class Scraper:
@@ -14,30 +20,54 @@ class Scraper:
     def __init__(self, monitor):
         self.__monitor = monitor
 
-    def check_for_missing_inmates(self, start_date):
+    def check_for_missing_inmates(self, start_date, shards=1, requests_per_second=None):
+        """
+        Searches for the inmates booked from start_date to yesterday missing from the database. The
+        days are split into shards searched at once, see Backfill.
+        """
         self._debug('started check_for_missing_inmates')
-        raw_inmate_data = RawInmateData(None, None, self.__monitor)
-        inmates = Inmates(Inmate, raw_inmate_data, self.__monitor)
-        inmates_scraper = InmatesScraper(Http(), inmates, InmateDetails, self.__monitor, workers_to_start=70)
-        search_commands = SearchCommands(inmates_scraper, self.__monitor)
-        controller = Controller(self.__monitor, search_commands, inmates_scraper, inmates)
-        controller.find_missing_inmates(start_date)
-        self._debug('waiting for check_for_missing_inmates processing to finish')
-        controller.wait_for_finish()
+        start_time = datetime.now()
+        Backfill(self.__monitor, start_date, shards=shards, requests_per_second=requests_per_second).run()
+        self._refresh_derived_data(start_time)
+        self._record_run_time('missing inmates', start_time)
         self._debug('finished check_for_missing_inmates')
 
     def _debug(self, msg):
         self.__monitor.debug('Scraper: %s' % msg)
 
-    def run(self, snap_shot_date, feature_controls):
+    def _record_run_time(self, run, start_time):
+        self.__monitor.metrics.set_gauge('run_seconds', (datetime.now() - start_time).total_seconds(), {'run': run})
+        self.__monitor.metrics.set_gauge('run_finished_timestamp_seconds', time(), {'run': run})
+
+    def _refresh_derived_data(self, start_time):
+        refresh_start_time = datetime.now()
+        self._debug('refreshing current population')
+        CurrentPopulation(self.__monitor).refresh()
+        self._debug('building inmate documents')
+        InmateDocuments(self.__monitor).rebuild(seen_since=start_time)
+        self.__monitor.metrics.set_gauge('phase_seconds', (datetime.now() - refresh_start_time).total_seconds(),
+                                         {'phase': 'derived data refresh'})
+
+    def rolling_refresh(self, requests_per_second, metrics_file=None):
+        """
+        Returns a RollingRefresh that publishes each cycle's changes to the current population and
+        the inmate documents. Its run() goes on until its stop() is called.
+        """
+        return RollingRefresh(self.__monitor, self._refresh_derived_data, requests_per_second,
+                              metrics_file=metrics_file)
+
+    def run(self, snap_shot_date, feature_controls, pipelined=False):
         self._debug('started')
+        start_time = datetime.now()
         raw_inmate_data = RawInmateData(snap_shot_date, feature_controls, self.__monitor)
         inmates = Inmates(Inmate, raw_inmate_data, self.__monitor)
         inmates_scraper = InmatesScraper(Http(), inmates, InmateDetails, self.__monitor)
         search_commands = SearchCommands(inmates_scraper, self.__monitor)
         controller = Controller(self.__monitor, search_commands, inmates_scraper, inmates)
-        controller.run()
+        controller.run(pipelined)
         self._debug('waiting for processing to finish')
         controller.wait_for_finish()
         raw_inmate_data.finish()
+        self._refresh_derived_data(start_time)
+        self._record_run_time('daily', start_time)
         self._debug('finished')
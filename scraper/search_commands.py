@@ -2,9 +2,14 @@ from datetime import date
 
 from utils import ONE_DAY, yesterday
 from concurrent_base import ConcurrentBase
+from jail_ids import jail_id_for, JailIdIndex
 
 MAX_INMATE_NUMBER = 350
 
+# one per kind of search, so when the controller runs them at once they all feed the inmates scraper
+# and its queue decides what is fetched first
+WORKERS_TO_START = 3
+
 
 class SearchCommands(ConcurrentBase):
 
@@ -15,7 +20,7 @@ class SearchCommands(ConcurrentBase):
     FINISHED_UPDATE_INMATES_STATUS = _NOTIFICATION_MSG_TEMPLATE % 'update inmates status'
 
     def __init__(self, inmate_scraper, monitor):
-        super(SearchCommands, self).__init__(monitor)
+        super(SearchCommands, self).__init__(monitor, WORKERS_TO_START)
         self._inmate_scraper = inmate_scraper
 
     def check_if_really_discharged(self, discharged_inmates_ids):
@@ -26,21 +31,25 @@ class SearchCommands(ConcurrentBase):
             self._inmate_scraper.resurrect_if_found(discharged_inmate_id)
         self._notify(self.FINISHED_CHECK_OF_RECENTLY_DISCHARGED_INMATES)
 
-    def find_inmates(self, exclude_list=None, number_to_fetch=MAX_INMATE_NUMBER, start_date=None):
+    def find_inmates(self, exclude_list=None, number_to_fetch=MAX_INMATE_NUMBER, start_date=None, end_date=None):
         if exclude_list is None:
-            exclude_list = []
+            exclude_list = JailIdIndex()
+        elif not isinstance(exclude_list, JailIdIndex):
+            exclude_list = JailIdIndex(exclude_list)
         if start_date is None:
             start_date = yesterday()
         self._put(self._find_inmates, {'excluded_inmates': exclude_list, 'number_to_fetch': number_to_fetch,
-                                       'start_date': start_date})
+                                       'start_date': start_date, 'end_date': end_date})
 
     def _find_inmates(self, args):
-        excluded_inmates = set(args['excluded_inmates'])
+        excluded_inmates = args['excluded_inmates']
         cur_date = args['start_date']
-        while cur_date <= yesterday():
-            for inmate_id in _jail_ids(cur_date, args['number_to_fetch']):
-                if inmate_id not in excluded_inmates:
-                    self._inmate_scraper.create_if_exists(inmate_id)
+        end_date = args['end_date'] if args['end_date'] is not None else yesterday()
+        while cur_date <= end_date:
+            excluded_booking_numbers = set(excluded_inmates.booking_numbers_on(cur_date))
+            for booking_number in range(1, args['number_to_fetch'] + 1):
+                if booking_number not in excluded_booking_numbers:
+                    self._inmate_scraper.create_if_exists(jail_id_for(cur_date, booking_number))
             cur_date += ONE_DAY
         self._notify(self.FINISHED_FIND_INMATES)
 
@@ -53,8 +62,3 @@ class SearchCommands(ConcurrentBase):
         self._notify(self.FINISHED_UPDATE_INMATES_STATUS)
 
 
-def _jail_ids(cur_date, number_to_fetch):
-    prefix = cur_date.strftime("%Y-%m%d") + '%03d'
-    for booking_number in range(1, number_to_fetch + 1):
-        yield prefix % booking_number
-
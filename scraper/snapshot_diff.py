@@ -0,0 +1,105 @@
+import cPickle
+import csv
+import heapq
+import tempfile
+
+from raw_inmate_data import RawInmateData, raw_inmate_records
+
+BOOKING_ID = 'Booking_Id'
+
+# Change types
+BOOKED = 'BOOKED'  # in the new snapshot only
+CHANGED = 'CHANGED'  # in both, one row per changed field
+LEFT = 'LEFT'  # in the old snapshot only, usually discharged
+
+CHANGE_LOG_HEADER = ['Booking_Id', 'Change', 'Field', 'Old_Value', 'New_Value']
+
+# Rows held in memory while sorting, larger snapshots are sorted in runs spilled to temporary files
+SORT_RUN_SIZE = 20000
+
+_FIELD_NAMES = [header for header in RawInmateData.HEADER_METHOD_NAMES.iterkeys() if header != BOOKING_ID]
+
+
+def _rows(file_name):
+    for inmate_record in raw_inmate_records(file_name):
+        yield [getattr(inmate_record, method_name)() for method_name in RawInmateData.HEADER_METHOD_NAMES.itervalues()]
+
+
+def _run_rows(run_file):
+    try:
+        while True:
+            yield cPickle.load(run_file)
+    except EOFError:
+        run_file.close()
+
+
+def _spill(run):
+    run_file = tempfile.TemporaryFile()
+    for row in sorted(run):
+        cPickle.dump(row, run_file, cPickle.HIGHEST_PROTOCOL)
+    run_file.seek(0)
+    return run_file
+
+
+def sorted_rows(file_name, sort_run_size=SORT_RUN_SIZE):
+    """
+    Generates the rows of a raw inmate data file ordered by Booking_Id, the first value of each row.
+    At most sort_run_size rows of a CSV file are held in memory at a time. A columnar file stores
+    each column as a single compressed chunk, so its columns are read whole before the first run is
+    sorted, which takes memory in proportion to the snapshot.
+    """
+    run, run_files = [], []
+    for row in _rows(file_name):
+        run.append(row)
+        if len(run) == sort_run_size:
+            run_files.append(_spill(run))
+            run = []
+    if not run_files:
+        for row in sorted(run):
+            yield row
+        return
+    if run:
+        run_files.append(_spill(run))
+    for row in heapq.merge(*[_run_rows(run_file) for run_file in run_files]):
+        yield row
+
+
+def _text(value):
+    return u'' if value is None else unicode(value)
+
+
+def diff(old_rows, new_rows):
+    """
+    Merge joins two sequences of rows ordered by Booking_Id and generates the changes between them
+    as (booking id, change, field, old value, new value) tuples. Runs in linear time and only holds
+    one row of each sequence.
+    """
+    old_rows, new_rows = iter(old_rows), iter(new_rows)
+    old_row, new_row = next(old_rows, None), next(new_rows, None)
+    while old_row is not None or new_row is not None:
+        if new_row is None or (old_row is not None and old_row[0] < new_row[0]):
+            yield old_row[0], LEFT, '', '', ''
+            old_row = next(old_rows, None)
+        elif old_row is None or new_row[0] < old_row[0]:
+            yield new_row[0], BOOKED, '', '', ''
+            new_row = next(new_rows, None)
+        else:
+            for field_name, old_value, new_value in zip(_FIELD_NAMES, old_row[1:], new_row[1:]):
+                if old_value != new_value:
+                    yield new_row[0], CHANGED, field_name, _text(old_value), _text(new_value)
+            old_row, new_row = next(old_rows, None), next(new_rows, None)
+
+
+def write_change_log(old_file_name, new_file_name, change_log_file, sort_run_size=SORT_RUN_SIZE):
+    """
+    Writes the changes between two raw inmate data snapshots, of either format, as CSV.
+    Returns the number of changes of each type.
+    """
+    counts = {BOOKED: 0, CHANGED: 0, LEFT: 0}
+    writer = csv.writer(change_log_file)
+    writer.writerow(CHANGE_LOG_HEADER)
+    for change in diff(sorted_rows(old_file_name, sort_run_size), sorted_rows(new_file_name, sort_run_size)):
+        counts[change[1]] += 1
+        writer.writerow([_text(value).encode('utf-8') for value in change])
+    return counts
+
@@ -5,5 +5,11 @@ class ThrowawayCommandsQueue:
     def __init__(self):
         pass
 
+    def full(self):
+        return False
+
     def put(self, _):
         pass
+
+    def qsize(self):
+        return 0
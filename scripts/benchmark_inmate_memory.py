@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+
+import argparse
+import resource
+import subprocess
+import sys
+from datetime import datetime
+
+from scraper.inmate_details import InmateDetails
+from scraper.raw_inmate_data import RawInmateRecord
+
+DETAILS = 'details'
+RECORD = 'record'
+
+HAND_OFFS = {
+    DETAILS: InmateDetails,
+    RECORD: lambda html: RawInmateRecord.from_details(InmateDetails(html)),
+}
+
+
+def _peak_memory_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def measure(hand_off, html, number_inmates):
+    """
+    Holds number_inmates hand offs at once, as when the database writer falls behind the fetchers,
+    and returns the memory that took, in kilobytes, and the time it took, in seconds.
+    """
+    make_hand_off = HAND_OFFS[hand_off]
+    start_memory, start_time = _peak_memory_kb(), datetime.now()
+    held = [make_hand_off(html) for _ in xrange(number_inmates)]
+    elapsed = (datetime.now() - start_time).total_seconds()
+    assert len(held) == number_inmates
+    return _peak_memory_kb() - start_memory, elapsed
+
+
+def benchmark_inmate_memory():
+
+    parser = argparse.ArgumentParser(description=('Compares the memory taken by the inmates the scraper hands to the '
+                                                  'database writer, as parsed detail pages or as plain records.'))
+    parser.add_argument('-n', '--inmates', action='store', type=int, dest='number_inmates', default=10000,
+                        help='Number of inmates held at once.')
+    parser.add_argument('--page', action='store', dest='page', default='tests/data/2014-0117015.html',
+                        help='Inmate details page to parse for every inmate.')
+    parser.add_argument('--hand-off', action='store', dest='hand_off', choices=sorted(HAND_OFFS), default=None,
+                        help='Measure just this hand off, in this process. By default each one is measured in a '
+                             'process of its own.')
+
+    args = parser.parse_args()
+
+    if args.hand_off:
+        with open(args.page) as page:
+            html = page.read()
+        print('%d %f' % measure(args.hand_off, html, args.number_inmates))
+        return
+
+    for hand_off in sorted(HAND_OFFS):
+        output = subprocess.check_output([sys.executable, sys.argv[0], '--inmates=%d' % args.number_inmates,
+                                          '--page=%s' % args.page, '--hand-off=%s' % hand_off])
+        memory_kb, elapsed = output.split()
+        print('%-8s %d inmates: %8.1f MB, %6.0f bytes per inmate, built in %.1f seconds' %
+              (hand_off, args.number_inmates, int(memory_kb) / 1024.0,
+               int(memory_kb) * 1024.0 / args.number_inmates, float(elapsed)))
+
+if __name__ == '__main__':
+    benchmark_inmate_memory()
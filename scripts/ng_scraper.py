@@ -3,9 +3,14 @@
 from datetime import datetime, date, timedelta
 import logging, argparse
 import os
+import signal
+
+import gevent
 
 from scraper.scraper import Scraper
 from scraper.monitor import Monitor
+from scraper.backfill import REQUESTS_PER_SECOND as BACKFILL_REQUESTS_PER_SECOND
+from scraper.rolling_refresh import REQUESTS_PER_SECOND
 
 log = logging.getLogger('main')
 
@@ -17,11 +22,14 @@ log = logging.getLogger('main')
 #
 # The SWITCH IDS are used to turn on and off features
 #
-FEATURE_CONTROL_IDS = ['CCJ_RAW_INMATE_DATA_RELEASE_DIR', 'CCJ_RAW_INMATE_DATA_BUILD_DIR']
+FEATURE_CONTROL_IDS = ['CCJ_RAW_INMATE_DATA_RELEASE_DIR', 'CCJ_RAW_INMATE_DATA_BUILD_DIR', 'CCJ_RAW_INMATE_DATA_FORMAT']
 FEATURE_SWITCH_IDS = ['CCJ_STORE_RAW_INMATE_DATA']
 
 NEGATIVE_VALUES = {'0', 'false'}
 
+# gevent.signal was renamed gevent.signal_handler in gevent 1.5
+signal_handler = getattr(gevent, 'signal_handler', None) or gevent.signal
+
 
 def env_var_active(env_var):
     """
@@ -52,24 +60,56 @@ def ng_scraper():
     parser.add_argument('-d', '--day', action='store', dest='start_date', default=None,
                         help=('Specify day to search for missing inmates, format is YYYY-MM-DD. '
                               'If not specified, searches all days.'))
+    parser.add_argument('--shards', action='store', type=int, dest='shards', default=1,
+                        help=('With --day, split the days searched into this many ranges, each searched at the same '
+                              'time by a pipeline of its own, with a share of the workers.'))
+    parser.add_argument('--requests-per-second', action='store', type=float, dest='requests_per_second',
+                        default=None,
+                        help=('The most requests per second sent to the sheriff\'s site, by all the pipelines of a '
+                              '--day search together, %s by default with --shards, otherwise unlimited, or by '
+                              '--daemon, %s by default.' %
+                              (BACKFILL_REQUESTS_PER_SECOND, REQUESTS_PER_SECOND)))
+    parser.add_argument('--daemon', action='store_true', dest='daemon', default=False,
+                        help=('Keep running, refreshing the inmates seen longest ago and probing the newest booking '
+                              'days at a steady rate, until stopped with SIGTERM or SIGINT.'))
     parser.add_argument('--verbose', action="store_true", dest='verbose', default=False,
                         help='Turn on verbose mode.')
+    parser.add_argument('--verbose-sample', action='store', type=int, dest='verbose_sample_every', default=1,
+                        help='In verbose mode, log only one in this many of the messages about single inmates.')
+    parser.add_argument('--metrics-file', action='store', dest='metrics_file', default=None,
+                        help=('Write timings, counts and queue depths of the run to this file, in the Prometheus '
+                              'textfile format if its name ends in .prom, otherwise as JSON.'))
+    parser.add_argument('--pipelined', action="store_true", dest='pipelined', default=False,
+                        help=('Update the status of known inmates, search for new ones and check recently discharged '
+                              'ones all at once rather than one after the other.'))
 
     args = parser.parse_args()
 
+    monitor = Monitor(log, verbose_debug_mode=args.verbose, verbose_sample_every=args.verbose_sample_every)
     try:
-        monitor = Monitor(log, verbose_debug_mode=args.verbose)
         monitor.debug("%s - Started scraping inmates from Cook County Sheriff's site." % datetime.now())
 
         scraper = Scraper(monitor)
-        if args.start_date:
-            scraper.check_for_missing_inmates(datetime.strptime(args.start_date, '%Y-%m-%d').date())
+        if args.daemon:
+            rolling_refresh = scraper.rolling_refresh(args.requests_per_second or REQUESTS_PER_SECOND,
+                                                      args.metrics_file)
+            signal_handler(signal.SIGTERM, rolling_refresh.stop)
+            signal_handler(signal.SIGINT, rolling_refresh.stop)
+            rolling_refresh.run()
+        elif args.start_date:
+            scraper.check_for_missing_inmates(datetime.strptime(args.start_date, '%Y-%m-%d').date(), args.shards,
+                                              args.requests_per_second)
         else:
-            scraper.run(date.today() - timedelta(1), feature_controls())
+            scraper.run(date.today() - timedelta(1), feature_controls(), args.pipelined)
+
+        if args.metrics_file and not args.daemon:
+            monitor.metrics.write(args.metrics_file)
 
         monitor.debug("%s - Finished scraping inmates from Cook County Sheriff's site." % datetime.now())
     except Exception, e:
         log.exception(e)
+    finally:
+        monitor.flush()
 
 if __name__ == '__main__':
     ng_scraper()
\ No newline at end of file
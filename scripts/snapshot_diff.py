@@ -0,0 +1,32 @@
+#!/usr/bin/env python
+
+import argparse
+import sys
+
+from scraper.snapshot_diff import write_change_log, SORT_RUN_SIZE
+
+
+def snapshot_diff():
+
+    parser = argparse.ArgumentParser(description=('Lists the changes between two raw inmate data snapshots: '
+                                                  'bookings, inmates that left and changed fields.'))
+    parser.add_argument('old_snapshot', help='Earlier raw inmate data file, CSV or columnar.')
+    parser.add_argument('new_snapshot', help='Later raw inmate data file, CSV or columnar.')
+    parser.add_argument('-o', '--output', action='store', dest='output', default=None,
+                        help='File to write the change log to, defaults to standard output.')
+    parser.add_argument('--sort-run-size', action='store', type=int, dest='sort_run_size', default=SORT_RUN_SIZE,
+                        help=('Number of rows sorted in memory at a time. Columnar snapshots are read '
+                              'whole first, whatever the number.'))
+
+    args = parser.parse_args()
+
+    change_log_file = open(args.output, 'wb') if args.output else sys.stdout
+    try:
+        counts = write_change_log(args.old_snapshot, args.new_snapshot, change_log_file, args.sort_run_size)
+    finally:
+        if args.output:
+            change_log_file.close()
+    sys.stderr.write('%s\n' % ', '.join('%s: %d' % (change, count) for change, count in sorted(counts.items())))
+
+if __name__ == '__main__':
+    snapshot_diff()
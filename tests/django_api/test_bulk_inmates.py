@@ -0,0 +1,52 @@
+from datetime import date
+import json
+from countyapi.bulk_inmates import inmate_record, records_from_csv, records_from_ndjson
+
+
+class TestBulkInmates:
+
+    """
+        Tests the parsing and validation of bulk inmate records, nothing here touches the database.
+
+        - records shaped like the API's detail output are accepted, nested objects included
+        - fields are converted to their model types
+        - invalid records are reported with their line number
+        - CSV rows with the same jail_id are merged into one record
+    """
+
+    def test_api_shaped_record(self):
+        record = inmate_record({
+            'jail_id': '2014-0101001', 'resource_uri': '/api/1.0/countyinmate/2014-0101001/',
+            'booking_date': '2014-01-01', 'age_at_booking': '30', 'in_jail': True,
+            'housing_history': [{'housing_location': {'housing_location': '05-L-2-2-1'},
+                                 'housing_date_discovered': '2014-01-02'}],
+            'court_dates': [{'date': '2014-02-01', 'location': {'location': 'Room 100'}}],
+        })
+        assert record['jail_id'] == '2014-0101001'
+        assert record['fields'] == {'booking_date': date(2014, 1, 1), 'age_at_booking': 30, 'in_jail': True}
+        assert record['housing_history'] == [('05-L-2-2-1', date(2014, 1, 2))]
+        assert record['court_dates'] == [(date(2014, 2, 1), 'Room 100')]
+        assert record['charges_history'] == []
+
+    def test_ndjson_reports_bad_lines(self):
+        text = '\n'.join([json.dumps({'jail_id': '2014-0101001'}), '',
+                          json.dumps({'jail_id': '2014-0101002', 'booking_date': '01/01/2014'}),
+                          json.dumps({'jail_id': '2014-0101003', 'shoe_size': 10}),
+                          '[1, 2]'])
+        records, errors = records_from_ndjson(text)
+        assert [record['jail_id'] for record in records] == ['2014-0101001']
+        assert len(errors) == 3
+        assert errors[0].startswith('line 3: booking_date')
+        assert errors[1] == "line 4: unknown field 'shoe_size'"
+        assert errors[2] == 'line 5: not a JSON object'
+
+    def test_csv_merges_rows(self):
+        text = 'jail_id,gender,in_jail,charges,charges_date_seen\n' \
+               '2014-0101001,M,,720 ILCS 5 12-3,2014-01-02\n' \
+               '2014-0101001,,false,720 ILCS 5 19-1,2014-01-05\n'
+        records, errors = records_from_csv(text)
+        assert errors == []
+        assert len(records) == 1
+        assert records[0]['fields'] == {'gender': 'M', 'in_jail': False}
+        assert records[0]['charges_history'] == [('720 ILCS 5 12-3', None, date(2014, 1, 2)),
+                                                 ('720 ILCS 5 19-1', None, date(2014, 1, 5))]
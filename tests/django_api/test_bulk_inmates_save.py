@@ -0,0 +1,53 @@
+from datetime import date, datetime
+
+from django.db import connection
+from mock import Mock
+
+from countyapi.bulk_inmates import BulkInmates, inmate_record
+from countyapi.models import CountyInmate, InmateChange
+
+
+def _records(number_inmates, **fields):
+    return [inmate_record(dict({'jail_id': '2014-01010%02d' % number, 'booking_date': '2014-01-01',
+                                'gender': 'M'}, **fields))
+            for number in range(number_inmates)]
+
+
+class TestBulkInmatesSave:
+
+    """
+        Tests storing bulk inmate records
+
+        - inmates seen again with the same details are updated together
+        - changes are logged as the scraper logs them
+    """
+
+    def test_unchanged_inmates_are_updated_together(self, db):
+        bulk_inmates = BulkInmates(Mock())
+        assert bulk_inmates.save(_records(20)) == (20, 0)
+        records = _records(20)
+        records[0]['fields']['bail_amount'] = 5000
+        connection.use_debug_cursor, number_queries = True, len(connection.queries)
+        try:
+            assert bulk_inmates.save(records) == (0, 20)
+            updates = [query['sql'] for query in connection.queries[number_queries:]
+                       if query['sql'].startswith('UPDATE "countyapi_countyinmate"')]
+        finally:
+            connection.use_debug_cursor = None
+        assert len(updates) == 2
+        assert CountyInmate.objects.get(jail_id='2014-0101000').bail_amount == 5000
+        assert CountyInmate.objects.filter(last_seen_date__gte=date.today()).count() == 20
+
+    def test_changes_are_logged(self, db):
+        bulk_inmates = BulkInmates(Mock())
+        bulk_inmates.save(_records(2))
+        records = _records(2, housing_history=[{'housing_location': '05-L-2-2-1'}])
+        records[1]['fields']['discharge_date_earliest'] = datetime(2014, 2, 1, 10)
+        bulk_inmates.save(records)
+        bulk_inmates.save(_records(2))
+        assert list(InmateChange.objects.values_list('jail_id', 'change', 'fields')) == [
+            ('2014-0101000', InmateChange.CREATED, 'booking_date,gender'),
+            ('2014-0101001', InmateChange.CREATED, 'booking_date,gender'),
+            ('2014-0101000', InmateChange.UPDATED, 'housing_history'),
+            ('2014-0101001', InmateChange.DISCHARGED, 'in_jail,housing_history'),
+        ]
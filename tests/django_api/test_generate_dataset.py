@@ -0,0 +1,30 @@
+from datetime import date
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+import pytest
+
+from countyapi.models import CountyInmate
+from countyapi.synthetic_data import SyntheticInmates
+
+
+class TestGenerateDataset:
+
+    def test_running_twice_updates_the_same_inmates(self, db):
+        options = {'number_inmates': 30, 'bookings_per_day': 10, 'batch_size': 20, 'end_date': '2014-03-01',
+                   'verbosity': 0}
+        call_command('generate_dataset', **options)
+        last_seen_dates = dict(CountyInmate.objects.values_list('jail_id', 'last_seen_date'))
+        call_command('generate_dataset', **options)
+        assert CountyInmate.objects.count() == 30
+        assert dict(CountyInmate.objects.values_list('jail_id', 'last_seen_date')) == last_seen_dates
+        assert max(last_seen_dates.itervalues()).date() < date(2014, 3, 1)
+
+    def test_too_many_bookings_per_day(self):
+        with pytest.raises(CommandError):
+            call_command('generate_dataset', number_inmates=10, bookings_per_day=1000, verbosity=0)
+
+    def test_inmates_are_seen_after_they_are_booked(self):
+        inmates = list(SyntheticInmates(end_date=date(2014, 3, 1)).inmates(25, bookings_per_day=10))
+        assert max(inmate['booking_date'] for inmate in inmates) == date(2014, 2, 28)
+        assert all(inmate['last_seen_date'].date() >= inmate['booking_date'] for inmate in inmates)
@@ -0,0 +1,46 @@
+import json
+
+from django.core.cache import cache
+from django.test.client import Client
+from mock import Mock
+
+from countyapi.inmate import Inmate
+from countyapi.inmate_documents import InmateDocuments
+from countyapi.models import CountyInmate, InmateDocument
+
+COUNTY_INMATE_DETAIL_URL = '/api/1.0/countyinmate/2014-0101001/'
+
+
+class TestInmateDocuments:
+
+    def setup_method(self, method):
+        # the API caches the inmates it reads, whatever the test
+        cache.clear()
+        self.client = Client(REMOTE_ADDR='127.0.0.1')
+
+    def _detail(self):
+        return self.client.get(COUNTY_INMATE_DETAIL_URL, {'format': 'json'})
+
+    def test_detail_after_put_is_not_the_stored_document(self, db):
+        CountyInmate.objects.create(jail_id='2014-0101001', gender='M', race='WH')
+        InmateDocuments(Mock()).rebuild()
+        assert InmateDocument.objects.filter(jail_id='2014-0101001').exists()
+        inmate = json.loads(self._detail().content)
+        inmate['race'] = 'BK'
+        response = self.client.put(COUNTY_INMATE_DETAIL_URL, json.dumps(inmate), content_type='application/json')
+        assert response.status_code in (202, 204)
+        assert not InmateDocument.objects.filter(jail_id='2014-0101001').exists()
+        assert json.loads(self._detail().content)['race'] == 'BK'
+
+    def test_detail_after_delete_is_not_found(self, db):
+        CountyInmate.objects.create(jail_id='2014-0101001')
+        InmateDocuments(Mock()).rebuild()
+        assert self.client.delete(COUNTY_INMATE_DETAIL_URL).status_code == 204
+        assert self._detail().status_code == 404
+
+    def test_detail_after_discharge_is_not_the_stored_document(self, db):
+        CountyInmate.objects.create(jail_id='2014-0101001')
+        InmateDocuments(Mock()).rebuild()
+        Inmate.discharge('2014-0101001', Mock())
+        assert not InmateDocument.objects.filter(jail_id='2014-0101001').exists()
+        assert json.loads(self._detail().content)['in_jail'] is False
@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+
+from django.http import HttpResponse
+from django.test.client import RequestFactory
+from mock import patch
+
+from countyapi import middleware
+from countyapi.middleware import DEHYDRATE, explain, ProfilerMiddleware, RequestProfile, timed
+
+
+class TestProfilerMiddleware:
+
+    def setup_method(self, method):
+        self.profiler = ProfilerMiddleware()
+        self.request_factory = RequestFactory()
+
+    def test_nested_phases_are_timed_once(self):
+        profile = RequestProfile(0)
+        with patch.object(middleware, 'datetime') as mock_datetime:
+            mock_datetime.now.side_effect = [_time(0), _time(3)]
+            with profile.timed(DEHYDRATE):
+                with profile.timed(DEHYDRATE):
+                    pass
+        assert profile.phase_seconds[DEHYDRATE] == 3
+
+    def test_profiled_request_gets_profile_headers(self):
+        request = self.request_factory.get('/api/1.0/countyinmate/', {'profile': '1'}, REMOTE_ADDR='127.0.0.1')
+        with patch.object(middleware, 'connection') as mock_connection:
+            mock_connection.queries = [{'sql': 'SELECT 1', 'time': '0.500'}]
+            self.profiler.process_request(request)
+            mock_connection.queries.append({'sql': 'SELECT 2', 'time': '0.250'})
+            with patch.object(middleware, 'log_slowest_statements'):
+                response = self.profiler.process_response(request, HttpResponse())
+        assert response['X-Profile-Queries'] == '1'
+        assert response['X-Profile-SQL-Seconds'] == '0.2500'
+
+    def test_connection_is_put_back_after_a_failed_request(self):
+        request = self.request_factory.get('/api/1.0/countyinmate/', {'profile': '1'}, REMOTE_ADDR='127.0.0.1')
+        with patch.object(middleware, 'connection') as mock_connection:
+            mock_connection.queries = []
+            mock_connection.use_debug_cursor = None
+            make_debug_cursor = mock_connection.make_debug_cursor
+            self.profiler.process_request(request)
+            assert mock_connection.use_debug_cursor
+            self.profiler.process_exception(request, ValueError())
+            assert mock_connection.use_debug_cursor is None
+            assert mock_connection.make_debug_cursor is make_debug_cursor
+
+    def test_queries_are_explained_with_their_parameters(self):
+        with patch.object(middleware, 'connection') as mock_connection:
+            mock_connection.vendor = 'sqlite'
+            cursor = mock_connection.cursor.return_value
+            cursor.fetchall.return_value = [(0, 0, 0, 'SEARCH TABLE countyapi_countyinmate')]
+            assert explain({'sql': "SELECT 1 WHERE jail_id = 2014-0101001", 'time': '0.100',
+                            'raw_sql': 'SELECT 1 WHERE jail_id = %s', 'params': ('2014-0101001',)}) == \
+                ['0 0 0 SEARCH TABLE countyapi_countyinmate']
+        cursor.execute.assert_called_once_with('EXPLAIN QUERY PLAN SELECT 1 WHERE jail_id = %s', ('2014-0101001',))
+
+    def test_requests_from_other_ips_are_not_profiled(self):
+        request = self.request_factory.get('/api/1.0/countyinmate/', {'profile': '1'}, REMOTE_ADDR='10.0.0.1')
+        assert self.profiler.process_request(request) is None
+        response = self.profiler.process_response(request, HttpResponse())
+        assert not response.has_header('X-Profile-Queries')
+        with timed(request, DEHYDRATE):
+            pass
+
+    def test_stats_are_not_served_to_other_ips(self):
+        request = self.request_factory.get(middleware.PROFILE_STATS_PATH, REMOTE_ADDR='10.0.0.1')
+        assert self.profiler.process_request(request) is None
+
+
+def _time(seconds):
+    return datetime(2014, 1, 1) + timedelta(seconds=seconds)
@@ -0,0 +1,57 @@
+from datetime import date
+from time import time
+
+from mock import Mock
+
+from scraper.backfill import Backfill, BackfillProgress, expected_probes, shard_date_ranges, REQUESTS_PER_SECOND
+from scraper.jail_ids import JailIdIndex
+from scraper.request_budget import RequestBudget
+
+
+class Test_Backfill:
+
+    def test_shard_date_ranges(self):
+        assert shard_date_ranges(date(2014, 1, 1), date(2014, 1, 10), 3) == [
+            (date(2014, 1, 1), date(2014, 1, 4)),
+            (date(2014, 1, 5), date(2014, 1, 7)),
+            (date(2014, 1, 8), date(2014, 1, 10)),
+        ]
+
+    def test_no_more_shards_than_days(self):
+        assert shard_date_ranges(date(2014, 1, 1), date(2014, 1, 2), 5) == [
+            (date(2014, 1, 1), date(2014, 1, 1)),
+            (date(2014, 1, 2), date(2014, 1, 2)),
+        ]
+
+    def test_expected_probes_leave_out_known_inmates(self):
+        known_inmates_ids = JailIdIndex(['2014-0101001', '2014-0101003', '2014-0102009'])
+        assert expected_probes(known_inmates_ids, date(2014, 1, 1), date(2014, 1, 3), number_to_fetch=5) == \
+            {'2014-0101': 3, '2014-0102': 5, '2014-0103': 5}
+
+    def test_progress_reports_days_done(self):
+        monitor = Mock()
+        progress = BackfillProgress(monitor, {'2014-0101': 2, '2014-0102': 0, '2014-0103': 1})
+        assert progress.days_done == 1
+        progress.probed('2014-0101001', True)
+        assert progress.days_done == 1
+        progress.probed('2014-0101002', False)
+        assert progress.days_done == 2
+        assert progress.probes() == 2
+        assert progress.found() == 1
+        msg, = monitor.debug.call_args[0]
+        assert msg % monitor.debug.call_args[1]['args'] == \
+            'Backfill: day 2014-0101 done, 2 probes, 1 inmates found, 2 of 3 days done'
+
+    def test_only_sharded_backfills_are_throttled_by_default(self):
+        assert Backfill(Mock(), date(2014, 1, 1))._request_budget is None
+        assert Backfill(Mock(), date(2014, 1, 1), requests_per_second=5)._request_budget is not None
+        sharded_backfill = Backfill(Mock(), date(2014, 1, 1), shards=4)
+        assert sharded_backfill._request_budget._interval == 1.0 / REQUESTS_PER_SECOND
+
+    def test_request_budget_spaces_requests(self):
+        request_budget = RequestBudget(requests_per_second=50)
+        start_time = time()
+        for _ in range(6):
+            request_budget.acquire()
+        assert time() - start_time >= 0.1
+        assert request_budget.requests == 6
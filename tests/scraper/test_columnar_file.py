@@ -0,0 +1,49 @@
+from datetime import date, datetime
+from mock import patch
+from scraper.columnar_file import ColumnarReader, ColumnarWriter, DATE, DATETIME, DICTIONARY, INTEGER, PLAIN, STRING
+
+
+class TestColumnarFile:
+
+    COLUMNS = [('id', STRING, PLAIN), ('booked', DATE, DICTIONARY), ('court', DATETIME, DICTIONARY),
+               ('age', INTEGER, DICTIONARY), ('location', STRING, DICTIONARY)]
+
+    def __write(self, file_name, number_rows):
+        writer = ColumnarWriter(file_name, self.COLUMNS)
+        for index in range(number_rows):
+            writer.add(self.__row(index))
+        writer.close()
+
+    @staticmethod
+    def __row(index):
+        return ['id-%d' % index, date(2014, 1, 1 + index % 28), None if index % 3 else datetime(2014, 2, 7, 9, 30),
+                20 + index % 40, u'05-L-%d' % (index % 5)]
+
+    def test_rows_read_back_typed(self, tmpdir):
+        file_name = str(tmpdir.join('table.columnar'))
+        self.__write(file_name, 1000)
+        with ColumnarReader(file_name) as reader:
+            assert reader.number_rows == 1000
+            assert reader.column_names == [name for name, _, _ in self.COLUMNS]
+            for index, row in enumerate(reader.rows()):
+                assert [row[name] for name in reader.column_names] == self.__row(index)
+
+    def test_close_fsyncs_the_file(self, tmpdir):
+        file_name = str(tmpdir.join('table.columnar'))
+        with patch('scraper.columnar_file.os.fsync') as fsync:
+            self.__write(file_name, 10)
+        assert fsync.call_count == 1
+
+    def test_reading_some_columns(self, tmpdir):
+        file_name = str(tmpdir.join('table.columnar'))
+        self.__write(file_name, 10)
+        with ColumnarReader(file_name) as reader:
+            assert reader.column('age') == [20 + index for index in range(10)]
+            assert list(reader.rows(['id']))[2] == {'id': 'id-2'}
+
+    def test_empty_table(self, tmpdir):
+        file_name = str(tmpdir.join('table.columnar'))
+        self.__write(file_name, 0)
+        with ColumnarReader(file_name) as reader:
+            assert reader.number_rows == 0
+            assert reader.column('location') == []
@@ -3,9 +3,10 @@ import gevent
 from mock import Mock, call
 from datetime import date, timedelta
 
-from scraper.controller import Controller, NEW_INMATE_SEARCH_WINDOW_SIZE
+from scraper.controller import Controller
 from scraper.monitor import Monitor
 from scraper.heartbeat import HEARTBEAT_INTERVAL
+from scraper.jail_ids import JailIdIndex
 from scraper.search_commands import SearchCommands
 
 
@@ -33,7 +34,7 @@ class TestController:
 
     def test_controller_can_be_stopped(self):
         inmates = Mock()
-        controller = Controller(self._monitor, self._search, self._inmate_scraper, inmates)
+        controller = Controller(self._monitor, self._search, self._inmate_scraper, inmates, heartbeat=True)
         assert not controller.is_running
         assert controller.heartbeat_count == 0
         run_controller(controller)
@@ -43,6 +44,13 @@ class TestController:
         self.stop_controller(controller)
         assert controller.heartbeat_count == expected_num_heartbeats
 
+    def test_no_heartbeat_by_default(self):
+        controller = Controller(self._monitor, self._search, self._inmate_scraper, Mock())
+        run_controller(controller)
+        gevent.sleep(HEARTBEAT_INTERVAL + TIME_PADDING)
+        self.stop_controller(controller)
+        assert controller.heartbeat_count == 0
+
     def test_scraping(self):
         """
         This tests the normal operating loop of the scraper. It makes sure that it orchestrates
@@ -60,11 +68,11 @@ class TestController:
         controller = Controller(self._monitor, self._search, self._inmate_scraper, inmates)
         run_controller(controller)
         assert inmates.active_inmates_ids.call_args_list == [call(controller.inmates_response_q)]
-        active_jail_ids, missing_inmate_exclude_list = gen_active_ids_previous_10_days_before_yesterday()
+        active_jail_ids = gen_active_ids_previous_10_days_before_yesterday()
         send_response(controller, active_jail_ids)
         assert self._search.update_inmates_status.call_args_list == [call(active_jail_ids)]
         self.send_notification(self._search, SearchCommands.FINISHED_UPDATE_INMATES_STATUS)
-        assert self._search.find_inmates.call_args_list == [call(exclude_list=missing_inmate_exclude_list,
+        assert self._search.find_inmates.call_args_list == [call(exclude_list=active_jail_ids,
                                                                  start_date=date.today() - ONE_DAY * 6)]
         self.send_notification(self._search, SearchCommands.FINISHED_FIND_INMATES)
         assert inmates.recently_discharged_inmates_ids.call_args_list == [call(controller.inmates_response_q)]
@@ -76,6 +84,40 @@ class TestController:
         assert inmates.finish.call_args_list == [call()]
         self.send_notification(inmates, inmates.FINISHED_PROCESSING)
         assert not controller.is_running
+        assert controller.phase_timings.keys() == ['active inmates ids', 'update inmates status', 'new inmates search',
+                                                   'recently discharged inmates ids', 'discharged inmates check',
+                                                   'inmates scraper finish', 'inmates finish']
+
+    def test_pipelined_scraping(self):
+        """
+        In pipelined mode the status update, new inmates search and discharged inmates check all run
+        at once, inmate_scraper is only told to finish once all three have generated their commands
+        """
+        inmates = Mock()
+        controller = Controller(self._monitor, self._search, self._inmate_scraper, inmates)
+        controller.run(pipelined=True)
+        gevent.sleep(0.001)
+        assert inmates.active_inmates_ids.call_args_list == [call(controller.inmates_response_q)]
+        assert inmates.recently_discharged_inmates_ids.call_args_list == \
+            [call(controller.discharged_inmates_response_q)]
+        discharged_jail_ids = ['2014-0101001']
+        controller.discharged_inmates_response_q.put(discharged_jail_ids)
+        gevent.sleep(TIME_PADDING)
+        assert self._search.check_if_really_discharged.call_args_list == [call(discharged_jail_ids)]
+        self.send_notification(self._search, SearchCommands.FINISHED_CHECK_OF_RECENTLY_DISCHARGED_INMATES)
+        active_jail_ids = gen_active_ids_previous_10_days_before_yesterday()
+        send_response(controller, active_jail_ids)
+        assert self._search.update_inmates_status.call_args_list == [call(active_jail_ids)]
+        assert self._search.find_inmates.call_args_list == [call(exclude_list=active_jail_ids,
+                                                                 start_date=date.today() - ONE_DAY * 6)]
+        self.send_notification(self._search, SearchCommands.FINISHED_FIND_INMATES)
+        assert self._inmate_scraper.finish.call_args_list == []
+        self.send_notification(self._search, SearchCommands.FINISHED_UPDATE_INMATES_STATUS)
+        assert self._inmate_scraper.finish.call_args_list == [call()]
+        self.send_notification(self._inmate_scraper, self._inmate_scraper.FINISHED_PROCESSING)
+        assert inmates.finish.call_args_list == [call()]
+        self.send_notification(inmates, inmates.FINISHED_PROCESSING)
+        assert not controller.is_running
 
     def test_search_missing_inmates(self):
         inmates = Mock()
@@ -83,10 +125,11 @@ class TestController:
         start_date = date.today() - TIMEDELTA_MISSING_INMATES
         controller_missing_inmates(controller, start_date)
         assert inmates.known_inmates_ids_starting_with.call_args_list == [call(controller.inmates_response_q,
-                                                                               start_date)]
+                                                                               start_date, None)]
         known_inmate_ids = ['1', '2']
         send_response(controller, known_inmate_ids)
-        assert self._search.find_inmates.call_args_list == [call(exclude_list=known_inmate_ids, start_date=start_date)]
+        assert self._search.find_inmates.call_args_list == [call(exclude_list=known_inmate_ids, start_date=start_date,
+                                                                 end_date=None)]
         self.send_notification(self._search, SearchCommands.FINISHED_FIND_INMATES)
         assert self._inmate_scraper.finish.call_args_list == [call()]
         self.send_notification(self._inmate_scraper, self._inmate_scraper.FINISHED_PROCESSING)
@@ -94,6 +137,27 @@ class TestController:
         self.send_notification(inmates, inmates.FINISHED_PROCESSING)
         assert not controller.is_running
 
+    def test_shared_inmates_writer_is_left_running(self):
+        inmates = Mock()
+        controller = Controller(self._monitor, self._search, self._inmate_scraper, inmates, finish_inmates=False)
+        controller_missing_inmates(controller, date.today() - TIMEDELTA_MISSING_INMATES)
+        send_response(controller, ['1', '2'])
+        self.send_notification(self._search, SearchCommands.FINISHED_FIND_INMATES)
+        self.send_notification(self._inmate_scraper, self._inmate_scraper.FINISHED_PROCESSING)
+        assert not inmates.finish.called
+        assert not controller.is_running
+
+    def test_search_missing_inmates_with_known_inmates_ids(self):
+        inmates = Mock()
+        controller = Controller(self._monitor, self._search, self._inmate_scraper, inmates)
+        start_date = date.today() - TIMEDELTA_MISSING_INMATES
+        known_inmate_ids = JailIdIndex(['2014-0101001'])
+        controller.find_missing_inmates(start_date, known_inmates_ids=known_inmate_ids)
+        gevent.sleep(0.001)
+        assert not inmates.known_inmates_ids_starting_with.called
+        assert self._search.find_inmates.call_args_list == [call(exclude_list=known_inmate_ids, start_date=start_date,
+                                                                 end_date=None)]
+
 
 def controller_missing_inmates(controller, start_date):
     """
@@ -114,7 +178,7 @@ def gen_active_ids_previous_10_days_before_yesterday():
         for count in inmate_counts:
             inmate_ids.append(cur_date.strftime('%Y-%m%d' + count))
         cur_date -= ONE_DAY
-    return inmate_ids, inmate_ids[0 : len(inmate_counts) * NEW_INMATE_SEARCH_WINDOW_SIZE]
+    return JailIdIndex(inmate_ids)
 
 
 def run_controller(controller):
@@ -0,0 +1,31 @@
+from datetime import date
+
+from scraper.fake_sheriff_site import FakeSheriffSite
+from scraper.inmate_details import InmateDetails
+
+TODAY = date(2014, 1, 20)
+
+
+class TestFakeSheriffSite:
+
+    def test_population(self):
+        site = FakeSheriffSite(days=2, bookings_per_day=100, missing_density=0.25, today=TODAY)
+        jail_ids = list(site.jail_ids())
+        assert 100 < len(jail_ids) < 200
+        assert jail_ids[0].startswith('2014-0118')
+        assert jail_ids[-1].startswith('2014-0119')
+        assert not site.exists('2014-0120001')
+        assert not site.exists('2014-0119101')
+        assert FakeSheriffSite(days=2, bookings_per_day=100, missing_density=0.25, today=TODAY).page(jail_ids[0]) == \
+            site.page(jail_ids[0])
+
+    def test_pages_parse_like_the_real_ones(self):
+        site = FakeSheriffSite(today=TODAY)
+        jail_id = next(site.jail_ids())
+        inmate_details = InmateDetails(site.page(jail_id))
+        assert inmate_details.jail_id() == jail_id
+        assert inmate_details.booking_date() == date(2014, 1, 13)
+        assert inmate_details.gender() in ['M', 'F']
+        assert inmate_details.next_court_date().date() > TODAY
+        assert len(inmate_details.hash_id()) == 64
+        assert 18 <= inmate_details.age_at_booking() <= 71
@@ -6,6 +6,7 @@ import gevent
 from gevent.queue import Queue
 
 from scraper.inmates_scraper import InmatesScraper, CCJ_INMATE_DETAILS_URL
+from scraper.raw_inmate_data import RawInmateData, RawInmateRecord
 
 ONE_SECOND = 1
 
@@ -33,7 +34,7 @@ class Test_InmatesScraper:
         expected_inmate_details_calls_args = []
         for jail_id in jail_ids:
             if not http.bad_response_desired(jail_id):
-                expected_inmate_details_calls_args.append(call(jail_id, InmateDetails_TestDouble(jail_id)))
+                expected_inmate_details_calls_args.append(call(jail_id, inmate_record(jail_id)))
             inmate_scraper.create_if_exists(jail_id)
         assert inmates.add.call_args_list == expected_inmate_details_calls_args
 
@@ -48,7 +49,7 @@ class Test_InmatesScraper:
         for jail_id in jail_ids:
             expected_http_calls_args.append(CCJ_INMATE_DETAILS_URL + jail_id)
             if not http.bad_response_desired(jail_id):
-                expected_inmate_details_calls_args.append(InmateDetails_TestDouble(jail_id))
+                expected_inmate_details_calls_args.append(inmate_record(jail_id))
         expected_inmate_details_calls_args.append(expected_inmate_details_calls_args.pop(0))
         inmate_create_if_msgs = []
         count = len(expected_inmate_details_calls_args)
@@ -76,7 +77,7 @@ class Test_InmatesScraper:
             if http.bad_response_desired(jail_id):
                 expected_discharge_calls_args.append(call(jail_id))
             else:
-                expected_update_calls_args.append(call(jail_id, InmateDetails_TestDouble(jail_id)))
+                expected_update_calls_args.append(call(jail_id, inmate_record(jail_id)))
         for jail_id in jail_ids:
             inmate_scraper.update_inmate_status(jail_id)
         assert inmates.update.call_args_list == expected_update_calls_args
@@ -90,6 +91,60 @@ class Test_InmatesScraper:
         inmate_scraper.finish()
         assert monitor.notify.call_args_list == [call(inmate_scraper.__class__, inmate_scraper.FINISHED_PROCESSING)]
 
+    def test_status_updates_come_first(self):
+        http = Http_TestDouble(use_sleep=True)
+        inmate_scraper = InmatesScraper(http, Mock(), InmateDetails_TestDouble, Mock(), workers_to_start=1)
+        inmate_scraper.update_inmate_status('jail_id_1')  # keeps the only worker busy while the rest are queued
+        inmate_scraper.create_if_exists('jail_id_3')
+        inmate_scraper.resurrect_if_found('jail_id_5')
+        inmate_scraper.update_inmate_status('jail_id_7')
+        gevent.sleep(ONE_SECOND * 2.6)
+        assert http.get_args_list() == [CCJ_INMATE_DETAILS_URL + jail_id
+                                        for jail_id in ['jail_id_1', 'jail_id_7', 'jail_id_5', 'jail_id_3']]
+
+    def test_put_blocks_when_queue_is_full(self):
+        http = Http_TestDouble(use_sleep=True)
+        inmate_scraper = InmatesScraper(http, Mock(), InmateDetails_TestDouble, Mock(), workers_to_start=1,
+                                        max_pending=2)
+        jail_ids = ['jail_id_%d' % j_id for j_id in range(1, 6)]
+        putter = gevent.spawn(lambda: [inmate_scraper.create_if_exists(jail_id) for jail_id in jail_ids])
+        gevent.sleep(0.1)
+        assert not putter.ready()
+        assert inmate_scraper.queue_depth() == 2
+        assert inmate_scraper.blocked_puts == 1
+        putter.join()
+        assert inmate_scraper.max_queue_depth == 2
+
+    def test_full_queue_admits_status_updates_first(self):
+        http = Http_TestDouble(use_sleep=True)
+        inmate_scraper = InmatesScraper(http, Mock(), InmateDetails_TestDouble, Mock(), workers_to_start=1,
+                                        max_pending=1)
+        inmate_scraper.update_inmate_status('jail_id_1')  # keeps the only worker busy
+        inmate_scraper.create_if_exists('jail_id_3')  # fills the queue
+        blocked = [gevent.spawn(inmate_scraper.create_if_exists, 'jail_id_5'),
+                   gevent.spawn(inmate_scraper.update_inmate_status, 'jail_id_7')]
+        gevent.sleep(0.1)
+        assert inmate_scraper.blocked_puts == 2
+        gevent.joinall(blocked)
+        gevent.sleep(ONE_SECOND * 3.6)
+        assert http.get_args_list() == [CCJ_INMATE_DETAILS_URL + jail_id
+                                        for jail_id in ['jail_id_1', 'jail_id_3', 'jail_id_7', 'jail_id_5']]
+
+    def test_finish_waits_for_blocked_puts(self):
+        http = Http_TestDouble()
+        monitor = Mock()
+        inmate_scraper = InmatesScraper(http, Mock(), InmateDetails_TestDouble, monitor, workers_to_start=1,
+                                        max_pending=1)
+        requests_when_finished = []
+        monitor.notify.side_effect = lambda notifier, msg: requests_when_finished.append(len(http.get_args_list()))
+        putters = [gevent.spawn(inmate_scraper.create_if_exists, 'jail_id_%d' % j_id) for j_id in range(1, 6)]
+        gevent.sleep(0)
+        assert inmate_scraper.blocked_puts > 0
+        inmate_scraper.finish()
+        gevent.joinall(putters)
+        gevent.sleep(0.1)
+        assert requests_when_finished == [5]
+
     def test_resurrect_if_found(self):
         http = Http_TestDouble()
         inmates = Mock()
@@ -99,19 +154,25 @@ class Test_InmatesScraper:
         expected_update_calls_args = []
         for jail_id in jail_ids:
             if not http.bad_response_desired(jail_id):
-                expected_update_calls_args.append(call(jail_id, InmateDetails_TestDouble(jail_id)))
+                expected_update_calls_args.append(call(jail_id, inmate_record(jail_id)))
         for jail_id in jail_ids:
             inmate_scraper.resurrect_if_found(jail_id)
         assert inmates.update.call_args_list == expected_update_calls_args
 
 
 class InmateDetails_TestDouble:
+    """
+    Every field of the inmate details is the html it was given
+    """
+
+    def __init__(self, html):
+        for method_name in RawInmateData.HEADER_METHOD_NAMES.itervalues():
+            setattr(self, method_name, lambda: html)
 
-    def __init__(self, details):
-        self._details = details
 
-    def __eq__(self, other):
-        return self.__class__ == other.__class__ and (CCJ_INMATE_DETAILS_URL + self._details) == other._details
+def inmate_record(jail_id):
+    return RawInmateRecord(dict((header, CCJ_INMATE_DETAILS_URL + jail_id)
+                                for header in RawInmateData.HEADER_METHOD_NAMES.iterkeys()))
 
 
 class Http_TestDouble:
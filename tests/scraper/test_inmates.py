@@ -1,8 +1,10 @@
+from datetime import date
 
 from gevent.queue import Queue
 from mock import Mock, call
 
 from scraper.inmates import Inmates
+from utils import yesterday
 
 
 class TestInmates:
@@ -12,14 +14,14 @@ class TestInmates:
 
     def test_active_inmates_ids(self):
         inmate_class = Mock()
-        j_ids = [j_id for j_id in range(1, 4)]
+        j_ids = ['2014-01170%02d' % booking_number for booking_number in range(1, 4)]
         input_values = [make_county_inmate(j_id) for j_id in j_ids]
         inmate_class.active_inmates.return_value = input_values
         inmates = Inmates(inmate_class, self.__raw_inmate_data, Mock())
         response_q = Queue(1)
         inmates.active_inmates_ids(response_q)
         active_inmates_ids = response_q.get()
-        assert active_inmates_ids == j_ids
+        assert list(active_inmates_ids) == j_ids
         assert self.__raw_inmate_data.call_args_list == []
 
     def test_add_inmate(self):
@@ -52,16 +54,29 @@ class TestInmates:
         assert monitor.notify.call_args_list == [call(inmates.__class__, inmates.FINISHED_PROCESSING)]
         assert self.__raw_inmate_data.call_args_list == []
 
+    def test_known_inmates_ids_starting_with(self):
+        inmate_class = Mock()
+        start_date = date(2014, 1, 15)
+        j_ids = ['2014-0117002', '2014-0115001', '2014-0116005']
+        inmate_class.known_inmates_ids_between.return_value = iter(j_ids)
+        inmates = Inmates(inmate_class, self.__raw_inmate_data, Mock())
+        response_q = Queue(1)
+        inmates.known_inmates_ids_starting_with(response_q, start_date)
+        known_inmates_ids = response_q.get()
+        assert inmate_class.known_inmates_ids_between.call_args_list == [call(start_date, yesterday())]
+        assert list(known_inmates_ids) == sorted(j_ids)
+        assert known_inmates_ids.booking_numbers_on(date(2014, 1, 16)) == [5]
+
     def test_recently_discharged_inmates_ids(self):
         inmate_class = Mock()
-        j_ids = [j_id for j_id in range(1, 4)]
+        j_ids = ['2014-01170%02d' % booking_number for booking_number in range(1, 4)]
         input_values = [make_county_inmate(j_id) for j_id in j_ids]
         inmate_class.recently_discharged_inmates.return_value = input_values
         inmates = Inmates(inmate_class, self.__raw_inmate_data, Mock())
         response_q = Queue(1)
         inmates.recently_discharged_inmates_ids(response_q)
         recently_discharged_inmates_ids = response_q.get()
-        assert recently_discharged_inmates_ids == j_ids
+        assert list(recently_discharged_inmates_ids) == j_ids
         assert self.__raw_inmate_data.call_args_list == []
 
     def test_update_inmate(self):
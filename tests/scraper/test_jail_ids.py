@@ -0,0 +1,43 @@
+from datetime import date
+
+from scraper.jail_ids import jail_id_for, jail_id_key, JailIdIndex
+
+
+class Test_JailIdIndex:
+
+    def test_membership(self):
+        index = JailIdIndex(['2014-0117015', '2014-0117002', '2013-1231350'])
+        assert '2014-0117015' in index
+        assert '2013-1231350' in index
+        assert '2014-0117016' not in index
+        assert 'not a jail id' not in index
+        assert len(index) == 3
+
+    def test_keys_past_32_bits(self):
+        index = JailIdIndex(['2099-1231350', '2014-0117015'])
+        assert '2099-1231350' in index
+        assert list(index) == ['2014-0117015', '2099-1231350']
+
+    def test_iterates_in_increasing_order(self):
+        index = JailIdIndex(['2014-0117015', '2014-0117002', '2013-1231350', '2014-0117002'])
+        assert list(index) == ['2013-1231350', '2014-0117002', '2014-0117015']
+
+    def test_unusual_ids_are_kept(self):
+        index = JailIdIndex(['2014-01170015', 'CCJ-1', '2014-0117015'])
+        assert jail_id_key('2014-01170015') is None
+        assert '2014-01170015' in index
+        assert 'CCJ-1' in index
+        assert '2014-0117015' in index
+        assert len(index) == 3
+
+    def test_range_queries(self):
+        index = JailIdIndex([jail_id_for(date(2014, 1, day), booking_number)
+                             for day in range(15, 19) for booking_number in [1, 7, 350]])
+        assert index.booking_numbers_on(date(2014, 1, 16)) == [1, 7, 350]
+        assert index.booking_numbers_on(date(2014, 1, 20)) == []
+        assert index.booked_between(date(2014, 1, 17), date(2014, 1, 30)) == \
+            ['2014-0117001', '2014-0117007', '2014-0117350', '2014-0118001', '2014-0118007', '2014-0118350']
+
+    def test_equality(self):
+        assert JailIdIndex(['2014-0117015', '2014-0117002']) == JailIdIndex(['2014-0117002', '2014-0117015'])
+        assert JailIdIndex(['2014-0117015']) != JailIdIndex(['2014-0117002'])
@@ -0,0 +1,34 @@
+import gevent
+from mock import patch
+import pytest
+
+from scraper.joinable_priority_queue import JoinablePriorityQueue
+
+
+class Test_JoinablePriorityQueue:
+
+    def test_smallest_item_first(self):
+        queue = JoinablePriorityQueue()
+        for item in [(5, 'e'), (1, 'a'), (3, 'c')]:
+            queue.put(item)
+        assert [queue.get() for _ in range(3)] == [(1, 'a'), (3, 'c'), (5, 'e')]
+
+    def test_join_waits_for_every_item(self):
+        queue = JoinablePriorityQueue(2)
+        for item in [2, 1]:
+            queue.put(item)
+        queue.get()
+        queue.task_done()
+        joined = gevent.spawn(queue.join)
+        gevent.sleep(0.01)
+        assert not joined.ready()
+        queue.get()
+        queue.task_done()
+        joined.join(timeout=1)
+        assert joined.ready()
+
+    def test_refuses_storage_that_is_not_a_heap(self):
+        with patch.object(JoinablePriorityQueue, '_create_queue', lambda self, items=(): list(items)), \
+                patch.object(JoinablePriorityQueue, '_init', lambda self, maxsize, items=None: None):
+            with pytest.raises(TypeError):
+                JoinablePriorityQueue()
@@ -0,0 +1,45 @@
+import json
+
+from scraper.metrics import Metrics
+
+
+class TestMetrics:
+
+    def setup_method(self, method):
+        self._metrics = Metrics(buckets=(0.1, 1))
+        self._metrics.increment('http_fetches', labels={'found': True})
+        self._metrics.increment('http_fetches', 2, labels={'found': True})
+        self._metrics.set_gauge('phase_seconds', 1.5, {'phase': 'new inmates search'})
+        for value in [0.05, 0.5, 0.5, 5]:
+            self._metrics.observe('http_fetch_seconds', value)
+
+    def test_metrics(self):
+        assert self._metrics.counter('http_fetches', {'found': True}) == 3
+        assert self._metrics.counter('http_fetches', {'found': False}) == 0
+        assert self._metrics.gauge('phase_seconds', {'phase': 'new inmates search'}) == 1.5
+        histogram = self._metrics.histogram('http_fetch_seconds')
+        assert (histogram.count, histogram.sum, histogram.min, histogram.max) == (4, 6.05, 0.05, 5)
+        assert histogram.cumulative_counts() == [(0.1, 1), (1, 3), ('+Inf', 4)]
+
+    def test_prometheus_format(self):
+        assert self._metrics.to_prometheus().splitlines() == [
+            '# TYPE ccj_scraper_http_fetches counter',
+            'ccj_scraper_http_fetches{found="True"} 3',
+            '# TYPE ccj_scraper_phase_seconds gauge',
+            'ccj_scraper_phase_seconds{phase="new inmates search"} 1.5',
+            '# TYPE ccj_scraper_http_fetch_seconds histogram',
+            'ccj_scraper_http_fetch_seconds_bucket{le="0.1"} 1',
+            'ccj_scraper_http_fetch_seconds_bucket{le="1"} 3',
+            'ccj_scraper_http_fetch_seconds_bucket{le="+Inf"} 4',
+            'ccj_scraper_http_fetch_seconds_sum 6.05',
+            'ccj_scraper_http_fetch_seconds_count 4',
+        ]
+
+    def test_write_json(self, tmpdir):
+        file_name = str(tmpdir.join('metrics.json'))
+        self._metrics.write(file_name)
+        with open(file_name) as metrics_file:
+            metrics = json.load(metrics_file)
+        assert metrics['counters'] == [{'name': 'http_fetches', 'labels': {'found': True}, 'value': 3}]
+        assert metrics['histograms'][0]['value']['count'] == 4
+        assert tmpdir.listdir() == [tmpdir.join('metrics.json')]
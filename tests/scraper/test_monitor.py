@@ -1,7 +1,9 @@
+import gevent
 
 from scraper.monitor import Monitor, MONITOR_VERBOSE_DMSG_LEVEL
+from scraper import monitor as monitor_module
 
-from mock import Mock, call
+from mock import Mock, call, patch
 
 
 class Test_Monitor:
@@ -13,14 +15,57 @@ class Test_Monitor:
         log = Mock()
         monitor = Monitor(log)
         monitor._debug(timestamp, msg)
+        monitor.flush()
         log.debug.assert_called_once_with(expected)
 
+    def test_debug_msg_formatted_when_written(self):
+        timestamp = '*now*'
+        log = Mock()
+        monitor = Monitor(log)
+        monitor._debug(timestamp, 'check for inmate - %s', ('2014-0117015',))
+        assert not log.debug.called
+        gevent.sleep(0)
+        log.debug.assert_called_once_with('*now* - check for inmate - 2014-0117015')
+
+    def test_badly_formatted_debug_msg_does_not_stop_the_writer(self):
+        log = Mock()
+        monitor = Monitor(log)
+        monitor._debug('*now*', 'inmate %s of %s', ('2014-0117015',))
+        monitor._debug('*now*', 'next')
+        gevent.sleep(0)
+        assert log.debug.call_args_list[0][0][0].startswith("*now* - inmate %s of %s, args ('2014-0117015',), could")
+        assert log.debug.call_args_list[1] == call('*now* - next')
+        monitor._debug('*now*', 'later')
+        gevent.sleep(0)
+        assert log.debug.call_args_list[2] == call('*now* - later')
+
+    def test_debug_msgs_written_in_batches(self):
+        log = Mock()
+        monitor = Monitor(log)
+        for msg in ['one', 'two', 'three']:
+            monitor._debug('*now*', msg)
+        gevent.sleep(0)
+        assert log.debug.call_args_list == [call('*now* - one'), call('*now* - two'), call('*now* - three')]
+
+    def test_oldest_debug_msgs_dropped_when_buffer_full(self):
+        log = Mock()
+        with patch.object(monitor_module, 'MAX_PENDING_DEBUG_MSGS', 2):
+            monitor = Monitor(log)
+        for msg in ['one', 'two', 'three']:
+            monitor._debug('*now*', msg)
+        monitor.flush()
+        assert 'Monitor: 1 debug messages dropped' in log.debug.call_args_list[0][0][0]
+        assert log.debug.call_args_list[1:] == [call('*now* - two'), call('*now* - three')]
+        assert monitor.metrics.counter('debug_msgs_dropped') == 1
+
     def test_debug_msgs_off(self):
         expected = 'hi'
         log = Mock()
         monitor = Monitor(log, no_debug_msgs=True)
         monitor.debug(expected)
+        monitor.flush()
         assert not log.debug.called, 'log.debug should not have been called'
+        assert not monitor.debug_enabled()
 
     def test_verbose_debug_mode(self):
         expected = 'hi'
@@ -28,13 +73,26 @@ class Test_Monitor:
         monitor = Monitor(log)
         monitor.debug(expected)
         monitor.debug(expected, debug_level=MONITOR_VERBOSE_DMSG_LEVEL)
+        monitor.flush()
         assert len(log.debug.call_args_list) == 1
+        assert not monitor.debug_enabled(MONITOR_VERBOSE_DMSG_LEVEL)
         log = Mock()
         monitor = Monitor(log, verbose_debug_mode=True)
         monitor.debug(expected)
         monitor.debug(expected, debug_level=MONITOR_VERBOSE_DMSG_LEVEL)
+        monitor.flush()
         assert len(log.debug.call_args_list) == 2
 
+    def test_verbose_debug_msgs_sampled(self):
+        log = Mock()
+        monitor = Monitor(log, verbose_debug_mode=True, verbose_sample_every=3)
+        for inmate_number in range(6):
+            monitor.debug('check for inmate - %d', MONITOR_VERBOSE_DMSG_LEVEL, (inmate_number,))
+        monitor.debug('not sampled')
+        monitor.flush()
+        msgs = [debug_call[0][0].split(' - ', 1)[1] for debug_call in log.debug.call_args_list]
+        assert msgs == ['check for inmate - 2', 'check for inmate - 5', 'not sampled']
+
     def test_notify(self):
         notifier = Mock(spec=Test_Monitor)
         expected = (notifier, '')
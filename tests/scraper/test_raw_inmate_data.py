@@ -1,10 +1,13 @@
 
 from datetime import date
 from mock import Mock
+import pytest
 import os.path
 import csv
+from scraper.inmate_details import InmateDetails
 from scraper.raw_inmate_data import RawInmateData, RAW_INMATE_DATA_BUILD_DIR, RAW_INMATE_DATA_RELEASE_DIR, \
-    STORE_RAW_INMATE_DATA, FEATURE_CONTROL_IDS
+    STORE_RAW_INMATE_DATA, FEATURE_CONTROL_IDS, raw_inmate_records, RAW_INMATE_DATA_FORMAT, COLUMNAR_FORMAT, \
+    CSV_FORMAT, FILE_EXTENSIONS, BLOCK_SIZE, RawInmateRecord
 
 
 class TestRawInmateData:
@@ -17,8 +20,7 @@ class TestRawInmateData:
         return raw_inmate_data
 
     def __assert_build_file(self, raw_inmate_data):
-        # noinspection PyProtectedMember
-        raw_inmate_data._RawInmateData__build_file.flush()
+        raw_inmate_data.flush()
         build_dir_list = self.__build_dir.listdir()
         self.__assert_one_build_file(build_dir_list)
         with open(str(build_dir_list[0]), 'rb') as csvfile:
@@ -80,6 +82,27 @@ class TestRawInmateData:
         assert len(self.__raw_inmate_data_dir.listdir()) == 0
         self.__assert_build_file(raw_inmate_data)
 
+    def test_adding_more_inmates_than_buffered(self, tmpdir):
+        self.__make_tmp_dirs(tmpdir)
+        raw_inmate_data = RawInmateData(self.__today, self.__feature_controls(True), Mock())
+        for _ in range(BLOCK_SIZE * 2 + 1):
+            raw_inmate_data.add(self.__inmates.next())
+        self.__assert_build_file(raw_inmate_data)
+
+    def test_unreadable_inmate_is_skipped_alone(self, tmpdir):
+        self.__make_tmp_dirs(tmpdir)
+        monitor = Mock()
+        raw_inmate_data = RawInmateData(self.__today, self.__feature_controls(True), monitor)
+        inmates = [self.__inmates.next() for _ in range(3)]
+        inmates[1].hash_id.side_effect = AttributeError('no birth date')
+        for inmate in inmates:
+            raw_inmate_data.add(inmate)
+        raw_inmate_data.flush()
+        with open(str(self.__build_dir.listdir()[0]), 'rb') as csvfile:
+            jail_ids = [row[0] for row in csv.reader(csvfile)][1:]
+        assert jail_ids == [inmates[0].jail_id(), inmates[2].jail_id()]
+        assert monitor.debug.call_args[0][2] == (inmates[1].jail_id(), inmates[1].hash_id.side_effect)
+
     def test_feature_switch_off_means_no_processing(self, tmpdir):
         self.__make_tmp_dirs(tmpdir)
         raw_inmate_data = self.__add_inmates(feature_activated=False)
@@ -121,6 +144,52 @@ class TestRawInmateData:
         assert len(self.__build_dir.listdir()) == 0
         self.__assert_release_file()
 
+    def __assert_stored_inmate_reads_back(self, file_format):
+        with open('tests/data/2014-0117015.html', 'r') as inmate_file:
+            inmate_details = InmateDetails(inmate_file.read())
+        feature_controls = self.__feature_controls(feature_activated=True)
+        feature_controls[RAW_INMATE_DATA_FORMAT] = file_format
+        raw_inmate_data = RawInmateData(self.__today, feature_controls, Mock())
+        raw_inmate_data.add(inmate_details)
+        raw_inmate_data.finish()
+        released_file_name = os.path.join(str(self.__raw_inmate_data_dir), self.__today.strftime('%Y'),
+                                          self.__today.strftime('%Y-%m-%d') + FILE_EXTENSIONS[file_format])
+        inmate_records = list(raw_inmate_records(released_file_name))
+        assert len(inmate_records) == 1
+        for method_name in RawInmateData.HEADER_METHOD_NAMES.itervalues():
+            assert getattr(inmate_records[0], method_name)() == getattr(inmate_details, method_name)()
+
+    def test_stored_inmates_read_back_like_inmate_details(self, tmpdir):
+        self.__make_tmp_dirs(tmpdir)
+        self.__assert_stored_inmate_reads_back(CSV_FORMAT)
+
+    def test_columnar_format_reads_back_like_inmate_details(self, tmpdir):
+        self.__make_tmp_dirs(tmpdir)
+        self.__assert_stored_inmate_reads_back(COLUMNAR_FORMAT)
+
+    def test_csv_empty_age_reads_back_as_none(self, tmpdir):
+        snap_shot = tmpdir.join('2014-01-01.csv')
+        snap_shot.write(','.join(RawInmateData.HEADER_METHOD_NAMES.iterkeys()) + '\n' +
+                        '2014-0101001,2014-01-01,26,M,WH,511,188,,01-01,506(23),NO BAIL,,\n')
+        inmate_records = list(raw_inmate_records(str(snap_shot)))
+        assert inmate_records[0].age_at_booking() is None
+        assert inmate_records[0].next_court_date() is None
+
+    def test_record_from_details(self):
+        with open('tests/data/2014-0117015.html') as inmate_file:
+            inmate_details = InmateDetails(inmate_file.read())
+        inmate_record = RawInmateRecord.from_details(inmate_details)
+        for method_name in RawInmateData.HEADER_METHOD_NAMES.itervalues():
+            assert getattr(inmate_record, method_name)() == getattr(inmate_details, method_name)()
+
+    def test_record_from_details_keeps_unreadable_fields_failing(self):
+        inmate_details = self.__inmates.next()
+        inmate_details.hash_id.side_effect = AttributeError('no birth date')
+        inmate_record = RawInmateRecord.from_details(inmate_details)
+        assert inmate_record.gender() == 'M'
+        with pytest.raises(AttributeError):
+            inmate_record.hash_id()
+
     def test_initialize(self, tmpdir):
         self.__make_tmp_dirs(tmpdir)
         feature_controls = self.__feature_controls(feature_activated=True)
@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta
+
+from mock import Mock
+
+from scraper.refresh_schedule import change_likelihood, COURT_DATE_WEIGHT, MAX_CHURN, RECENT_BOOKING_WEIGHT, \
+    RefreshSchedule
+from utils import ONE_DAY
+
+
+class Test_RefreshSchedule:
+
+    def setup_method(self, method):
+        self.now = datetime(2014, 3, 10, 12)
+        self.inmate_class = Mock()
+        self.inmate_class.active_inmates_ids_with_court_date_between.return_value = set()
+        self.inmate_class.active_inmates_history_changes_since.return_value = {}
+        self.schedule = RefreshSchedule(self.inmate_class)
+
+    def _last_seen(self, *inmates):
+        self.inmate_class.active_inmates_last_seen.return_value = iter(inmates)
+
+    def test_change_likelihood(self):
+        assert change_likelihood(False, False, 0) == 1
+        assert change_likelihood(True, True, 2) == 1 + COURT_DATE_WEIGHT + RECENT_BOOKING_WEIGHT + 2
+        assert change_likelihood(False, False, 100) == 1 + MAX_CHURN
+
+    def test_likely_changes_come_before_staleness(self):
+        self._last_seen(('2014-0101001', self.now - timedelta(hours=40), self.now.date() - ONE_DAY * 60),
+                        ('2014-0308001', self.now - timedelta(hours=25), self.now.date() - ONE_DAY * 2),
+                        ('2014-0101002', self.now - timedelta(hours=20), self.now.date() - ONE_DAY * 60),
+                        ('2014-0101003', self.now - timedelta(hours=30), self.now.date() - ONE_DAY * 60))
+        self.inmate_class.active_inmates_ids_with_court_date_between.return_value = {'2014-0101002'}
+        seen_before = self.now - timedelta(hours=6)
+        assert self.schedule.inmates_to_refresh(self.now, seen_before, 3) == \
+            ['2014-0308001', '2014-0101002', '2014-0101001']
+        self.inmate_class.active_inmates_last_seen.assert_called_once_with(seen_before)
+        self.inmate_class.active_inmates_ids_with_court_date_between.assert_called_once_with(
+            self.now.date() - ONE_DAY * 2, self.now.date() + ONE_DAY)
+
+    def test_no_requests_left_means_no_queries(self):
+        assert self.schedule.inmates_to_refresh(self.now, self.now, 0) == []
+        assert not self.inmate_class.active_inmates_last_seen.called
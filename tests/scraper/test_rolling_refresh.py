@@ -0,0 +1,55 @@
+from datetime import date, datetime
+
+from mock import Mock, call, patch
+
+from scraper import rolling_refresh
+from scraper.jail_ids import jail_id_for
+from scraper.monitor import Monitor
+from scraper.rolling_refresh import MIN_REFRESH_AGE, PROBE_AHEAD, RollingRefresh
+from utils import ONE_DAY
+
+
+class Test_RollingRefresh:
+
+    def setup_method(self, method):
+        self.inmate_class = Mock()
+        self.patcher = patch.object(rolling_refresh, 'Inmate', self.inmate_class)
+        self.patcher.start()
+
+    def teardown_method(self, method):
+        self.patcher.stop()
+
+    def test_cycle_probes_newest_days_and_refreshes_scheduled_inmates(self):
+        today = date.today()
+        self.inmate_class.known_inmates_ids_between.return_value = iter([jail_id_for(today - ONE_DAY, 7),
+                                                                         jail_id_for(today - ONE_DAY, 3)])
+        last_seen = datetime.now() - ONE_DAY
+        self.inmate_class.active_inmates_last_seen.return_value = iter([('2014-0101001', last_seen, None),
+                                                                       ('2014-0101002', last_seen, None)])
+        self.inmate_class.active_inmates_ids_with_court_date_between.return_value = {'2014-0101002'}
+        self.inmate_class.active_inmates_history_changes_since.return_value = {}
+        publish = Mock()
+        refresh = RollingRefresh(Monitor(Mock()), publish, requests_per_second=1, cycle_seconds=100, http=Mock())
+        inmates_scraper, inmates = Mock(), Mock()
+        start_time = datetime.now()
+        refresh.run_cycle(inmates_scraper, inmates, start_time)
+        assert inmates_scraper.create_if_exists.call_args_list == \
+            [call(jail_id_for(today - ONE_DAY, number)) for number in range(8, 8 + PROBE_AHEAD)] + \
+            [call(jail_id_for(today, number)) for number in range(1, 1 + PROBE_AHEAD)]
+        assert self.inmate_class.active_inmates_last_seen.call_args_list == [call(start_time - MIN_REFRESH_AGE)]
+        assert inmates_scraper.update_inmate_status.call_args_list == [call('2014-0101002'), call('2014-0101001')]
+        assert inmates_scraper.wait_until_idle.called and inmates.wait_until_idle.called
+        assert publish.call_args_list == [call(start_time)]
+        assert refresh.cycles == 1
+
+    def test_stop_ends_the_run(self):
+        self.inmate_class.known_inmates_ids_between.return_value = iter([])
+        self.inmate_class.active_inmates_last_seen.return_value = iter([])
+        self.inmate_class.active_inmates_history_changes_since.return_value = {}
+        refresh = RollingRefresh(Monitor(Mock()), requests_per_second=1, cycle_seconds=0.01, http=Mock())
+        with patch.object(rolling_refresh, 'InmatesScraper'), patch.object(rolling_refresh, 'Inmates'):
+            refresh.run(max_cycles=2)
+            assert refresh.cycles == 2
+            refresh.stop()
+            refresh.run()
+        assert refresh.cycles == 2
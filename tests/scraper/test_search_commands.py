@@ -58,6 +58,17 @@ class Test_SearchCommands:
         assert inmate_scraper.create_if_exists.call_args_list == expected
         assert monitor.notify.call_args_list == [call(search_commands.__class__, search_commands.FINISHED_FIND_INMATES)]
 
+    def test_find_inmates_up_to_end_date(self):
+        number_to_fetch = 2
+        start_date = date.today() - ONE_DAY * 5
+        expected = map(lambda x: call(x), gen_inmate_ids(start_date, number_to_fetch) +
+                       gen_inmate_ids(start_date + ONE_DAY, number_to_fetch))
+        inmate_scraper = Mock()
+        search_commands = SearchCommands(inmate_scraper, Mock())
+        search_commands.find_inmates(number_to_fetch=number_to_fetch, start_date=start_date,
+                                     end_date=start_date + ONE_DAY)
+        assert inmate_scraper.create_if_exists.call_args_list == expected
+
     def test_check_if_really_discharged(self):
         number_to_fetch = 3
         expected = expect_jail_id_calls(number_to_fetch)
@@ -0,0 +1,56 @@
+from datetime import date
+from StringIO import StringIO
+
+from scraper.columnar_file import ColumnarWriter
+from scraper.raw_inmate_data import RawInmateData
+from scraper.snapshot_diff import diff, write_change_log, BOOKED, CHANGED, LEFT
+
+
+class TestSnapshotDiff:
+
+    @staticmethod
+    def __row(jail_id, housing_location='01-01', charges='506(23)'):
+        return [jail_id, None, '26', 'M', 'BK', '511', '180', 21, housing_location, charges, 'NO BAIL', None, '']
+
+    def test_bookings_and_inmates_that_left(self):
+        old_rows = [self.__row('2014-0101001'), self.__row('2014-0101003')]
+        new_rows = [self.__row('2014-0101002'), self.__row('2014-0101003'), self.__row('2014-0101004')]
+        assert list(diff(old_rows, new_rows)) == [
+            ('2014-0101001', LEFT, '', '', ''),
+            ('2014-0101002', BOOKED, '', '', ''),
+            ('2014-0101004', BOOKED, '', '', ''),
+        ]
+
+    def test_changed_fields(self):
+        old_rows = [self.__row('2014-0101001'), self.__row('2014-0101002')]
+        new_rows = [self.__row('2014-0101001', housing_location='DISCHARGED'),
+                    self.__row('2014-0101002', charges='720 ILCS 5 12-3')]
+        assert list(diff(old_rows, new_rows)) == [
+            ('2014-0101001', CHANGED, 'Housing_Location', '01-01', 'DISCHARGED'),
+            ('2014-0101002', CHANGED, 'Charges', '506(23)', '720 ILCS 5 12-3'),
+        ]
+
+    def test_change_log_of_columnar_snapshots(self, tmpdir):
+        snap_shots = []
+        for file_name, rows in [('2014-01-01.columnar', [self.__row('2014-0101003'), self.__row('2014-0101001'),
+                                                         self.__row('2014-0101002')]),
+                                ('2014-01-02.columnar', [self.__row('2014-0101004'),
+                                                         self.__row('2014-0101002', housing_location='DISCHARGED'),
+                                                         self.__row('2014-0101003')])]:
+            snap_shots.append(str(tmpdir.join(file_name)))
+            writer = ColumnarWriter(snap_shots[-1], RawInmateData.COLUMNS)
+            for row in rows:
+                writer.add([row[0], date(2014, 1, 1)] + row[2:])
+            writer.close()
+        change_log = StringIO()
+        counts = write_change_log(snap_shots[0], snap_shots[1], change_log, sort_run_size=2)
+        assert counts == {BOOKED: 1, CHANGED: 1, LEFT: 1}
+        assert change_log.getvalue().splitlines()[1:] == [
+            '2014-0101001,LEFT,,,',
+            '2014-0101002,CHANGED,Housing_Location,01-01,DISCHARGED',
+            '2014-0101004,BOOKED,,,',
+        ]
+
+    def test_no_changes(self):
+        rows = [self.__row('2014-0101001')]
+        assert list(diff(rows, rows)) == []